@@ -0,0 +1,76 @@
+''' Compares the sklearn models with their compiled evaluators\n
+    ------------------------------------------------
+    Usage - python -m house_price.benchmark.compiled_model_benchmark [--output results.json]
+'''
+import argparse
+import json
+import pickle
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from house_price.entity.compiled_model import compile_model
+
+def measure_latency(predict, X: np.ndarray, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def run_benchmark(row_count: int, feature_count: int, repeat: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((row_count, feature_count))
+    y = X @ rng.standard_normal(feature_count) + np.sin(X[:, 0]) * 3 + rng.standard_normal(row_count)
+    models = [
+        LinearRegression(),
+        RandomForestRegressor(n_estimators=50, min_samples_leaf=4, random_state=seed),
+    ]
+    results = []
+    for model in models:
+        model.fit(X, y)
+        for float32_thresholds in (False, True):
+            if float32_thresholds and isinstance(model, LinearRegression):
+                continue
+            compiled_model = compile_model(model=model, X_check=X, float32_thresholds=float32_thresholds)
+            result = {
+                'model': type(model).__name__,
+                'compiled': type(compiled_model).__name__,
+                'float32_thresholds': float32_thresholds,
+                'sklearn_pickle_bytes': len(pickle.dumps(model)),
+                'compiled_pickle_bytes': len(pickle.dumps(compiled_model)),
+                'max_abs_difference': float(np.abs(model.predict(X) - compiled_model.predict(X)).max()),
+            }
+            for name, predict in (('sklearn', model.predict), ('compiled', compiled_model.predict)):
+                result[f'{name}_single_row_seconds'] = measure_latency(predict, X[:1], repeat)
+                result[f'{name}_batch_seconds'] = measure_latency(predict, X, max(1, repeat // 20))
+            results.append(result)
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--features', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=2022)
+    parser.add_argument('--output', type=str, default=None)
+    args = parser.parse_args()
+    results = run_benchmark(args.rows, args.features, args.repeat, args.seed)
+    header = f'{"model":<24}{"f32":<6}{"1 row sk (us)":>15}{"1 row c (us)":>15}{"batch sk (ms)":>15}{"batch c (ms)":>15}{"pickle sk (KB)":>16}{"pickle c (KB)":>15}'
+    print(header)
+    for result in results:
+        print(
+            f'{result["model"]:<24}{str(result["float32_thresholds"]):<6}'
+            f'{result["sklearn_single_row_seconds"] * 1e6:>15.1f}{result["compiled_single_row_seconds"] * 1e6:>15.1f}'
+            f'{result["sklearn_batch_seconds"] * 1e3:>15.1f}{result["compiled_batch_seconds"] * 1e3:>15.1f}'
+            f'{result["sklearn_pickle_bytes"] / 1024:>16.1f}{result["compiled_pickle_bytes"] / 1024:>15.1f}'
+        )
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+''' Benchmark of the schema-aware csv reader\n
+    ------------------------------------------------
+    For every size, writes a synthetic housing csv from schema.yaml and loads it
+    with the former read-then-cast path (pd.read_csv, then one astype per column)
+    and with util.read_dataframe on the c and pyarrow parser engines. Every load
+    runs in a fresh process, which reports its best time over --repeat loads and
+    the peak RSS above its RSS before the first load.\n
+    Usage - python -m house_price.benchmark.reader_benchmark --sizes 1000000 5000000 --output reader.json
+'''
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from house_price.benchmark.serving_benchmark import REPO_CONFIG_DIR, get_git_commit
+from house_price.benchmark.synthetic_data import write_housing_csv
+from house_price.benchmark.training_benchmark import get_peak_rss_bytes
+from house_price.util import util
+
+READERS = ('read_then_cast', 'typed_c', 'typed_pyarrow')
+
+def read_then_cast(file_path: str, schema_file_path: str) -> pd.DataFrame:
+    ''' The reader util.read_dataframe replaced, kept as the baseline.
+    '''
+    columns = util.read_yaml_file(file_path=schema_file_path)['columns']
+    df = pd.read_csv(filepath_or_buffer=file_path)
+    for key in columns:
+        df[key] = df[key].astype(dtype=columns[key])
+    return df
+
+def run_reader(reader: str, file_path: str, schema_file_path: str, repeat: int) -> dict:
+    ''' Loads file_path with reader in this process, repeat times.
+    '''
+    start_rss_bytes = get_peak_rss_bytes()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if reader == 'read_then_cast':
+            df = read_then_cast(file_path, schema_file_path)
+        else:
+            df = util.read_dataframe(file_path, schema_file_path, engine=reader[len('typed_'):])
+        timings.append(time.perf_counter() - start)
+        memory_bytes = int(df.memory_usage(deep=True).sum())
+        del df
+    return {
+        'reader': reader,
+        'seconds': min(timings),
+        'peak_rss_increase_bytes': get_peak_rss_bytes() - start_rss_bytes,
+        'dataframe_bytes': memory_bytes
+    }
+
+def run_size(work_dir: str, row_count: int, schema_file_path: str, seed: int, repeat: int) -> dict:
+    file_path = write_housing_csv(row_count, schema_file_path, os.path.join(work_dir, f'housing_{row_count}.csv'), seed=seed)
+    result = {'rows': row_count, 'file_bytes': os.path.getsize(file_path), 'readers': []}
+    for reader in READERS:
+        completed = subprocess.run(
+            [sys.executable, '-m', 'house_price.benchmark.reader_benchmark', '--run-reader', reader, file_path, '--repeat', str(repeat)],
+            capture_output=True,
+            text=True,
+            env={**os.environ, 'PYTHONPATH': os.pathsep.join([os.path.dirname(REPO_CONFIG_DIR)] + sys.path)}
+        )
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f'exit code {completed.returncode}'
+            result['readers'].append({'reader': reader, 'error': error})
+        else:
+            result['readers'].append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    os.remove(file_path)
+    return result
+
+def print_report(results: list) -> None:
+    print(f'{"rows":>10}  {"reader":<16}{"seconds":>10}{"peak rss +MB":>14}{"frame MB":>10}{"speedup":>9}')
+    for result in results:
+        baseline = next((item for item in result['readers'] if item['reader'] == 'read_then_cast' and 'error' not in item), None)
+        for item in result['readers']:
+            if 'error' in item:
+                print(f'{result["rows"]:>10}  {item["reader"]:<16}failed - {item["error"]}')
+                continue
+            speedup = f'{baseline["seconds"] / item["seconds"]:.2f}x' if baseline else ''
+            print(
+                f'{result["rows"]:>10}  {item["reader"]:<16}{item["seconds"]:>10.3f}'
+                f'{item["peak_rss_increase_bytes"] / 2 ** 20:>14.0f}{item["dataframe_bytes"] / 2 ** 20:>10.0f}{speedup:>9}'
+            )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000000, 5000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=2022)
+    parser.add_argument('--output', type=str, default=None)
+    parser.add_argument('--run-reader', type=str, nargs=2, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    schema_file_path = os.path.join(REPO_CONFIG_DIR, 'schema.yaml')
+    if args.run_reader is not None:
+        reader, file_path = args.run_reader
+        print(json.dumps(run_reader(reader, file_path, schema_file_path, args.repeat)))
+        return
+    work_dir = tempfile.mkdtemp(prefix='house_price_reader_benchmark_')
+    results = []
+    try:
+        for row_count in args.sizes:
+            results.append(run_size(work_dir, row_count, schema_file_path, args.seed, args.repeat))
+            print(f'{row_count} rows finished', file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    report = {
+        'results': results,
+        'metadata': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': get_git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat
+        }
+    }
+    print_report(results)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+''' Offline micro-benchmark of the prediction path\n
+    ------------------------------------------------
+    Generates synthetic houses from schema.yaml, trains and pushes a small model
+    through the Pipeline stages in a scratch directory (the dataset is served
+    from a local file:// url), then measures cold start, single row latency
+    (p50/p99) and batch throughput, split between preprocessing and model time.\n
+    Usage - python -m house_price.benchmark.serving_benchmark --output serving.json
+'''
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import yaml
+
+from house_price.benchmark.synthetic_data import generate_housing_data, write_housing_tgz
+
+REPO_CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'config')
+
+COLD_START_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from house_price.entity.model_predictor import HousePriceBatch, HousePricePredictor
+import_seconds = time.perf_counter() - start
+predictor = HousePricePredictor(model_dir=sys.argv[1])
+housing_batch = HousePriceBatch.from_records([json.loads(sys.argv[2])])
+start = time.perf_counter()
+predictor.predict_batch(housing_batch)
+first_prediction_seconds = time.perf_counter() - start
+start = time.perf_counter()
+predictor.predict_batch(housing_batch)
+second_prediction_seconds = time.perf_counter() - start
+print(json.dumps({
+    'import_seconds': import_seconds,
+    'first_prediction_seconds': first_prediction_seconds,
+    'second_prediction_seconds': second_prediction_seconds
+}))
+'''
+
+def prepare_work_dir(work_dir: str, row_count: int, n_estimators: int, seed: int) -> str:
+    ''' Copies the repo config into work_dir, generates the dataset archive and points
+        config.yaml at it, returns the config file path.
+    '''
+    config_dir = os.path.join(work_dir, 'config')
+    shutil.copytree(REPO_CONFIG_DIR, config_dir, dirs_exist_ok=True)
+    tgz_file_path = write_housing_tgz(
+        row_count=row_count,
+        schema_file_path=os.path.join(config_dir, 'schema.yaml'),
+        tgz_file_path=os.path.join(work_dir, 'dataset', 'housing.tgz'),
+        seed=seed
+    )
+    config_file_path = os.path.join(config_dir, 'config.yaml')
+    with open(config_file_path, 'r') as file:
+        config = yaml.safe_load(file)
+    config['data_ingestion_config']['dataset_download_url'] = f'file://{os.path.abspath(tgz_file_path)}'
+    config['model_training_config']['base_accuracy'] = 0.5
+    with open(config_file_path, 'w') as file:
+        yaml.safe_dump(config, file, sort_keys=False)
+    model_config_file_path = os.path.join(config_dir, 'model.yaml')
+    with open(model_config_file_path, 'r') as file:
+        model_config = yaml.safe_load(file)
+    model_config['grid_search']['params']['verbose'] = 0
+    for module_config in model_config['model_selection'].values():
+        if 'n_estimators' in module_config.get('grid_search_params', {}):
+            module_config['grid_search_params']['n_estimators'] = [n_estimators]
+    with open(model_config_file_path, 'w') as file:
+        yaml.safe_dump(model_config, file, sort_keys=False)
+    return config_file_path
+
+def get_skipped_validation_artifacts(configuration) -> object:
+    ''' DataValidationArtifacts standing in for the evidently drift report stage.
+    '''
+    from house_price.entity.artifact_config import DataValidationArtifacts
+
+    return DataValidationArtifacts(
+        schema_file_path=configuration.get_data_validation_config().schema_file_path,
+        report_file_path=None,
+        report_page_file_path=None,
+        is_validated=True,
+        message='Validation skipped by the benchmark.'
+    )
+
+def train_model(config_file_path: str, skip_validation: bool) -> str:
+    ''' Runs the Pipeline stages and returns the model export directory. Runs in a
+        process started in the work dir, house_price.constant resolves every
+        artifact path from the working directory of the process at import.
+    '''
+    from house_price.config.configuration import Configuration
+    from house_price.pipeline.pipeline import Pipeline
+
+    work_dir = os.path.dirname(os.path.dirname(os.path.abspath(config_file_path)))
+    configuration = Configuration(config_file_path=config_file_path)
+    model_export_dir = os.path.abspath(configuration.get_push_model_config().model_export_dir)
+    # The synthetic model must never be promoted into the registry the app serves.
+    if os.path.commonpath([work_dir, model_export_dir]) != work_dir:
+        raise Exception(f'Model export dir {model_export_dir} is outside the work dir {work_dir}.')
+    pipeline = Pipeline(configuration=configuration)
+    data_ingestion_artifacts = pipeline.start_data_ingestion()
+    if skip_validation:
+        data_validation_artifacts = get_skipped_validation_artifacts(configuration)
+    else:
+        data_validation_artifacts = pipeline.start_data_validation()
+    data_transformation_artifacts = pipeline.start_data_transformation(
+        data_ingestion_artifacts=data_ingestion_artifacts,
+        data_validation_artifacts=data_validation_artifacts
+    )
+    model_training_artifact = pipeline.start_model_training(
+        data_transformation_artifacts=data_transformation_artifacts,
+        data_ingestion_artifacts=data_ingestion_artifacts,
+        data_validation_artifacts=data_validation_artifacts
+    )
+    if model_training_artifact is None:
+        raise Exception('No model passed the base accuracy.')
+    pipeline.start_model_pusher(model_training_artifact=model_training_artifact)
+    return model_export_dir
+
+def run_training(work_dir: str, config_file_path: str, skip_validation: bool) -> str:
+    ''' Trains the model in a fresh process started in work_dir, returns the model export directory.
+    '''
+    command = [sys.executable, '-m', 'house_price.benchmark.serving_benchmark', '--run-training', config_file_path]
+    if skip_validation:
+        command.append('--skip-validation')
+    completed = subprocess.run(
+        command,
+        cwd=work_dir,
+        capture_output=True,
+        text=True,
+        env={**os.environ, 'PYTHONPATH': os.pathsep.join([os.path.dirname(REPO_CONFIG_DIR)] + sys.path)}
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f'exit code {completed.returncode}'
+        raise Exception(f'Training failed - {error}')
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def summarize(timings: list) -> dict:
+    timings = np.asarray(timings)
+    return {
+        'p50_seconds': float(np.percentile(timings, 50)),
+        'p99_seconds': float(np.percentile(timings, 99)),
+        'mean_seconds': float(timings.mean()),
+        'runs': int(len(timings))
+    }
+
+def measure_cold_start(model_export_dir: str, housing_record: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-c', COLD_START_SCRIPT, model_export_dir, json.dumps(housing_record)],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)}
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure_batch(predictor, housing_batch, repeat: int) -> dict:
+    estimator_model = predictor.model_cache.get_model()
+    housing_df = housing_batch.get_housing_input_data_frame()
+    total, preprocessing, model = [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predictor.predict_batch(housing_batch)
+        total.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        transformed_features = estimator_model.transform(housing_df)
+        preprocessing.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        estimator_model.trained_model_object.predict(transformed_features)
+        model.append(time.perf_counter() - start)
+    return {
+        'batch_size': len(housing_batch),
+        'total': summarize(total),
+        'preprocessing': summarize(preprocessing),
+        'model': summarize(model),
+        'rows_per_second': len(housing_batch) / float(np.median(total))
+    }
+
+def run_benchmark(model_export_dir: str, batch_sizes: list, repeat: int, seed: int, schema: dict) -> dict:
+    from house_price.entity.model_predictor import HousePriceBatch, HousePricePredictor
+
+    housing_df = generate_housing_data(max(batch_sizes), schema, seed=seed + 1)
+    housing_df = housing_df.drop(columns=[schema['target_column_name']])
+    housing_record = json.loads(housing_df.head(1).to_json(orient='records'))[0]
+    cold_start = measure_cold_start(model_export_dir, housing_record)
+    predictor = HousePricePredictor(model_dir=model_export_dir)
+    single_row = measure_batch(predictor, HousePriceBatch.from_records([housing_record]), repeat)
+    batches = []
+    for batch_size in batch_sizes:
+        housing_batch = HousePriceBatch.from_data_frame(housing_df.head(batch_size))
+        batch_repeat = max(3, min(repeat, 100000 // batch_size))
+        batches.append(measure_batch(predictor, housing_batch, batch_repeat))
+    return {
+        'cold_start': cold_start,
+        'single_row': single_row,
+        'batches': batches,
+        'model_path': predictor.model_cache.get_cached_model().model_path
+    }
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO_CONFIG_DIR, check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def print_report(results: dict) -> None:
+    cold_start = results['cold_start']
+    print(f'cold start - import {cold_start["import_seconds"] * 1e3:.1f} ms, '
+          f'first prediction {cold_start["first_prediction_seconds"] * 1e3:.1f} ms, '
+          f'second prediction {cold_start["second_prediction_seconds"] * 1e3:.2f} ms')
+    single_row = results['single_row']
+    print(f'single row (warm) - p50 {single_row["total"]["p50_seconds"] * 1e6:.0f} us, '
+          f'p99 {single_row["total"]["p99_seconds"] * 1e6:.0f} us, '
+          f'preprocessing p50 {single_row["preprocessing"]["p50_seconds"] * 1e6:.0f} us, '
+          f'model p50 {single_row["model"]["p50_seconds"] * 1e6:.0f} us')
+    print(f'{"batch":>8}{"p50 (ms)":>12}{"p99 (ms)":>12}{"prep (ms)":>12}{"model (ms)":>12}{"rows/s":>14}')
+    for batch in results['batches']:
+        print(
+            f'{batch["batch_size"]:>8}{batch["total"]["p50_seconds"] * 1e3:>12.2f}'
+            f'{batch["total"]["p99_seconds"] * 1e3:>12.2f}{batch["preprocessing"]["p50_seconds"] * 1e3:>12.2f}'
+            f'{batch["model"]["p50_seconds"] * 1e3:>12.2f}{batch["rows_per_second"]:>14.0f}'
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--work-dir', type=str, default=None, help='scratch directory, a temporary one by default')
+    parser.add_argument('--rows', type=int, default=20000, help='training rows')
+    parser.add_argument('--n-estimators', type=int, default=50)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=1000, help='runs of the single row measurement')
+    parser.add_argument('--seed', type=int, default=2022)
+    parser.add_argument('--skip-validation', action='store_true', help='skip the evidently drift report stage')
+    parser.add_argument('--output', type=str, default=None)
+    parser.add_argument('--run-training', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_training is not None:
+        print(json.dumps(train_model(args.run_training, args.skip_validation)))
+        return
+    output_file_path = os.path.abspath(args.output) if args.output else None
+    work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix='house_price_benchmark_'))
+    os.makedirs(work_dir, exist_ok=True)
+    config_file_path = prepare_work_dir(work_dir, args.rows, args.n_estimators, args.seed)
+    model_export_dir = run_training(work_dir, config_file_path, args.skip_validation)
+    with open(os.path.join(work_dir, 'config', 'schema.yaml'), 'r') as file:
+        schema = yaml.safe_load(file)
+    results = run_benchmark(model_export_dir, args.batch_sizes, args.repeat, args.seed, schema)
+    results['metadata'] = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': get_git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'training_rows': args.rows,
+        'n_estimators': args.n_estimators,
+        'work_dir': work_dir
+    }
+    print_report(results)
+    if output_file_path is not None:
+        with open(output_file_path, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+    main()
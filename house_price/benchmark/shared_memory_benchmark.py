@@ -0,0 +1,75 @@
+''' Measures total memory of N serving workers, with and without memory mapped model arrays\n
+    ------------------------------------------------
+    Every worker loads the estimator artifact itself (as gunicorn workers do without
+    --preload) and predicts once, then all workers report their proportional set size
+    (PSS) at the same time. Pages shared through the mapping are split between the
+    workers, so with mmap the total stays roughly flat as workers are added.
+    Linux only, PSS is read from /proc/self/smaps_rollup.\n
+    Usage - python -m house_price.benchmark.shared_memory_benchmark --artifact-dir <serving_model> --input houses.csv
+'''
+import argparse
+import json
+import multiprocessing
+
+import pandas as pd
+
+from house_price.entity.model_artifact import load_estimator_artifact
+
+def read_pss_bytes() -> int:
+    with open('/proc/self/smaps_rollup', 'r') as file:
+        for line in file:
+            if line.startswith('Pss:'):
+                return int(line.split()[1]) * 1024
+    raise Exception('Pss not found in /proc/self/smaps_rollup.')
+
+def run_worker(artifact_dir: str, mmap_mode: str, housing_df: pd.DataFrame, barrier, results) -> None:
+    estimator_model = load_estimator_artifact(artifact_dir=artifact_dir, mmap_mode=mmap_mode)
+    estimator_model.predict(housing_df)
+    barrier.wait()
+    results.put(read_pss_bytes())
+    barrier.wait()
+
+def measure(artifact_dir: str, mmap_mode: str, worker_count: int, housing_df: pd.DataFrame) -> dict:
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(worker_count)
+    results = context.Queue()
+    workers = [
+        context.Process(target=run_worker, args=(artifact_dir, mmap_mode, housing_df, barrier, results))
+        for _ in range(worker_count)
+    ]
+    for worker in workers:
+        worker.start()
+    pss_bytes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return {
+        'mmap_mode': mmap_mode,
+        'workers': worker_count,
+        'total_pss_bytes': sum(pss_bytes),
+        'mean_worker_pss_bytes': sum(pss_bytes) / worker_count
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--artifact-dir', type=str, required=True)
+    parser.add_argument('--input', type=str, required=True, help='CSV with the HousePriceData columns')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--output', type=str, default=None)
+    args = parser.parse_args()
+    housing_df = pd.read_csv(args.input)
+    results = []
+    print(f'{"mmap_mode":<10}{"workers":>8}{"total PSS (MB)":>16}{"per worker (MB)":>17}')
+    for mmap_mode in ('r', None):
+        for worker_count in args.workers:
+            result = measure(args.artifact_dir, mmap_mode, worker_count, housing_df)
+            results.append(result)
+            print(
+                f'{str(mmap_mode):<10}{worker_count:>8}'
+                f'{result["total_pss_bytes"] / 2 ** 20:>16.1f}{result["mean_worker_pss_bytes"] / 2 ** 20:>17.1f}'
+            )
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+''' Guards the import time and footprint of the serving entry point\n
+    ------------------------------------------------
+    Imports the web app in fresh interpreters and records the import wall time,
+    the peak RSS and the top level packages that got loaded. Exits with status 1
+    when a training-only package (sklearn, evidently, ...) is imported or when the
+    median import time regresses past the tolerance of a saved baseline.
+    Run it from a directory holding config/ (and optionally saved_models/).\n
+    Usage - python -m house_price.benchmark.startup_benchmark --output startup.json
+            python -m house_price.benchmark.startup_benchmark --baseline startup.json
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+FORBIDDEN_MODULES = ['sklearn', 'evidently', 'plotly', 'scipy', 'statsmodels']
+
+IMPORT_SCRIPT = '''
+import json, resource, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+import_seconds = time.perf_counter() - start
+print(json.dumps({
+    'import_seconds': import_seconds,
+    'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    'modules': sorted({name.split('.')[0] for name in sys.modules})
+}))
+'''
+
+def measure_import(module_name: str) -> dict:
+    repo_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SCRIPT, module_name],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={**os.environ, 'PYTHONPATH': os.pathsep.join([repo_dir, os.environ.get('PYTHONPATH', '')])}
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--module', type=str, default='house_price.src.app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--forbid', type=str, nargs='*', default=FORBIDDEN_MODULES)
+    parser.add_argument('--baseline', type=str, default=None, help='results of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative import time regression')
+    parser.add_argument('--output', type=str, default=None)
+    args = parser.parse_args()
+    runs = [measure_import(args.module) for _ in range(args.runs)]
+    results = {
+        'module': args.module,
+        'runs': args.runs,
+        'import_seconds_median': statistics.median(run['import_seconds'] for run in runs),
+        'import_seconds_min': min(run['import_seconds'] for run in runs),
+        'max_rss_bytes_median': statistics.median(run['max_rss_bytes'] for run in runs),
+        'modules': runs[-1]['modules']
+    }
+    print(
+        f'{args.module} - import {results["import_seconds_median"] * 1e3:.1f} ms (median of {args.runs}), '
+        f'peak RSS {results["max_rss_bytes_median"] / 2 ** 20:.1f} MB, {len(results["modules"])} top level modules'
+    )
+    failures = []
+    forbidden_modules = sorted(set(args.forbid) & set(results['modules']))
+    if forbidden_modules:
+        failures.append(f'training-only modules imported: {", ".join(forbidden_modules)}')
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        limit = baseline['import_seconds_median'] * (1 + args.tolerance)
+        print(f'baseline {baseline["import_seconds_median"] * 1e3:.1f} ms, limit {limit * 1e3:.1f} ms')
+        if results['import_seconds_median'] > limit:
+            failures.append(
+                f'import time {results["import_seconds_median"] * 1e3:.1f} ms exceeds the baseline limit of {limit * 1e3:.1f} ms'
+            )
+        new_modules = sorted(set(results['modules']) - set(baseline['modules']))
+        if new_modules:
+            print(f'modules not in the baseline: {", ".join(new_modules)}')
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    for failure in failures:
+        print(f'FAIL - {failure}')
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+''' Storage benchmark of the ingested data formats\n
+    ------------------------------------------------
+    For every size, generates synthetic houses from schema.yaml, writes them as
+    csv, parquet and feather with util.write_dataframe and measures the write
+    time, the size on disk, and the time util.read_dataframe takes to load all
+    the schema columns with their dtypes and a two column subset. Times are the
+    best of --repeat runs.\n
+    Usage - python -m house_price.benchmark.storage_benchmark --sizes 100000 1000000 --output storage.json
+'''
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from house_price.benchmark.serving_benchmark import REPO_CONFIG_DIR, get_git_commit
+from house_price.benchmark.synthetic_data import generate_housing_data
+from house_price.util import util
+
+def best_seconds(repeat: int, function, *args, **kwargs) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run_format(work_dir: str, df: pd.DataFrame, data_file_format: str, schema: dict, schema_file_path: str, repeat: int) -> dict:
+    file_path = os.path.join(work_dir, f'train{data_file_format}')
+    columns = list(schema['columns'])
+    subset_columns = ['median_income', schema['target_column_name']]
+    try:
+        write_seconds = best_seconds(repeat, util.write_dataframe, df, file_path, schema=schema)
+        return {
+            'format': data_file_format,
+            'write_seconds': write_seconds,
+            'file_bytes': os.path.getsize(file_path),
+            'read_seconds': best_seconds(repeat, util.read_dataframe, file_path, schema_file_path, columns=columns),
+            'read_subset_seconds': best_seconds(
+                repeat, util.read_dataframe, file_path, schema_file_path, columns=subset_columns
+            )
+        }
+    except Exception as e:
+        # pyarrow is missing, or the format failed.
+        return {'format': data_file_format, 'error': str(e).splitlines()[0]}
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def run_size(work_dir: str, row_count: int, schema: dict, schema_file_path: str, seed: int, repeat: int) -> dict:
+    df = generate_housing_data(row_count=row_count, schema=schema, seed=seed)
+    return {
+        'rows': row_count,
+        'formats': [
+            run_format(work_dir, df, data_file_format, schema, schema_file_path, repeat)
+            for data_file_format in util.DATA_FILE_FORMATS
+        ]
+    }
+
+def print_report(results: list) -> None:
+    print(f'{"rows":>10}  {"format":<10}{"write (s)":>10}{"size (MB)":>11}{"read (s)":>10}{"subset (s)":>12}{"vs csv":>8}')
+    for result in results:
+        csv_read_seconds = next(
+            (item['read_seconds'] for item in result['formats'] if item['format'] == '.csv' and 'error' not in item),
+            None
+        )
+        for item in result['formats']:
+            if 'error' in item:
+                print(f'{result["rows"]:>10}  {item["format"]:<10}failed - {item["error"]}')
+                continue
+            speedup = f'{csv_read_seconds / item["read_seconds"]:.1f}x' if csv_read_seconds else ''
+            print(
+                f'{result["rows"]:>10}  {item["format"]:<10}{item["write_seconds"]:>10.3f}'
+                f'{item["file_bytes"] / 2 ** 20:>11.1f}{item["read_seconds"]:>10.3f}'
+                f'{item["read_subset_seconds"]:>12.3f}{speedup:>8}'
+            )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=2022)
+    parser.add_argument('--output', type=str, default=None)
+    args = parser.parse_args()
+    schema_file_path = os.path.join(REPO_CONFIG_DIR, 'schema.yaml')
+    schema = util.read_yaml_file(file_path=schema_file_path)
+    work_dir = tempfile.mkdtemp(prefix='house_price_storage_benchmark_')
+    results = []
+    try:
+        for row_count in args.sizes:
+            results.append(run_size(work_dir, row_count, schema, schema_file_path, args.seed, args.repeat))
+            print(f'{row_count} rows finished', file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    try:
+        import pyarrow
+        pyarrow_version = pyarrow.__version__
+    except ImportError:
+        pyarrow_version = None
+    report = {
+        'results': results,
+        'metadata': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': get_git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'pyarrow': pyarrow_version,
+            'platform': platform.platform(),
+            'repeat': args.repeat
+        }
+    }
+    print_report(results)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+''' Schema conformant synthetic housing data for the benchmarks\n
+    ------------------------------------------------
+    Columns, categories and value ranges come from schema.yaml, the counts are
+    drawn so that rooms, bedrooms and population stay consistent per household
+    and the target depends on income, location and ocean proximity.
+'''
+import os
+import tarfile
+
+import numpy as np
+import pandas as pd
+
+from house_price.util import util
+
+OCEAN_PROXIMITY_WEIGHTS = {
+    '<1H OCEAN': 0.44,
+    'INLAND': 0.31,
+    'ISLAND': 0.01,
+    'NEAR BAY': 0.11,
+    'NEAR OCEAN': 0.13
+}
+
+OCEAN_PROXIMITY_PREMIUM = {
+    '<1H OCEAN': 40000.0,
+    'INLAND': -30000.0,
+    'ISLAND': 150000.0,
+    'NEAR BAY': 60000.0,
+    'NEAR OCEAN': 50000.0
+}
+
+def generate_housing_data(row_count: int, schema: dict, seed: int = 2022, missing_rate: float = 0.01) -> pd.DataFrame:
+    ''' Generates row_count houses with the columns of schema['columns'] in schema order.
+    '''
+    rng = np.random.default_rng(seed)
+    value_range = schema['value_range']
+
+    def clip(column: str, values: np.ndarray) -> np.ndarray:
+        return np.clip(values, *value_range[column])
+
+    categories = schema['domain_value']['ocean_proximity']
+    weights = np.array([OCEAN_PROXIMITY_WEIGHTS.get(category, 0.01) for category in categories])
+    ocean_proximity = rng.choice(np.array(categories, dtype=object), size=row_count, p=weights / weights.sum())
+    households = np.round(clip('households', rng.lognormal(np.log(400), 0.6, row_count)))
+    total_rooms = np.round(clip('total_rooms', households * rng.uniform(3.0, 8.0, row_count)))
+    total_bedrooms = np.round(clip('total_bedrooms', total_rooms * rng.uniform(0.15, 0.3, row_count)))
+    total_bedrooms[rng.random(row_count) < missing_rate] = np.nan
+    data = {
+        'longitude': np.round(rng.uniform(*value_range['longitude'], row_count), 2),
+        'latitude': np.round(rng.uniform(*value_range['latitude'], row_count), 2),
+        'housing_median_age': np.round(rng.uniform(*value_range['housing_median_age'], row_count)),
+        'total_rooms': total_rooms,
+        'total_bedrooms': total_bedrooms,
+        'population': np.round(clip('population', households * rng.uniform(2.0, 4.0, row_count))),
+        'households': households,
+        'median_income': np.round(clip('median_income', rng.lognormal(np.log(3.5), 0.5, row_count)), 4),
+        'ocean_proximity': ocean_proximity
+    }
+    premium = pd.Series(ocean_proximity).map(OCEAN_PROXIMITY_PREMIUM).fillna(0.0).to_numpy()
+    target = (
+        45000 * data['median_income']
+        + 4000 * np.sqrt(data['housing_median_age'])
+        - 8000 * (data['latitude'] - value_range['latitude'][0])
+        + premium
+        + rng.normal(0, 20000, row_count)
+    )
+    target_column_name = schema['target_column_name']
+    data[target_column_name] = np.round(clip(target_column_name, target))
+
+    return pd.DataFrame({column: data[column] for column in schema['columns']})
+
+def write_housing_csv(row_count: int, schema_file_path: str, csv_file_path: str, seed: int = 2022, chunk_size: int = 1000000) -> str:
+    ''' Writes the synthetic data chunk by chunk, so memory stays bounded by chunk_size.
+    '''
+    schema = util.read_yaml_file(file_path=schema_file_path)
+    os.makedirs(os.path.dirname(os.path.abspath(csv_file_path)), exist_ok=True)
+    for chunk_index, start in enumerate(range(0, row_count, chunk_size)):
+        chunk = generate_housing_data(
+            row_count=min(chunk_size, row_count - start),
+            schema=schema,
+            seed=seed + chunk_index
+        )
+        chunk.to_csv(csv_file_path, mode='w' if chunk_index == 0 else 'a', header=chunk_index == 0, index=False)
+    return csv_file_path
+
+def write_housing_tgz(row_count: int, schema_file_path: str, tgz_file_path: str, seed: int = 2022) -> str:
+    ''' Writes a housing.tgz laid out like the original dataset archive (a single housing.csv).
+    '''
+    csv_file_path = os.path.join(os.path.dirname(os.path.abspath(tgz_file_path)), 'housing.csv')
+    write_housing_csv(row_count, schema_file_path, csv_file_path, seed=seed)
+    with tarfile.open(tgz_file_path, 'w:gz') as file:
+        file.add(csv_file_path, arcname='housing.csv')
+    os.remove(csv_file_path)
+    return tgz_file_path
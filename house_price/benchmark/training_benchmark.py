@@ -0,0 +1,200 @@
+''' Training-scale benchmark of the Pipeline stages\n
+    ------------------------------------------------
+    For every size, generates synthetic houses from schema.yaml in a scratch
+    directory (the dataset is served from a local file:// url), then runs the real
+    DataIngestion, DataValidation, DataTransformation and ModelTrainer stages in a
+    fresh process and records wall time, CPU time and peak RSS of each stage.
+    Peak RSS is reset before every stage through /proc/self/clear_refs where
+    available, CPU time includes the search workers, which are reaped after the
+    training stage.\n
+    Usage - python -m house_price.benchmark.training_benchmark --sizes 20000 100000 1000000 --output training.json
+'''
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import yaml
+
+from house_price.benchmark.serving_benchmark import REPO_CONFIG_DIR, get_git_commit, get_skipped_validation_artifacts, prepare_work_dir
+
+def reset_peak_rss() -> bool:
+    ''' Resets the VmHWM of this process on Linux, returns False when that is not possible.
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+def get_peak_rss_bytes() -> int:
+    try:
+        with open('/proc/self/status', 'r') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+def get_children_peak_rss_bytes() -> int:
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+def measure_stage(stage_name: str, stage, *args) -> tuple:
+    ''' Runs stage(*args), returns (its result, measurements of the stage).
+    '''
+    is_peak_reset = reset_peak_rss()
+    start_times = os.times()
+    start = time.perf_counter()
+    result = stage(*args)
+    if stage_name == 'model_training':
+        # Reap the loky search workers, so their CPU time is counted.
+        from joblib.externals.loky import get_reusable_executor
+        get_reusable_executor().shutdown(wait=True)
+    wall_seconds = time.perf_counter() - start
+    end_times = os.times()
+    return result, {
+        'stage': stage_name,
+        'wall_seconds': wall_seconds,
+        'cpu_seconds': (end_times.user - start_times.user) + (end_times.system - start_times.system),
+        'children_cpu_seconds': (
+            (end_times.children_user - start_times.children_user)
+            + (end_times.children_system - start_times.children_system)
+        ),
+        'peak_rss_bytes': get_peak_rss_bytes(),
+        'is_peak_rss_per_stage': is_peak_reset,
+        'children_peak_rss_bytes': get_children_peak_rss_bytes()
+    }
+
+def run_stages(config_file_path: str, skip_validation: bool) -> list:
+    ''' Runs the Pipeline stages in this process, the working directory must be the size's work dir.
+    '''
+    from house_price.config.configuration import Configuration
+    from house_price.pipeline.pipeline import Pipeline
+
+    configuration = Configuration(config_file_path=config_file_path)
+    pipeline = Pipeline(configuration=configuration)
+    measurements = []
+    data_ingestion_artifacts, measurement = measure_stage('data_ingestion', pipeline.start_data_ingestion)
+    measurements.append(measurement)
+    if skip_validation:
+        data_validation_artifacts = get_skipped_validation_artifacts(configuration)
+    else:
+        data_validation_artifacts, measurement = measure_stage('data_validation', pipeline.start_data_validation)
+        measurements.append(measurement)
+    data_transformation_artifacts, measurement = measure_stage(
+        'data_transformation', pipeline.start_data_transformation, data_ingestion_artifacts, data_validation_artifacts
+    )
+    measurements.append(measurement)
+    _, measurement = measure_stage(
+        'model_training', pipeline.start_model_training,
+        data_transformation_artifacts, data_ingestion_artifacts, data_validation_artifacts
+    )
+    measurements.append(measurement)
+    return measurements
+
+def prepare_size_dir(work_dir: str, row_count: int, n_estimators: int, seed: int) -> str:
+    ''' Scratch directory of one size, the trial store is disabled so every run really trains.
+    '''
+    size_dir = os.path.join(work_dir, f'rows_{row_count}')
+    os.makedirs(size_dir, exist_ok=True)
+    config_file_path = prepare_work_dir(size_dir, row_count, n_estimators, seed)
+    model_config_file_path = os.path.join(os.path.dirname(config_file_path), 'model.yaml')
+    with open(model_config_file_path, 'r') as file:
+        model_config = yaml.safe_load(file)
+    model_config.setdefault('trial_store', {})['enabled'] = False
+    with open(model_config_file_path, 'w') as file:
+        yaml.safe_dump(model_config, file, sort_keys=False)
+    return config_file_path
+
+def run_size(work_dir: str, row_count: int, n_estimators: int, seed: int, skip_validation: bool, timeout: float) -> dict:
+    ''' Generates the dataset of row_count rows and runs the stages in a fresh process.
+    '''
+    start = time.perf_counter()
+    config_file_path = prepare_size_dir(work_dir, row_count, n_estimators, seed)
+    result = {'rows': row_count, 'generate_seconds': time.perf_counter() - start, 'stages': []}
+    command = [sys.executable, '-m', 'house_price.benchmark.training_benchmark', '--run-stages', config_file_path]
+    if skip_validation:
+        command.append('--skip-validation')
+    try:
+        completed = subprocess.run(
+            command,
+            # house_price.constant resolves every artifact path from the working directory
+            cwd=os.path.dirname(os.path.dirname(config_file_path)),
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            env={**os.environ, 'PYTHONPATH': os.pathsep.join([os.path.dirname(REPO_CONFIG_DIR)] + sys.path)}
+        )
+        if completed.returncode != 0:
+            result['error'] = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f'exit code {completed.returncode}'
+        else:
+            result['stages'] = json.loads(completed.stdout.strip().splitlines()[-1])
+    except subprocess.TimeoutExpired:
+        result['error'] = f'timed out after {timeout} s'
+    return result
+
+def print_report(results: list) -> None:
+    print(f'{"rows":>10}  {"stage":<20}{"wall (s)":>10}{"cpu (s)":>10}{"workers cpu (s)":>16}{"peak rss (MB)":>15}{"rows/s":>12}')
+    for result in results:
+        if 'error' in result:
+            print(f'{result["rows"]:>10}  {"failed - " + result["error"]}')
+        for stage in result['stages']:
+            print(
+                f'{result["rows"]:>10}  {stage["stage"]:<20}{stage["wall_seconds"]:>10.2f}{stage["cpu_seconds"]:>10.2f}'
+                f'{stage["children_cpu_seconds"]:>16.2f}{stage["peak_rss_bytes"] / 2 ** 20:>15.0f}'
+                f'{result["rows"] / stage["wall_seconds"]:>12.0f}'
+            )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 100000, 1000000], help='dataset rows, up to 10M')
+    parser.add_argument('--work-dir', type=str, default=None, help='scratch directory, a temporary one by default')
+    parser.add_argument('--n-estimators', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=2022)
+    parser.add_argument('--skip-validation', action='store_true', help='skip the evidently drift report stage')
+    parser.add_argument('--timeout', type=float, default=None, help='seconds allowed for the stages of one size')
+    parser.add_argument('--output', type=str, default=None)
+    parser.add_argument('--run-stages', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_stages is not None:
+        print(json.dumps(run_stages(args.run_stages, args.skip_validation)))
+        return
+    output_file_path = os.path.abspath(args.output) if args.output else None
+    work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix='house_price_training_benchmark_'))
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    for row_count in args.sizes:
+        results.append(run_size(work_dir, row_count, args.n_estimators, args.seed, args.skip_validation, args.timeout))
+        print(f'{row_count} rows finished', file=sys.stderr)
+    report = {
+        'results': results,
+        'metadata': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': get_git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'n_estimators': args.n_estimators,
+            'work_dir': work_dir
+        }
+    }
+    print_report(results)
+    if output_file_path is not None:
+        with open(output_file_path, 'w') as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from house_price.entity.entity_config import BulkScoringConfig
+from house_price.entity.artifact_config import BulkScoringArtifacts
+from house_price.entity.model_cache import load_model_from_path
+from house_price.entity.model_predictor import HOUSING_CATEGORICAL_COLUMNS, HOUSING_INPUT_COLUMNS, HOUSING_NUMERICAL_COLUMNS, HousePriceBatch, HousePricePredictor
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+from house_price.util import util
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE_SUFFIX = '.checkpoint.json'
+
+PARQUET_FILE_EXTENSIONS = ('.parquet', '.pq')
+
+# Model and schema categories of the scoring worker process, set once by the pool initializer.
+_worker_model = None
+
+_worker_domain_value = None
+
+def _initialize_worker(model_path: str, domain_value: dict) -> None:
+    global _worker_model, _worker_domain_value
+    # Estimator artifacts are memory mapped, so the workers share the model pages.
+    _worker_model = load_model_from_path(model_path=model_path, mmap_mode='r')
+    _worker_domain_value = domain_value
+
+def _score_chunk(housing_df: pd.DataFrame) -> tuple:
+    ''' Scores the valid rows of a chunk, invalid rows get NaN and their error message.\n
+        Returns - (predictions, error message or None per row)
+    '''
+    housing_batch = HousePriceBatch.from_data_frame(housing_df)
+    row_errors = housing_batch.get_row_errors(domain_value=_worker_domain_value)
+    valid_indices = np.flatnonzero(np.equal(row_errors, None))
+    predictions = np.full(len(housing_batch), np.nan)
+    if len(valid_indices) == len(housing_batch):
+        predictions[:] = _worker_model.predict(housing_batch.get_housing_input_data_frame())
+    elif len(valid_indices) > 0:
+        valid_batch = housing_batch.take(valid_indices)
+        predictions[valid_indices] = _worker_model.predict(valid_batch.get_housing_input_data_frame())
+    return predictions, [None if row_error is None else str(row_error) for row_error in row_errors]
+
+
+class BulkScorer:
+    ''' Scores a large CSV or Parquet file with the served model.\n
+        ------------------------------------------------
+        The input is read chunk by chunk and every chunk is scored by a process
+        pool. At most max_pending_chunks chunks are in flight and the results are
+        written in input order, so memory is bounded by the chunk size. After every
+        written chunk a checkpoint records the rows and bytes written, a rerun
+        truncates the output to the last checkpoint and continues from there.
+        Rows with a value the model can not score (a category outside the schema
+        domain_value, an infinite number) are written with a NaN prediction and
+        the reason in error_column_name, so one bad row never stops the run.
+    '''
+
+    def __init__(self, bulk_scoring_config: BulkScoringConfig, model_dir: str) -> None:
+        try:
+            self.bulk_scoring_config = bulk_scoring_config
+            self.model_dir = model_dir
+            logger.info(f'{"=" * 20} Bulk scoring log started. {"=" * 20}')
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    @staticmethod
+    def get_input_signature(input_file_path: str) -> dict:
+        stat = os.stat(input_file_path)
+        return {
+            'input_file_path': os.path.abspath(input_file_path),
+            'input_size': stat.st_size,
+            'input_mtime_ns': stat.st_mtime_ns
+        }
+
+    def read_chunks(self, input_file_path: str, columns: list, skip_rows: int = 0):
+        ''' Yields DataFrames of at most chunk_size rows, after skipping the first skip_rows rows.
+        '''
+        chunk_size = self.bulk_scoring_config.chunk_size
+        if input_file_path.endswith(PARQUET_FILE_EXTENSIONS):
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(input_file_path)
+            for record_batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+                if skip_rows >= record_batch.num_rows:
+                    skip_rows -= record_batch.num_rows
+                    continue
+                yield record_batch.slice(skip_rows).to_pandas()
+                skip_rows = 0
+            return
+        dtype = {column: 'float64' for column in HOUSING_NUMERICAL_COLUMNS}
+        dtype.update({column: 'object' for column in HOUSING_CATEGORICAL_COLUMNS})
+        yield from pd.read_csv(
+            input_file_path,
+            usecols=columns,
+            dtype=dtype,
+            chunksize=chunk_size,
+            skiprows=range(1, skip_rows + 1)
+        )
+
+    def read_checkpoint(self, checkpoint_file_path: str, input_signature: dict, keep_columns: list) -> dict:
+        with open(checkpoint_file_path, 'r') as file:
+            checkpoint = json.load(file)
+        for key, value in input_signature.items():
+            if checkpoint[key] != value:
+                raise Exception(f'{checkpoint_file_path} was written for another input ({key} differs), rerun with restart.')
+        if checkpoint['keep_columns'] != keep_columns:
+            raise Exception(f'{checkpoint_file_path} was written with other keep_columns, rerun with restart.')
+        if not os.path.exists(checkpoint['model_path']):
+            raise Exception(f'Model {checkpoint["model_path"]} of the checkpoint no longer exists, rerun with restart.')
+        return checkpoint
+
+    def initiate_bulk_scoring(
+        self,
+        input_file_path: str,
+        output_file_path: str,
+        keep_columns: list = None,
+        restart: bool = False
+    ) -> BulkScoringArtifacts:
+        ''' Scores input_file_path into the CSV output_file_path\n
+            ------------------------------------------------
+            Takes - input CSV or Parquet path, output CSV path, input columns copied
+            to the output (ids), restart to ignore an existing checkpoint\n
+            Returns - BulkScoringArtifacts
+        '''
+        try:
+            keep_columns = list(keep_columns or [])
+            checkpoint_file_path = f'{output_file_path}{CHECKPOINT_FILE_SUFFIX}'
+            input_signature = self.get_input_signature(input_file_path)
+            if not restart and os.path.exists(checkpoint_file_path):
+                checkpoint = self.read_checkpoint(checkpoint_file_path, input_signature, keep_columns)
+                logger.info('Resuming bulk scoring after %s rows', checkpoint['rows_written'])
+            else:
+                checkpoint = {
+                    **input_signature,
+                    'keep_columns': keep_columns,
+                    # Pin the model, a resumed run must not mix two model versions in one output.
+                    'model_path': HousePricePredictor(model_dir=self.model_dir).get_latest_model_path(),
+                    'rows_written': 0,
+                    'invalid_rows_written': 0,
+                    'output_bytes': 0,
+                    'is_completed': False
+                }
+            os.makedirs(os.path.dirname(os.path.abspath(output_file_path)), exist_ok=True)
+            start = time.perf_counter()
+            rows_scored = 0
+            if not checkpoint['is_completed']:
+                # Drop whatever was written after the last checkpoint before a crash.
+                with open(output_file_path, 'a') as output_file:
+                    output_file.truncate(checkpoint['output_bytes'])
+                rows_scored = self.__score(input_file_path, output_file_path, checkpoint_file_path, checkpoint, start)
+                checkpoint['is_completed'] = True
+                util.write_json_file_atomically(checkpoint_file_path, checkpoint)
+            elapsed_seconds = time.perf_counter() - start
+            bulk_scoring_artifacts = BulkScoringArtifacts(
+                output_file_path=output_file_path,
+                model_path=checkpoint['model_path'],
+                row_count=checkpoint['rows_written'],
+                invalid_row_count=checkpoint.get('invalid_rows_written', 0),
+                elapsed_seconds=elapsed_seconds,
+                rows_per_second=rows_scored / elapsed_seconds if elapsed_seconds else 0.0
+            )
+            logger.info('Bulk scoring artifacts - %s', bulk_scoring_artifacts)
+            logger.info(f'{"=" * 20} Bulk scoring log finished. {"=" * 20}')
+
+            return bulk_scoring_artifacts
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def __score(self, input_file_path: str, output_file_path: str, checkpoint_file_path: str, checkpoint: dict, start: float) -> int:
+        keep_columns = checkpoint['keep_columns']
+        columns = list(dict.fromkeys(HOUSING_INPUT_COLUMNS + keep_columns))
+        worker_count = self.bulk_scoring_config.worker_count
+        max_pending_chunks = self.bulk_scoring_config.max_pending_chunks or 2 * worker_count
+        prediction_column_name = self.bulk_scoring_config.prediction_column_name
+        error_column_name = self.bulk_scoring_config.error_column_name
+        domain_value = util.read_schema(schema_file_path=self.bulk_scoring_config.schema_file_path).domain_value
+        rows_scored = 0
+        with ProcessPoolExecutor(
+            max_workers=worker_count,
+            initializer=_initialize_worker,
+            initargs=(checkpoint['model_path'], domain_value)
+        ) as executor, open(output_file_path, 'a') as output_file:
+
+            def write_oldest_chunk() -> None:
+                nonlocal rows_scored
+                output_df, future = pending_chunks.popleft()
+                predictions, row_errors = future.result()
+                output_df[prediction_column_name] = predictions
+                output_df[error_column_name] = row_errors
+                invalid_row_count = len(row_errors) - row_errors.count(None)
+                if invalid_row_count > 0:
+                    logger.warning(
+                        'Left %s invalid rows unscored after input row %s, first - %s',
+                        invalid_row_count, checkpoint['rows_written'],
+                        next(row_error for row_error in row_errors if row_error is not None)
+                    )
+                checkpoint['invalid_rows_written'] = checkpoint.get('invalid_rows_written', 0) + invalid_row_count
+                output_df.to_csv(output_file, header=checkpoint['output_bytes'] == 0, index=False)
+                output_file.flush()
+                os.fsync(output_file.fileno())
+                rows_scored += len(output_df)
+                checkpoint['rows_written'] += len(output_df)
+                checkpoint['output_bytes'] = output_file.tell()
+                util.write_json_file_atomically(checkpoint_file_path, checkpoint)
+                logger.info(
+                    'Scored %s rows, %.0f rows/s',
+                    checkpoint['rows_written'], rows_scored / (time.perf_counter() - start)
+                )
+
+            pending_chunks = deque()
+            for housing_df in self.read_chunks(input_file_path, columns, skip_rows=checkpoint['rows_written']):
+                output_df = housing_df[keep_columns].reset_index(drop=True)
+                pending_chunks.append((output_df, executor.submit(_score_chunk, housing_df[HOUSING_INPUT_COLUMNS])))
+                # Results are written in input order, so wait on the oldest chunk first.
+                if len(pending_chunks) >= max_pending_chunks:
+                    write_oldest_chunk()
+            while pending_chunks:
+                write_oldest_chunk()
+        return rows_scored
@@ -1,72 +1,97 @@
-import traceback
 import os
 import sys
-import urllib.request
-import tarfile
 
 import pandas as pd
-from sklearn.model_selection import StratifiedShuffleSplit
 import numpy as np
 
 from house_price.entity.entity_config import DataIngestionConfig
 from house_price.entity.artifact_config import DataIngestionArtifacts
-from house_price.logger import logging
+from house_price.entity.download_cache import DownloadCache
+from house_price.util import util
+from house_price.logger import log_exception, logging
 from house_price.exception import HousePricePredictionException
 logger = logging.getLogger(__name__)
 
+SPLIT_MODES = ('shuffle', 'streaming')
+
+INCOME_CATEGORY_BINS = [0.0, 1.5, 3.0, 4.5, 6.0, np.inf]
+
+INCOME_CATEGORY_LABELS = [1, 2, 3, 4, 5]
+
+def get_hash_fractions(df: pd.DataFrame) -> np.ndarray:
+    ''' Deterministic number in [0, 1) per row, from the row's values only.
+        Numerical columns are hashed as float64 and the others as str, so a
+        column parsed as int in one chunk and float in another hashes the same.
+    '''
+    key_df = pd.DataFrame({
+        column: df[column].astype('float64') if pd.api.types.is_numeric_dtype(df[column]) else df[column].astype(str)
+        for column in df.columns
+    })
+    hashes = pd.util.hash_pandas_object(key_df, index=False).to_numpy()
+    return (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
 class DataIngestion:
 
     def __init__(self, data_ingestion_config: DataIngestionConfig) -> None:
         try:
             self.data_ingestion_config = data_ingestion_config
+            self.download_cache = DownloadCache(cache_dir=data_ingestion_config.download_cache_dir)
             logger.info(f'{"=" * 20} Data ingestion log started. {"=" * 20}')
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
         
-    def __download_data_from_url(self, url: str) -> str:
+    def __download_data_from_url(self, url: str) -> tuple:
+        ''' Fetches the dataset through the download cache, url may also be a file:// url or a local path.
+        '''
         try:
-            file_name = os.path.basename(url)
-            tgz_dir = self.data_ingestion_config.downloaded_zip_file_path
-            os.makedirs(tgz_dir, exist_ok=True)
-            tgz_file_path = os.path.join(tgz_dir, file_name)
-            logger.info(f'Started downloading the file from {url} at {tgz_file_path}')
-            urllib.request.urlretrieve(url, tgz_file_path)
-            logger.info(f'File downloaded at {tgz_file_path}')
-            
-            return tgz_file_path
+            logger.info('Fetching the dataset from %s', url)
+            archive_file_path, sha256 = self.download_cache.fetch(
+                source=url,
+                expected_sha256=self.data_ingestion_config.dataset_sha256
+            )
+            logger.info('Dataset %s available at %s', sha256, archive_file_path)
+
+            return archive_file_path, sha256
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
-    def __extract_tgz_file(self, tar_file_path: str) -> None:
+    def __extract_tgz_file(self, tar_file_path: str, sha256: str) -> str:
         try:
-            if tarfile.is_tarfile(tar_file_path):
-                raw_data_dir = self.data_ingestion_config.raw_data_path
-                os.makedirs(raw_data_dir, exist_ok=True)
-                logger.info(f'Extracting tgz file at {raw_data_dir}')
-                with tarfile.open(tar_file_path) as file:
-                    file.extractall(raw_data_dir)
-                logger.info(f'File extracted at {raw_data_dir}')
-            else:
-                logger.info('The file is not a valid tgz file.')
+            # A plain data file keeps the name of its url, the reader needs its extension.
+            return self.download_cache.extract(
+                archive_file_path=tar_file_path,
+                sha256=sha256,
+                file_name=DownloadCache.get_source_file_name(self.data_ingestion_config.dataset_download_url)
+            )
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
+    @staticmethod
+    def get_raw_data_file_path(raw_data_dir: str) -> str:
+        # The first data file, the cache keeps its marker files hidden.
+        file_name = sorted(name for name in os.listdir(raw_data_dir) if not name.startswith('.'))[0]
+        return os.path.join(raw_data_dir, file_name)
+
     def __split_data(self, raw_data_dir: str) -> None:
         try:
-            file_name = os.listdir(raw_data_dir)[0]
-            file_path = os.path.join(raw_data_dir, file_name)
-            df = pd.read_csv(filepath_or_buffer=file_path)
+            from sklearn.model_selection import StratifiedShuffleSplit
+
+            df = util.read_dataframe(
+                file_path=self.get_raw_data_file_path(raw_data_dir),
+                schema_file_path=self.data_ingestion_config.schema_file_path,
+                engine=self.data_ingestion_config.csv_engine
+            )
             df['income_category'] = pd.cut(
                 df['median_income'],
-                bins=[0.0, 1.5, 3.0, 4.5, 6.0, np.inf],
-                labels=[1, 2, 3, 4, 5]
+                bins=INCOME_CATEGORY_BINS,
+                labels=INCOME_CATEGORY_LABELS
             )
             sss = StratifiedShuffleSplit(
                 n_splits=1,
-                test_size=0.2,
+                test_size=self.data_ingestion_config.test_size,
                 random_state=2022
             )
             for train_idx, test_idx in sss.split(X=df, y=df['income_category']):
@@ -76,16 +101,61 @@ class DataIngestion:
 
             return train_df, test_df
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def __stream_split_data(self, raw_data_dir: str, train_file_path: str, test_file_path: str) -> None:
+        ''' Splits the raw data chunk by chunk into the train and test files\n
+            ------------------------------------------------
+            A row goes to test when the hash fraction of its key columns (all the
+            columns by default) salted with its income category is below test_size.
+            The salt makes the draws of every income category independent, so each
+            category is split test_size / (1 - test_size) in expectation, and a row
+            keeps its side across runs and when rows are added. Memory is bounded by
+            chunk_size whatever the size of the data.
+        '''
+        try:
+            test_size = self.data_ingestion_config.test_size
+            key_columns = self.data_ingestion_config.split_key_columns
+            category_counts = {}
+            schema = util.read_schema(schema_file_path=self.data_ingestion_config.schema_file_path)
+            with util.DataFrameAppender(train_file_path, schema=schema) as train_appender, \
+                    util.DataFrameAppender(test_file_path, schema=schema) as test_appender:
+                for chunk_df in pd.read_csv(
+                    self.get_raw_data_file_path(raw_data_dir),
+                    chunksize=self.data_ingestion_config.chunk_size,
+                    dtype=util.get_csv_dtypes(schema)
+                ):
+                    income_category = pd.cut(
+                        chunk_df['median_income'],
+                        bins=INCOME_CATEGORY_BINS,
+                        labels=INCOME_CATEGORY_LABELS
+                    ).cat.codes
+                    key_df = chunk_df[key_columns] if key_columns else chunk_df
+                    is_test = get_hash_fractions(key_df.assign(income_category=income_category.to_numpy())) < test_size
+                    train_appender.append(chunk_df[~is_test])
+                    test_appender.append(chunk_df[is_test])
+                    for category, category_is_test in pd.Series(is_test).groupby(income_category.to_numpy()):
+                        test_count, row_count = category_counts.get(category, (0, 0))
+                        category_counts[category] = (test_count + int(category_is_test.sum()), row_count + len(category_is_test))
+            for category, (test_count, row_count) in sorted(category_counts.items()):
+                logger.info('Income category %s - %s rows, %.4f in test', category + 1, row_count, test_count / row_count)
+            logger.info(
+                'Finished streaming the split, %s train and %s test rows.',
+                train_appender.row_count, test_appender.row_count
+            )
+        except Exception as e:
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def initiate_data_ingestion(self) -> DataIngestionArtifacts:
         try:
             url = self.data_ingestion_config.dataset_download_url
-            tgz_file_path = self.__download_data_from_url(url)
-            self.__extract_tgz_file(tgz_file_path)
-            raw_data_dir = self.data_ingestion_config.raw_data_path
-            train_df, test_df = self.__split_data(raw_data_dir)
+            tgz_file_path, sha256 = self.__download_data_from_url(url)
+            raw_data_dir = self.__extract_tgz_file(tgz_file_path, sha256)
+            split_mode = self.data_ingestion_config.split_mode
+            if split_mode not in SPLIT_MODES:
+                raise Exception(f'Unknown split mode {split_mode}, expected one of {SPLIT_MODES}.')
             train_data_dir = self.data_ingestion_config.train_data_dir
             test_data_dir = self.data_ingestion_config.test_data_dir
             os.makedirs(train_data_dir, exist_ok=True)
@@ -98,9 +168,14 @@ class DataIngestion:
                 self.data_ingestion_config.test_data_dir,
                 self.data_ingestion_config.test_data_file_name
             )
-            train_df.to_csv(path_or_buf=train_file_path, index=False)
-            test_df.to_csv(path_or_buf=test_file_path, index=False)
-            logger.info('Training and testing csv file is created.')
+            if split_mode == 'streaming':
+                self.__stream_split_data(raw_data_dir, train_file_path, test_file_path)
+            else:
+                schema = util.read_schema(schema_file_path=self.data_ingestion_config.schema_file_path)
+                train_df, test_df = self.__split_data(raw_data_dir)
+                util.write_dataframe(train_df, train_file_path, schema=schema)
+                util.write_dataframe(test_df, test_file_path, schema=schema)
+            logger.info('Training and testing files are created.')
             logger.info(f'{"=" * 20} Data ingestion log finished. {"=" * 20}')
             
             return DataIngestionArtifacts(
@@ -110,6 +185,6 @@ class DataIngestion:
                 message='Data ingestion is successfull.'
             )
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
             
\ No newline at end of file
@@ -1,4 +1,3 @@
-import traceback
 import sys
 import os
 import dill
@@ -10,11 +9,13 @@ from sklearn.impute import SimpleImputer
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 import numpy as np
 
-from house_price.entity.entity_config import DataTransformationConfig
+from house_price.entity.entity_config import DataTransformationConfig, IncrementalTrainingConfig
 from house_price.entity.artifact_config import DataIngestionArtifacts, DataValidationArtifacts, DataTransformationArtifacts
+from house_price.entity.compiled_preprocessor import CompiledPreprocessor
+from house_price.entity.model_registry import ModelRegistry
 from house_price.exception import HousePricePredictionException
 from house_price.util import util
-from house_price.logger import logging
+from house_price.logger import log_exception, logging
 logger = logging.getLogger(__name__)
 
 class FeatureGenerator(BaseEstimator, TransformerMixin):
@@ -49,7 +50,7 @@ class FeatureGenerator(BaseEstimator, TransformerMixin):
             self.households_index = households_index
             self.total_bedrooms_index = total_bedrooms_index
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def fit(self, X, y=None) -> object:
@@ -71,7 +72,7 @@ class FeatureGenerator(BaseEstimator, TransformerMixin):
 
             return generated_feature
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
 class DataTransformation:
@@ -80,24 +81,26 @@ class DataTransformation:
         self,
         data_ingestion_artifacts: DataIngestionArtifacts,
         data_validation_artifacts: DataValidationArtifacts,
-        data_transformation_config: DataTransformationConfig
+        data_transformation_config: DataTransformationConfig,
+        incremental_training_config: IncrementalTrainingConfig = None
     ) -> None:
         try:
             self.data_ingestion_artifacts = data_ingestion_artifacts
             self.data_validation_artifacts = data_validation_artifacts
             self.data_transformation_config = data_transformation_config
+            self.incremental_training_config = incremental_training_config
             logger.info(
                 f'{"=" * 20} Data transformtaion log started. {"=" * 20}')
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def column_transformer(self) -> ColumnTransformer:
         try:
             schema_file_path = self.data_validation_artifacts.schema_file_path
-            schema = util.read_yaml_file(schema_file_path)
-            numerical_columns = schema['numerical_columns']
-            categorical_columns = schema['categorical_columns']
+            schema = util.read_schema(schema_file_path=schema_file_path)
+            numerical_columns = schema.numerical_columns
+            categorical_columns = schema.categorical_columns
             numerical_pipeline = Pipeline(
                 steps=[
                     ('imputer', SimpleImputer(strategy='median')),
@@ -128,27 +131,31 @@ class DataTransformation:
             logger.info('Column transformer is created successfullt.')
             return column_transformer
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def get_dataframe(self) -> tuple:
         try:
-            logger.info('Reading csv files.')
+            logger.info('Reading train and test files.')
             schema_file_path = self.data_validation_artifacts.schema_file_path
             train_file_path = self.data_ingestion_artifacts.train_file_path
             test_file_path = self.data_ingestion_artifacts.test_file_path
+            # Only the schema columns, the features and the target.
+            columns = list(util.read_schema(schema_file_path=schema_file_path).columns)
             train_df = util.read_dataframe(
                 file_path=train_file_path,
-                schema_file_path=schema_file_path
+                schema_file_path=schema_file_path,
+                columns=columns
             )
             test_df = util.read_dataframe(
                 file_path=test_file_path,
-                schema_file_path=schema_file_path
+                schema_file_path=schema_file_path,
+                columns=columns
             )
 
             return train_df, test_df
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def get_features_and_target(self) -> tuple:
@@ -156,10 +163,7 @@ class DataTransformation:
             logger.info('Generating X, y, X_test, and y_test')
             schema_file_path = self.data_validation_artifacts.schema_file_path
             train_df, test_df = self.get_dataframe()
-            schema = util.read_yaml_file(
-                file_path=schema_file_path
-            )
-            target_column_name = schema['target_column_name']
+            target_column_name = util.read_schema(schema_file_path=schema_file_path).target_column_name
             train_features = train_df.drop(
                 labels=[target_column_name],
                 axis=1
@@ -173,41 +177,102 @@ class DataTransformation:
 
             return train_features, train_target, test_features, test_target
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def compile_column_transformer(self, column_transformer: ColumnTransformer, features) -> CompiledPreprocessor:
+        ''' Compiles the fitted column transformer into a CompiledPreprocessor and
+            checks that both produce the same output on the given features.
+        '''
+        try:
+            schema_file_path = self.data_validation_artifacts.schema_file_path
+            schema = util.read_schema(schema_file_path=schema_file_path)
+            compiled_preprocessor = CompiledPreprocessor.from_column_transformer(
+                column_transformer=column_transformer,
+                domain_value=schema.domain_value
+            )
+            expected_features = column_transformer.transform(features)
+            if hasattr(expected_features, 'toarray'):
+                expected_features = expected_features.toarray()
+            compiled_features = compiled_preprocessor.transform(features)
+            if not np.allclose(expected_features, compiled_features, rtol=1e-12, atol=1e-12, equal_nan=True):
+                max_difference = np.nanmax(np.abs(expected_features - compiled_features))
+                raise Exception(f'Compiled preprocessor output differs by up to {max_difference}.')
+            logger.info('Compiled preprocessor matches the column transformer output.')
+
+            return compiled_preprocessor
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def get_promoted_preprocessor(self) -> tuple:
+        ''' Preprocessor of the promoted model, which an incremental update of that
+            model has to keep, so the new trees see the features the old ones saw.\n
+            Returns - (promoted version, preprocessing object), (None, None) when a
+            new preprocessor is to be fitted
+        '''
+        try:
+            incremental_training_config = self.incremental_training_config
+            if incremental_training_config is None or not incremental_training_config.enabled:
+                return None, None
+            current_entry = ModelRegistry(model_dir=incremental_training_config.model_export_dir).get_current_entry()
+            if current_entry is None:
+                logger.info('No promoted model to update, fitting a new preprocessor.')
+                return None, None
+            version_dir = os.path.join(incremental_training_config.model_export_dir, current_entry['path'])
+            if not os.path.exists(os.path.join(version_dir, incremental_training_config.raw_model_file_name)):
+                logger.info('Promoted model version %s can not be updated, fitting a new preprocessor.', current_entry['version'])
+                return None, None
+            with open(os.path.join(version_dir, incremental_training_config.trained_model_file_name), 'rb') as file_object:
+                estimator_model = dill.load(file_object)
+            logger.info('Reusing the preprocessor of promoted model version %s.', current_entry['version'])
+
+            return current_entry['version'], estimator_model.preprocessing_object
+        except Exception as e:
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def initiate_data_transformation(self) -> DataTransformationArtifacts:
         try:
             train_features, train_target, test_features, test_target = self.get_features_and_target()
-            column_transformer = self.column_transformer()
-            processed_train_features = column_transformer.fit_transform(train_features)
-            processed_test_features = column_transformer.transform(test_features)
-            training_data = np.c_[
-                processed_train_features,
-                np.array(train_target)
-            ]
-            testing_data = np.c_[
-                processed_test_features,
-                np.array(test_target)
-            ]
+            preprocessing_model_version, column_transformer = self.get_promoted_preprocessor()
+            if column_transformer is None:
+                column_transformer = self.column_transformer()
+                processed_train_features = column_transformer.fit_transform(train_features)
+            else:
+                processed_train_features = column_transformer.transform(train_features)
             logger.info('Saving training and testing data.')
-            transformed_train_file_path = os.path.join(
-                self.data_transformation_config.transformed_train_dir,
-                self.data_transformation_config.transformed_train_file_name
-            )
-            transformed_test_file_path = os.path.join(
-                self.data_transformation_config.transformed_test_dir,
-                self.data_transformation_config.transformed_test_file_name
-            )
             os.makedirs(self.data_transformation_config.transformed_train_dir, exist_ok=True)
             os.makedirs(self.data_transformation_config.transformed_test_dir, exist_ok=True)
-            np.save(
-                file=transformed_train_file_path,
-                arr=training_data
+            transformed_train_file_path = util.save_features_and_target(
+                features=processed_train_features,
+                target=train_target,
+                features_file_path=os.path.join(
+                    self.data_transformation_config.transformed_train_dir,
+                    self.data_transformation_config.transformed_train_file_name
+                ),
+                target_file_path=os.path.join(
+                    self.data_transformation_config.transformed_train_dir,
+                    self.data_transformation_config.transformed_train_target_file_name
+                ),
+                dtype=self.data_transformation_config.transformed_dtype,
+                sparse_density_threshold=self.data_transformation_config.sparse_density_threshold
             )
-            np.save(
-                file=transformed_test_file_path,
-                arr=testing_data
+            # Only one transformed split is held in memory at a time.
+            del processed_train_features
+            transformed_test_file_path = util.save_features_and_target(
+                features=column_transformer.transform(test_features),
+                target=test_target,
+                features_file_path=os.path.join(
+                    self.data_transformation_config.transformed_test_dir,
+                    self.data_transformation_config.transformed_test_file_name
+                ),
+                target_file_path=os.path.join(
+                    self.data_transformation_config.transformed_test_dir,
+                    self.data_transformation_config.transformed_test_target_file_name
+                ),
+                dtype=self.data_transformation_config.transformed_dtype,
+                sparse_density_threshold=self.data_transformation_config.sparse_density_threshold
             )
             logger.info('Saving the processed object.')
             processed_object_file_path = os.path.join(
@@ -217,18 +282,41 @@ class DataTransformation:
             os.makedirs(self.data_transformation_config.processed_object_dir, exist_ok=True)
             with open(processed_object_file_path, 'wb') as file_object:
                 dill.dump(column_transformer, file_object)
+            logger.info('Saving the compiled processed object.')
+            if isinstance(column_transformer, CompiledPreprocessor):
+                compiled_preprocessor = column_transformer
+            else:
+                compiled_preprocessor = self.compile_column_transformer(
+                    column_transformer=column_transformer,
+                    features=test_features
+                )
+            compiled_object_file_path = os.path.join(
+                self.data_transformation_config.processed_object_dir,
+                self.data_transformation_config.compiled_object_file_name
+            )
+            compiled_preprocessor.save(file_path=compiled_object_file_path)
             is_transformed = True
             data_tranformation_artifacts = DataTransformationArtifacts(
                 is_transformed=is_transformed,
                 message='Data transformed and saved.',
                 processed_object_file_path=processed_object_file_path,
+                compiled_object_file_path=compiled_object_file_path,
+                preprocessing_model_version=preprocessing_model_version,
                 transformed_train_file_path=transformed_train_file_path,
-                transformed_test_file_path=transformed_test_file_path
+                transformed_test_file_path=transformed_test_file_path,
+                transformed_train_target_file_path=os.path.join(
+                    self.data_transformation_config.transformed_train_dir,
+                    self.data_transformation_config.transformed_train_target_file_name
+                ),
+                transformed_test_target_file_path=os.path.join(
+                    self.data_transformation_config.transformed_test_dir,
+                    self.data_transformation_config.transformed_test_target_file_name
+                )
             )
 
             logger.info(f'{"=" * 20} Data transformtaion log finished. {"=" * 20}')
             return data_tranformation_artifacts
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
         
@@ -1,18 +1,13 @@
-import traceback
 import os
 import sys
 
-import pandas as pd
-from evidently.model_profile import Profile
-from evidently.model_profile.sections import DataDriftProfileSection
-from evidently.dashboard import Dashboard
-from evidently.dashboard.tabs import DataDriftTab
 import json
 
 from house_price.entity.entity_config import DataValidationConfig, DataIngestionConfig
 from house_price.entity.artifact_config import DataValidationArtifacts
 from house_price.exception import HousePricePredictionException
-from house_price.logger import logging
+from house_price.util import util
+from house_price.logger import log_exception, logging
 logger = logging.getLogger(__name__)
 
 class DataValidation:
@@ -25,9 +20,10 @@ class DataValidation:
         try:
             self.data_validation_config = data_validation_config
             self.data_ingestion_config = data_ingestion_config
+            self._data = None
             logger.info(f'{"=" * 20} Data validation log started. {"=" * 20}')
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def data_exists(self) -> bool:
@@ -54,29 +50,41 @@ class DataValidation:
 
             return is_data_exists
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def get_data(self) -> tuple:
+        ''' Train and test dataframes, read once and shared by the drift report,
+            page and check.
+        '''
         try:
-            logger.info('Reading csv files.')
-            train_df = pd.read_csv(
-                filepath_or_buffer=os.path.join(
+            if self._data is not None:
+                return self._data
+            logger.info('Reading train and test files.')
+            schema_file_path = self.data_validation_config.schema_file_path
+            columns = list(util.read_schema(schema_file_path=schema_file_path).columns)
+            train_df = util.read_dataframe(
+                file_path=os.path.join(
                     self.data_ingestion_config.train_data_dir,
                     self.data_ingestion_config.train_data_file_name
-                )
+                ),
+                schema_file_path=schema_file_path,
+                columns=columns
             )
-            test_df = pd.read_csv(
-                filepath_or_buffer=os.path.join(
+            test_df = util.read_dataframe(
+                file_path=os.path.join(
                     self.data_ingestion_config.test_data_dir,
                     self.data_ingestion_config.test_data_file_name
-                )
+                ),
+                schema_file_path=schema_file_path,
+                columns=columns
             )
-            logger.info('Finished reading csv files.')
+            logger.info('Finished reading train and test files.')
+            self._data = train_df, test_df
 
-            return train_df, test_df
+            return self._data
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
 
@@ -89,11 +97,14 @@ class DataValidation:
 
             return is_validated
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def generate_data_drift_report(self) -> json:
         try:
+            # evidently pulls in plotly and its dashboards, only import it when a report is built.
+            from evidently.model_profile import Profile
+            from evidently.model_profile.sections import DataDriftProfileSection
             profile = Profile(sections=[DataDriftProfileSection()])
             train_df, test_df = self.get_data()
             profile.calculate(train_df, test_df)
@@ -110,11 +121,13 @@ class DataValidation:
 
             return report
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def generate_data_drift_page(self) -> None:
         try:
+            from evidently.dashboard import Dashboard
+            from evidently.dashboard.tabs import DataDriftTab
             dashboard = Dashboard(tabs=[DataDriftTab()])
             train_df, test_df = self.get_data()
             dashboard.calculate(train_df, test_df)
@@ -123,7 +136,7 @@ class DataValidation:
             dashboard.save(self.data_validation_config.report_page_file_path)
             logger.info('Data drift report saved.')
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def is_data_drift(self) -> bool:
@@ -137,7 +150,7 @@ class DataValidation:
 
             return is_data_drift
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def initiate_data_validation(self) -> DataValidationArtifacts:
@@ -165,5 +178,5 @@ class DataValidation:
             
             return data_validation_artifacts
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
\ No newline at end of file
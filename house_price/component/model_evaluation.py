@@ -1,6 +1,5 @@
 import sys
 import os
-import traceback
 
 import dill
 import yaml
@@ -9,7 +8,7 @@ from house_price.entity.entity_config import ModelEvaluationConfig
 from house_price.entity.artifact_config import DataIngestionArtifacts, DataValidationArtifacts, ModelEvaluationArtifacts, ModelTrainingArtifacts
 from house_price.exception import HousePricePredictionException
 from house_price.util import util
-from logger import logging
+from house_price.logger import log_exception, logging
 logger = logging.getLogger(__name__)
 
 class ModelEvaluation:
@@ -27,7 +26,7 @@ class ModelEvaluation:
             self.data_validation_artifacts = data_validation_artifacts
             self.model_training_artifacts = model_training_artifacts
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def get_best_model(self) -> None:
@@ -48,7 +47,7 @@ class ModelEvaluation:
                 model = dill.load(file)
             return model
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def update_evaluation_report(self) -> None:
@@ -0,0 +1,53 @@
+import sys
+import os
+
+from house_price.entity.entity_config import PushModelConfig
+from house_price.entity.artifact_config import ModelTrainingArtifacts, ModelPusherArtifacts
+from house_price.entity.model_registry import ModelRegistry
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+logger = logging.getLogger(__name__)
+
+class ModelPusher:
+
+    def __init__(self, push_model_config: PushModelConfig, model_training_artifacts: ModelTrainingArtifacts) -> None:
+        try:
+            self.push_model_config = push_model_config
+            self.model_training_artifacts = model_training_artifacts
+            logger.info(f'{"=" * 20} Model pusher log started. {"=" * 20}')
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def initiate_model_pusher(self) -> ModelPusherArtifacts:
+        try:
+            model_registry = ModelRegistry(model_dir=self.push_model_config.model_export_dir)
+            trained_model_dir = os.path.dirname(self.model_training_artifacts.trained_model_file_path)
+            model_path = os.path.relpath(
+                self.model_training_artifacts.serving_model_path,
+                trained_model_dir
+            )
+            model_version = model_registry.register(
+                source_dir=trained_model_dir,
+                model_path=model_path,
+                metrics={
+                    'model_accuracy': float(self.model_training_artifacts.model_accuracy),
+                    'train_accuracy': float(self.model_training_artifacts.train_accuracy),
+                    'test_accuracy': float(self.model_training_artifacts.test_accuracy),
+                    'train_rsme': float(self.model_training_artifacts.train_rsme),
+                    'test_rsme': float(self.model_training_artifacts.test_rsme)
+                }
+            )
+            model_registry.promote(version=model_version)
+            export_model_file_path = model_registry.get_current_model_path()
+            logger.info('Model version %s pushed to %s', model_version, export_model_file_path)
+            logger.info(f'{"=" * 20} Model pusher log finished. {"=" * 20}')
+
+            return ModelPusherArtifacts(
+                is_model_pushed=True,
+                export_model_file_path=export_model_file_path,
+                model_version=model_version
+            )
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
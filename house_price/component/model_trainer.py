@@ -1,45 +1,53 @@
 import sys
-import traceback
 import os
+import time
 
 import numpy as np
 import dill
 
-from house_price.entity.entity_config import ModelTrainingConfig
+from house_price.entity.entity_config import IncrementalTrainingConfig, ModelTrainingConfig
 from house_price.entity.artifact_config import DataTransformationArtifacts, ModelTrainingArtifacts
 from house_price.entity.model_factory import ModelFactory
+from house_price.entity.estimator_model import HousePriceEstimatorModel
+from house_price.entity.compiled_preprocessor import CompiledPreprocessor
+from house_price.entity.compiled_model import compile_model
+from house_price.entity.model_artifact import save_estimator_artifact
+from house_price.entity.model_registry import ModelRegistry
 from house_price.exception import HousePricePredictionException
 from house_price import constant
-from house_price.logger import logging
+from house_price.util import util
+from house_price.logger import log_exception, logging
 logger = logging.getLogger(__name__)
 
 class ModelTrainer:
-    def __init__(self, model_training_config: ModelTrainingConfig, data_transformation_artifacts: DataTransformationArtifacts) -> None:
+    def __init__(
+        self,
+        model_training_config: ModelTrainingConfig,
+        data_transformation_artifacts: DataTransformationArtifacts,
+        incremental_training_config: IncrementalTrainingConfig = None,
+        retransform_data=None
+    ) -> None:
+        ''' ModelTrainer Initialization
+            retransform_data: callable returning the DataTransformationArtifacts of the same
+            data transformed with a newly fitted preprocessor, called when an incremental
+            update falls back to full retraining
+        '''
         try:
             self.model_training_config = model_training_config
             self.data_transformation_artifacts = data_transformation_artifacts
+            self.incremental_training_config = incremental_training_config
+            self.retransform_data = retransform_data
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
-    def initiate_model_trainer(self) -> ModelTrainingArtifacts:
-        logger.info(f'{"=" * 20} Model training log started. {"=" * 20}')
-        training_array = np.load(
-            file=self.data_transformation_artifacts.transformed_train_file_path
-        )
-        testing_array = np.load(
-            file=self.data_transformation_artifacts.transformed_test_file_path
-        )
-        X_train, y_train = training_array[:, :-1], training_array[:, -1]
-        X_test, y_test = testing_array[:, :-1], testing_array[:, -1]
-        model_config_file_path = os.path.join(
-            self.model_training_config.model_config_dir,
-            self.model_training_config.model_config_file_name
-        )
-        logger.info('Training and testing data loaded successfully.')
-        model_factory = ModelFactory(
-            model_config_file_path=model_config_file_path
-        )
+    def search_best_model(
+        self, model_factory: ModelFactory, X_train: np.ndarray, y_train: np.ndarray,
+        X_test: np.ndarray, y_test: np.ndarray
+    ) -> tuple:
+        ''' Full retraining, searches every model of model.yaml and picks the best one.\n
+            Returns - (MetricInfoArtifacts or None, training report)
+        '''
         initialized_models = model_factory.initialize_all_models()
         logger.info('Initialized all the models.')
         logger.info('Started grid serch for all the initialized models.')
@@ -48,32 +56,226 @@ class ModelTrainer:
             X=X_train,
             y=y_train
         )
+        search_report = model_factory.get_search_report(grid_searched_best_models=grid_searched_best_models)
+        for model_report in search_report:
+            logger.info(
+                'Searched %s in %.2f s, %s fits with n_jobs %s',
+                model_report['model_name'], model_report['search_seconds'],
+                model_report['fit_count'], model_report['n_jobs']
+            )
+        trial_store_report = model_factory.get_trial_store_report(grid_searched_best_models=grid_searched_best_models)
+        if trial_store_report is not None:
+            logger.info(
+                'Trial store hit rate %.2f (%s of %s), %s trials in %s bytes',
+                trial_store_report['hit_rate'], trial_store_report['hit_count'], trial_store_report['lookup_count'],
+                trial_store_report['entries'], trial_store_report['bytes']
+            )
         logger.info('Started evaluation of all the best models.')
         models = [model.best_searched_model for model in grid_searched_best_models]
+        candidate_evaluations = model_factory.evaluate_models(
+            models=models,
+            X_train=X_train,
+            y_train=y_train,
+            X_test=X_test,
+            y_test=y_test,
+            reuse_scores=True
+        )
+        evaluation_report = model_factory.get_evaluation_report(candidate_evaluations=candidate_evaluations)
+        for model_report in evaluation_report:
+            logger.info(
+                'Evaluated %s in %.3f s predicting and %.3f s scoring, cached %s',
+                model_report['model_name'], model_report['predict_seconds'],
+                model_report['metric_seconds'], model_report['is_cached']
+            )
         best_model = model_factory.get_best_model(
             models=models,
             X_train=X_train,
             y_train=y_train,
             X_test=X_test,
             y_test=y_test,
-            base_accuracy=self.model_training_config.base_accuracy
+            base_accuracy=self.model_training_config.base_accuracy,
+            candidate_evaluations=candidate_evaluations
+        )
+        training_report = {'models': search_report, 'evaluations': evaluation_report, 'trial_store': trial_store_report}
+
+        return best_model, training_report
+
+    def update_promoted_model(
+        self, model_factory: ModelFactory, X_train: np.ndarray, y_train: np.ndarray,
+        X_test: np.ndarray, y_test: np.ndarray
+    ) -> tuple:
+        ''' Incremental retraining, updates the promoted model with the new rows\n
+            ------------------------------------------------
+            The update is rejected when the promoted model itself lost more than
+            max_accuracy_drift of its recorded test accuracy on the new holdout
+            (the data drifted, new trees alone will not fix it), or when the updated
+            model is more than max_accuracy_drop below the promoted one.
+            The ingested data does not record which rows are new, so the added trees
+            are fitted on the whole train split, the rows the promoted model already
+            saw included.\n
+            Returns - (MetricInfoArtifacts or None when a full retraining is needed, incremental report)
+        '''
+        incremental_training_config = self.incremental_training_config
+        current_entry = ModelRegistry(model_dir=incremental_training_config.model_export_dir).get_current_entry()
+        if current_entry is None:
+            return None, {'is_updated': False, 'reason': 'no promoted model'}
+        if current_entry['version'] != self.data_transformation_artifacts.preprocessing_model_version:
+            return None, {'is_updated': False, 'reason': 'data not transformed with the promoted preprocessor'}
+        raw_model_file_path = os.path.join(
+            incremental_training_config.model_export_dir,
+            current_entry['path'],
+            incremental_training_config.raw_model_file_name
+        )
+        with open(raw_model_file_path, 'rb') as file_object:
+            promoted_model = dill.load(file_object)
+        logger.info('Updating promoted model version %s, %s', current_entry['version'], promoted_model)
+        start = time.perf_counter()
+        updated_model = model_factory.update_model(
+            model=promoted_model,
+            X=X_train,
+            y=y_train,
+            added_estimators=incremental_training_config.added_estimators
+        )
+        incremental_report = {
+            'is_updated': False,
+            'promoted_version': current_entry['version'],
+            'model_name': str(promoted_model),
+            'update_seconds': time.perf_counter() - start
+        }
+        if updated_model is None:
+            return None, {**incremental_report, 'reason': 'model supports neither warm_start nor partial_fit'}
+        candidate_evaluations = model_factory.evaluate_models(
+            models=[promoted_model, updated_model],
+            X_train=X_train,
+            y_train=y_train,
+            X_test=X_test,
+            y_test=y_test
+        )
+        promoted_evaluation, updated_evaluation = candidate_evaluations
+        recorded_test_accuracy = current_entry['metrics'].get('test_accuracy', promoted_evaluation.test_accuracy)
+        accuracy_drift = recorded_test_accuracy - promoted_evaluation.test_accuracy
+        accuracy_drop = promoted_evaluation.test_accuracy - updated_evaluation.test_accuracy
+        incremental_report.update({
+            'accuracy_drift': accuracy_drift,
+            'accuracy_drop': accuracy_drop,
+            'evaluations': model_factory.get_evaluation_report(candidate_evaluations=candidate_evaluations)
+        })
+        logger.info('Test accuracy drift %.4f, drop after the update %.4f', accuracy_drift, accuracy_drop)
+        if accuracy_drift > incremental_training_config.max_accuracy_drift:
+            return None, {**incremental_report, 'reason': 'test accuracy drift above max_accuracy_drift'}
+        if accuracy_drop > incremental_training_config.max_accuracy_drop:
+            return None, {**incremental_report, 'reason': 'test accuracy drop above max_accuracy_drop'}
+        best_model = model_factory.get_best_model(
+            models=[updated_model],
+            X_train=X_train,
+            y_train=y_train,
+            X_test=X_test,
+            y_test=y_test,
+            base_accuracy=self.model_training_config.base_accuracy,
+            candidate_evaluations=[updated_evaluation]
         )
+        if best_model is None:
+            return None, {**incremental_report, 'reason': 'updated model below base_accuracy'}
+
+        return best_model, {**incremental_report, 'is_updated': True}
+
+    def load_transformed_data(self) -> tuple:
+        ''' Returns - (X_train, y_train, X_test, y_test) of the data transformation artifacts
+        '''
+        # Memory mapped, the searches read the pages of the file instead of private copies.
+        X_train, y_train = util.load_features_and_target(
+            features_file_path=self.data_transformation_artifacts.transformed_train_file_path,
+            target_file_path=self.data_transformation_artifacts.transformed_train_target_file_path
+        )
+        X_test, y_test = util.load_features_and_target(
+            features_file_path=self.data_transformation_artifacts.transformed_test_file_path,
+            target_file_path=self.data_transformation_artifacts.transformed_test_target_file_path
+        )
+
+        return X_train, y_train, X_test, y_test
+
+    def initiate_model_trainer(self) -> ModelTrainingArtifacts:
+        logger.info(f'{"=" * 20} Model training log started. {"=" * 20}')
+        X_train, y_train, X_test, y_test = self.load_transformed_data()
+        model_config_file_path = os.path.join(
+            self.model_training_config.model_config_dir,
+            self.model_training_config.model_config_file_name
+        )
+        logger.info('Training and testing data loaded successfully.')
+        model_factory = ModelFactory(
+            model_config_file_path=model_config_file_path,
+            trial_store_file_path=self.model_training_config.trial_store_file_path
+        )
+        best_model = None
+        training_mode = 'full'
+        training_report = {}
+        if self.incremental_training_config is not None and self.incremental_training_config.enabled:
+            best_model, incremental_report = self.update_promoted_model(model_factory, X_train, y_train, X_test, y_test)
+            training_report['incremental'] = incremental_report
+            if best_model is not None:
+                training_mode = 'incremental'
+                training_report['evaluations'] = incremental_report['evaluations']
+            else:
+                logger.info('Falling back to full retraining, %s.', incremental_report['reason'])
+                if self.data_transformation_artifacts.preprocessing_model_version is not None:
+                    # The features went through the promoted preprocessor, a full
+                    # retraining fits its own preprocessor on the new data.
+                    if self.retransform_data is None:
+                        raise HousePricePredictionException(
+                            Exception('Full retraining needs the data transformed with a new preprocessor.'), sys
+                        )
+                    logger.info('Transforming the data again with a new preprocessor.')
+                    # The memory mapped arrays are released before their files are written again.
+                    del X_train, y_train, X_test, y_test
+                    self.data_transformation_artifacts = self.retransform_data()
+                    X_train, y_train, X_test, y_test = self.load_transformed_data()
+        if best_model is None:
+            best_model, search_training_report = self.search_best_model(model_factory, X_train, y_train, X_test, y_test)
+            training_report.update(search_training_report)
         if best_model == None:
             logger.info('No best model found.')
             return None
-        logger.info(f'Saving the best model {best_model.model_name}')
+        logger.info('Saving the best model %s', best_model.model_name)
         trained_model_dir = os.path.join(
             constant.ARTIFACT_DIR_PATH,
             constant.CURRENT_TIMESTAMP,
             self.model_training_config.trained_model_dir
         )
         os.makedirs(trained_model_dir, exist_ok=True)
+        util.write_json_file_atomically(
+            os.path.join(trained_model_dir, self.model_training_config.search_report_file_name),
+            training_report
+        )
         trained_model_file_path = os.path.join(
             trained_model_dir,
             self.model_training_config.trained_model_file_name
         )
+        compiled_object_file_path = self.data_transformation_artifacts.compiled_object_file_path
+        if compiled_object_file_path is not None and os.path.exists(compiled_object_file_path):
+            preprocessing_object = CompiledPreprocessor.load(file_path=compiled_object_file_path)
+        else:
+            with open(self.data_transformation_artifacts.processed_object_file_path, 'rb') as file_object:
+                preprocessing_object = dill.load(file_object)
+        trained_model_object = best_model.model_object
+        # The compiled model can not be updated, keep the estimator for incremental training.
+        with open(os.path.join(trained_model_dir, self.model_training_config.raw_model_file_name), 'wb') as file_object:
+            dill.dump(trained_model_object, file_object)
+        if self.model_training_config.compile_model:
+            trained_model_object = compile_model(
+                model=trained_model_object,
+                X_check=X_test.toarray() if hasattr(X_test, 'toarray') else X_test,
+                float32_thresholds=self.model_training_config.float32_thresholds
+            )
+        estimator_model = HousePriceEstimatorModel(
+            preprocessing_object=preprocessing_object,
+            trained_model_object=trained_model_object
+        )
         with open(trained_model_file_path, 'wb') as file_object:
-            dill.dump(best_model, file_object)
+            dill.dump(estimator_model, file_object)
+        serving_model_path = save_estimator_artifact(
+            estimator_model=estimator_model,
+            artifact_dir=os.path.join(trained_model_dir, self.model_training_config.serving_model_dir)
+        )
         model_training_artifact = ModelTrainingArtifacts(
             is_trained=True,
             message='Training successfull',
@@ -82,7 +284,10 @@ class ModelTrainer:
             test_rsme=best_model.test_rsme,
             train_accuracy=best_model.train_accuracy,
             train_rsme=best_model.train_rsme,
-            trained_model_file_path=trained_model_file_path
+            trained_model_file_path=trained_model_file_path,
+            serving_model_path=serving_model_path,
+            candidate_evaluations=training_report['evaluations'],
+            training_mode=training_mode
         )
 
         logger.info(f'{"=" * 20} Model training log finished. {"=" * 20}')
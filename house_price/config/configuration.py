@@ -1,10 +1,11 @@
 import os
-import traceback
+import sys
 
-from house_price.entity.entity_config import DataIngestionConfig, DataTransformationConfig, DataValidationConfig, ModelEvaluationConfig, ModelTrainingConfig, PushModelConfig
+from house_price.entity.entity_config import DataIngestionConfig, DataTransformationConfig, DataValidationConfig, ModelEvaluationConfig, ModelTrainingConfig, IncrementalTrainingConfig, PredictionConfig, BulkScoringConfig, PushModelConfig
+from house_price.exception import HousePricePredictionException
 from house_price.util import util
 from house_price import constant
-from house_price.logger import logging
+from house_price.logger import log_exception, logging
 logger = logging.getLogger(__name__)
 
 class Configuration:
@@ -17,8 +18,9 @@ class Configuration:
         try:
             self.config_info = util.read_yaml_file(file_path=config_file_path)
             self.current_timestamp = current_timestamp
-        except:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
 
     def get_data_ingestion_config(self) -> DataIngestionConfig:
         data_ingestion_config = self.config_info[constant.DATA_INGESTION_CONFIG_KEY]
@@ -28,13 +30,10 @@ class Configuration:
             constant.DATA_INGESTION_DIR,
             self.current_timestamp
         )
-        raw_data_path = os.path.join(
-            data_ingestion_base_path,
-            data_ingestion_config['raw_data_path']
-        )
-        downloaded_zip_file_path = os.path.join(
-            data_ingestion_base_path,
-            data_ingestion_config['downloaded_zip_file_path']
+        # Shared by all the runs, so an unchanged dataset is fetched and extracted once.
+        download_cache_dir = os.path.join(
+            constant.ARTIFACT_DIR_PATH,
+            data_ingestion_config['download_cache_dir']
         )
         ingested_dir = os.path.join(
             data_ingestion_base_path,
@@ -52,13 +51,20 @@ class Configuration:
         test_data_file_name = data_ingestion_config['test_data_file_name']
         data_ingestion_config = DataIngestionConfig(
             dataset_download_url=dataset_download_url,
-            raw_data_path=raw_data_path,
-            downloaded_zip_file_path=downloaded_zip_file_path,
+            dataset_sha256=data_ingestion_config.get('dataset_sha256'),
+            download_cache_dir=download_cache_dir,
+            split_mode=data_ingestion_config['split_mode'],
+            test_size=data_ingestion_config['test_size'],
+            chunk_size=data_ingestion_config['chunk_size'],
+            split_key_columns=data_ingestion_config['split_key_columns'],
+            csv_engine=data_ingestion_config['csv_engine'],
             ingested_dir=ingested_dir,
             train_data_dir=train_data_dir,
             train_data_file_name=train_data_file_name,
             test_data_dir=test_data_dir,
-            test_data_file_name=test_data_file_name
+            test_data_file_name=test_data_file_name,
+            # The ingested files are written with the dtypes of the schema.
+            schema_file_path=self.get_data_validation_config().schema_file_path
         )
         
         return data_ingestion_config
@@ -118,17 +124,27 @@ class Configuration:
             data_transformation_config['transformed_train_dir']
         )
         processed_object_file_name = data_transformation_config['processed_object_file_name']
+        compiled_object_file_name = data_transformation_config['compiled_object_file_name']
         transformed_train_file_name = data_transformation_config['transformed_train_file_name']
         transformed_test_file_name = data_transformation_config['transformed_test_file_name']
+        transformed_train_target_file_name = data_transformation_config['transformed_train_target_file_name']
+        transformed_test_target_file_name = data_transformation_config['transformed_test_target_file_name']
+        transformed_dtype = data_transformation_config['transformed_dtype']
+        sparse_density_threshold = data_transformation_config['sparse_density_threshold']
         data_transformation_config = DataTransformationConfig(
             add_bedroom_per_room=add_bedroom_per_room,
             processed_object_dir=processed_object_dir,
             processed_object_file_name=processed_object_file_name,
+            compiled_object_file_name=compiled_object_file_name,
             transformed_dir=transformed_dir,
             transformed_test_dir=transformed_test_dir,
             transformed_test_file_name=transformed_test_file_name,
             transformed_train_dir=transformed_train_dir,
-            transformed_train_file_name=transformed_train_file_name
+            transformed_train_file_name=transformed_train_file_name,
+            transformed_train_target_file_name=transformed_train_target_file_name,
+            transformed_test_target_file_name=transformed_test_target_file_name,
+            transformed_dtype=transformed_dtype,
+            sparse_density_threshold=sparse_density_threshold
         )
 
         return data_transformation_config
@@ -148,16 +164,48 @@ class Configuration:
         base_accuracy = model_training_config['base_accuracy']
         model_config_dir = model_training_config['model_config_dir']
         model_config_file_name = model_training_config['model_config_file_name']
+        serving_model_dir = model_training_config['serving_model_dir']
+        compile_model = model_training_config['compile_model']
+        float32_thresholds = model_training_config['float32_thresholds']
+        search_report_file_name = model_training_config['search_report_file_name']
+        # Shared by all the runs, so unchanged searches are not recomputed.
+        trial_store_file_path = os.path.join(
+            constant.ARTIFACT_DIR_PATH,
+            model_training_config['trial_store_dir'],
+            model_training_config['trial_store_file_name']
+        )
         model_training_config = ModelTrainingConfig(
             trained_model_dir=trained_model_dir,
             trained_model_file_name=trained_model_file_name,
             base_accuracy=base_accuracy,
             model_config_dir=model_config_dir,
-            model_config_file_name=model_config_file_name
+            model_config_file_name=model_config_file_name,
+            serving_model_dir=serving_model_dir,
+            compile_model=compile_model,
+            float32_thresholds=float32_thresholds,
+            search_report_file_name=search_report_file_name,
+            trial_store_file_path=trial_store_file_path,
+            raw_model_file_name=model_training_config['raw_model_file_name']
         )
 
         return model_training_config
 
+    def get_incremental_training_config(self) -> IncrementalTrainingConfig:
+        incremental_training_config = self.config_info[constant.INCREMENTAL_TRAINING_CONFIG_KEY]
+        model_training_config = self.config_info[constant.MODEL_TRAINING_CONFIG_KEY]
+        # The promoted model is read from its registry version, a copy of the trained model dir.
+        incremental_training_config = IncrementalTrainingConfig(
+            enabled=incremental_training_config['enabled'],
+            added_estimators=incremental_training_config['added_estimators'],
+            max_accuracy_drift=incremental_training_config['max_accuracy_drift'],
+            max_accuracy_drop=incremental_training_config['max_accuracy_drop'],
+            model_export_dir=self.get_push_model_config().model_export_dir,
+            trained_model_file_name=model_training_config['trained_model_file_name'],
+            raw_model_file_name=model_training_config['raw_model_file_name']
+        )
+
+        return incremental_training_config
+
     def get_model_evaluation_config(self) -> ModelEvaluationConfig:
         model_evaluation_config = self.config_info[constant.MODEL_EVALUATION_CONFIG_KEY]
         model_evaluation_base_path = os.path.join(
@@ -177,5 +225,49 @@ class Configuration:
 
         return model_evaluation_config
 
+    def get_prediction_config(self) -> PredictionConfig:
+        prediction_config = self.config_info[constant.PREDICTION_CONFIG_KEY]
+        max_batch_size = prediction_config['max_batch_size']
+        max_wait_ms = prediction_config['max_wait_ms']
+        preload_model = prediction_config['preload_model']
+        prediction_cache_enabled = prediction_config['prediction_cache_enabled']
+        prediction_cache_max_entries = prediction_config['prediction_cache_max_entries']
+        prediction_cache_max_bytes = prediction_config['prediction_cache_max_bytes']
+        prediction_cache_float_decimals = prediction_config['prediction_cache_float_decimals']
+        prediction_config = PredictionConfig(
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            preload_model=preload_model,
+            prediction_cache_enabled=prediction_cache_enabled,
+            prediction_cache_max_entries=prediction_cache_max_entries,
+            prediction_cache_max_bytes=prediction_cache_max_bytes,
+            prediction_cache_float_decimals=prediction_cache_float_decimals
+        )
+
+        return prediction_config
+
+    def get_bulk_scoring_config(self) -> BulkScoringConfig:
+        bulk_scoring_config = self.config_info[constant.BULK_SCORING_CONFIG_KEY]
+        bulk_scoring_config = BulkScoringConfig(
+            chunk_size=bulk_scoring_config['chunk_size'],
+            worker_count=bulk_scoring_config['worker_count'] or os.cpu_count(),
+            max_pending_chunks=bulk_scoring_config['max_pending_chunks'],
+            prediction_column_name=bulk_scoring_config['prediction_column_name'],
+            error_column_name=bulk_scoring_config['error_column_name'],
+            # Rows are checked against the schema categories before they are scored.
+            schema_file_path=self.get_data_validation_config().schema_file_path
+        )
+
+        return bulk_scoring_config
+
     def get_push_model_config(self) -> PushModelConfig:
-        pass
\ No newline at end of file
+        model_pusher_config = self.config_info[constant.MODEL_PUSHER_CONFIG_KEY]
+        model_export_dir = os.path.join(
+            constant.ROOT_DIR,
+            model_pusher_config['model_export_dir_path']
+        )
+        push_model_config = PushModelConfig(
+            model_export_dir=model_export_dir
+        )
+
+        return push_model_config
\ No newline at end of file
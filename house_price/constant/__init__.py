@@ -28,5 +28,13 @@ DATA_TRANSFORMATION_DIR = 'data_transformation'
 MODEL_TRAINING_CONFIG_KEY = 'model_training_config'
 MODEL_TRIAINNG_DIR = 'model_training'
 
+INCREMENTAL_TRAINING_CONFIG_KEY = 'incremental_training_config'
+
 MODEL_EVALUATION_CONFIG_KEY = 'model_evaluation_config'
 MODEL_EVALUATION_DIR = 'model_evaluation'
+
+PREDICTION_CONFIG_KEY = 'prediction_config'
+
+BULK_SCORING_CONFIG_KEY = 'bulk_scoring_config'
+
+MODEL_PUSHER_CONFIG_KEY = 'model_pusher_config'
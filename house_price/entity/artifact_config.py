@@ -27,7 +27,11 @@ DataTransformationArtifacts = namedtuple(
         'is_transformed',
         'transformed_train_file_path',
         'transformed_test_file_path',
+        'transformed_train_target_file_path',
+        'transformed_test_target_file_path',
         'processed_object_file_path',
+        'compiled_object_file_path',
+        'preprocessing_model_version',
         'message'
     ]
 )
@@ -38,11 +42,14 @@ ModelTrainingArtifacts = namedtuple(
         'is_trained',
         'message',
         'trained_model_file_path',
+        'serving_model_path',
         'train_accuracy',
         'test_accuracy',
         'train_rsme',
         'test_rsme',
-        'model_accuracy'
+        'model_accuracy',
+        'candidate_evaluations',
+        'training_mode'
     ]
 )
 
@@ -54,10 +61,23 @@ ModelEvaluationArtifacts = namedtuple(
     ]
 )
 
+BulkScoringArtifacts = namedtuple(
+    'BulkScoringArtifacts',
+    [
+        'output_file_path',
+        'model_path',
+        'row_count',
+        'invalid_row_count',
+        'elapsed_seconds',
+        'rows_per_second'
+    ]
+)
+
 ModelPusherArtifacts = namedtuple(
     'ModelPusherArtifacts',
     [
         'is_model_pushed',
-        'export_model_file_path'
+        'export_model_file_path',
+        'model_version'
     ]
 )
\ No newline at end of file
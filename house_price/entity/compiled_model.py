@@ -0,0 +1,207 @@
+import sys
+
+import numpy as np
+
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+logger = logging.getLogger(__name__)
+
+LINEAR_MODEL_CLASSES = ('LinearRegression', 'Ridge', 'Lasso', 'ElasticNet')
+
+FOREST_MODEL_CLASSES = ('RandomForestRegressor', 'ExtraTreesRegressor', 'DecisionTreeRegressor')
+
+class CompiledLinearModel:
+    ''' Linear model reduced to its coefficients, predict is a single dot product.
+    '''
+
+    ARRAY_NAMES = ('coef',)
+
+    def __init__(self, coef: np.ndarray, intercept: float) -> None:
+        try:
+            self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+            self.intercept = float(intercept)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    @property
+    def nbytes(self) -> int:
+        return self.coef.nbytes
+
+    def get_params(self) -> dict:
+        return {'intercept': self.intercept}
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        try:
+            return X @ self.coef + self.intercept
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+
+class CompiledForestModel:
+    ''' Tree ensemble flattened into contiguous node arrays.\n
+        ------------------------------------------------
+        The nodes of all trees are concatenated, roots holds the first node of each
+        tree and children holds the left and right child of node i at 2 * i and
+        2 * i + 1. Leaves point to themselves, so every tree is walked for a block
+        of rows at once with one gather per depth level.
+    '''
+
+    ARRAY_NAMES = ('feature', 'threshold', 'children', 'value', 'roots')
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        block_size: int = 4096
+    ) -> None:
+        ''' CompiledForestModel Initialization
+            feature: int32 split feature of each node
+            threshold: float64 or float32 split threshold of each node
+            children: int32 interleaved left and right child of each node, leaves point to themselves
+            value: float64 prediction of each node
+            roots: int32 index of the root node of each tree
+            max_depth: int depth of the deepest tree
+            block_size: int rows walked together, bounds the working memory
+        '''
+        try:
+            self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+            self.threshold = np.ascontiguousarray(threshold)
+            self.children = np.ascontiguousarray(children, dtype=np.int32)
+            self.value = np.ascontiguousarray(value, dtype=np.float64)
+            self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+            self.max_depth = int(max_depth)
+            self.block_size = block_size
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    @classmethod
+    def from_estimators(cls, estimators: list, float32_thresholds: bool = False) -> 'CompiledForestModel':
+        try:
+            features, thresholds, children, values, roots = [], [], [], [], []
+            offset = 0
+            max_depth = 0
+            for estimator in estimators:
+                tree = estimator.tree_
+                if tree.n_outputs != 1:
+                    raise Exception('Only single output trees can be compiled.')
+                node_index = np.arange(tree.node_count, dtype=np.int64)
+                is_leaf = tree.children_left == -1
+                features.append(np.where(is_leaf, 0, tree.feature))
+                thresholds.append(tree.threshold)
+                children.append(
+                    np.stack([
+                        np.where(is_leaf, node_index, tree.children_left),
+                        np.where(is_leaf, node_index, tree.children_right)
+                    ], axis=1).ravel() + offset
+                )
+                values.append(tree.value[:, 0, 0])
+                roots.append(offset)
+                offset += tree.node_count
+                max_depth = max(max_depth, tree.max_depth)
+            if offset > np.iinfo(np.int32).max:
+                raise Exception('Forest has too many nodes to be compiled.')
+            threshold = np.concatenate(thresholds)
+            if float32_thresholds:
+                # Round every threshold down to a float32, inputs are float32 so x <= t
+                # gives the same split as with the float64 threshold.
+                float32_threshold = threshold.astype(np.float32)
+                rounded_up = float32_threshold.astype(np.float64) > threshold
+                float32_threshold[rounded_up] = np.nextafter(
+                    float32_threshold[rounded_up], np.float32(-np.inf)
+                )
+                threshold = float32_threshold
+
+            return cls(
+                feature=np.concatenate(features),
+                threshold=threshold,
+                children=np.concatenate(children),
+                value=np.concatenate(values),
+                roots=np.asarray(roots),
+                max_depth=max_depth
+            )
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            array.nbytes for array in (
+                self.feature, self.threshold, self.children,
+                self.value, self.roots
+            )
+        )
+
+    def get_params(self) -> dict:
+        return {'max_depth': self.max_depth, 'block_size': self.block_size}
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        try:
+            # sklearn trees compare float32 inputs against their thresholds
+            X = np.ascontiguousarray(X, dtype=np.float32)
+            tree_count = len(self.roots)
+            predictions = np.empty(X.shape[0], dtype=np.float64)
+            for start in range(0, X.shape[0], self.block_size):
+                block = X[start:start + self.block_size]
+                row_count = block.shape[0]
+                # one entry per (row, tree) pair, offsets index the flattened block
+                row_offsets = np.repeat(np.arange(row_count, dtype=np.intp) * X.shape[1], tree_count)
+                nodes = np.tile(self.roots.astype(np.intp), row_count)
+                values = block.ravel()
+                for _ in range(self.max_depth):
+                    go_right = values[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+                    nodes = self.children[2 * nodes + go_right]
+                    if (self.children[2 * nodes] == nodes).all():
+                        break
+                predictions[start:start + row_count] = self.value[nodes].reshape(row_count, tree_count).mean(axis=1)
+
+            return predictions
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+
+def compile_model(model: object, X_check: np.ndarray = None, float32_thresholds: bool = False) -> object:
+    ''' Compiles a fitted model into an array based evaluator\n
+        ------------------------------------------------
+        Takes - fitted model, optional features used to check the compiled
+        predictions against the model, float32_thresholds to halve the threshold memory
+        (splits stay exact because inputs are compared as float32)\n
+        Returns - CompiledLinearModel, CompiledForestModel or the model itself
+        when its class is not supported or the check fails
+    '''
+    try:
+        model_class = type(model).__name__
+        if model_class in LINEAR_MODEL_CLASSES and np.ndim(model.coef_) == 1:
+            compiled_model = CompiledLinearModel(
+                coef=model.coef_,
+                intercept=model.intercept_
+            )
+        elif model_class in FOREST_MODEL_CLASSES and getattr(model, 'n_outputs_', 1) == 1:
+            estimators = model.estimators_ if hasattr(model, 'estimators_') else [model]
+            compiled_model = CompiledForestModel.from_estimators(
+                estimators=estimators,
+                float32_thresholds=float32_thresholds
+            )
+        else:
+            logger.info('No compiled evaluator for %s, using the sklearn model.', model_class)
+            return model
+        if X_check is not None:
+            expected = model.predict(X_check)
+            compiled = compiled_model.predict(X_check)
+            if not np.allclose(expected, compiled, rtol=1e-9, atol=1e-6):
+                logger.warning('Compiled %s does not match the sklearn predictions, using the sklearn model.', model_class)
+                return model
+        logger.info('Compiled %s into %s.', model_class, type(compiled_model).__name__)
+
+        return compiled_model
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
@@ -0,0 +1,212 @@
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+logger = logging.getLogger(__name__)
+
+class CompiledPreprocessor:
+    ''' Pure NumPy replacement for the fitted preprocessing ColumnTransformer.\n
+        ------------------------------------------------
+        Holds only the fitted statistics (imputer fill values, scaler means and
+        scales, one-hot categories) and applies them in one fused pass, without
+        sklearn's per-call validation and dispatch.
+    '''
+
+    def __init__(
+        self,
+        numerical_columns: list,
+        categorical_columns: list,
+        numerical_fill_values: list,
+        numerical_means: list,
+        numerical_scales: list,
+        categorical_fill_values: list,
+        categories: list,
+        categorical_scales: list,
+        add_bedrooms_per_room: bool = True
+    ) -> None:
+        ''' CompiledPreprocessor Initialization
+            numerical_columns: list input numerical column names
+            categorical_columns: list input categorical column names
+            numerical_fill_values: list median used to impute each numerical column
+            numerical_means: list scaler mean of each numerical and generated column
+            numerical_scales: list scaler scale of each numerical and generated column
+            categorical_fill_values: list most frequent value of each categorical column
+            categories: list sorted one-hot categories of each categorical column
+            categorical_scales: list scaler scale of each one-hot column
+            add_bedrooms_per_room: bool whether bedrooms_per_room is generated
+        '''
+        try:
+            self.numerical_columns = list(numerical_columns)
+            self.categorical_columns = list(categorical_columns)
+            self.numerical_fill_values = np.asarray(numerical_fill_values, dtype=np.float64)
+            self.numerical_means = np.asarray(numerical_means, dtype=np.float64)
+            self.numerical_scales = np.asarray(numerical_scales, dtype=np.float64)
+            self.categorical_fill_values = list(categorical_fill_values)
+            self.categories = [np.asarray(category, dtype=object) for category in categories]
+            self.categorical_scales = np.asarray(categorical_scales, dtype=np.float64)
+            self.categorical_inverse_scales = 1 / self.categorical_scales
+            self.add_bedrooms_per_room = add_bedrooms_per_room
+            self.total_rooms_index = self.numerical_columns.index('total_rooms')
+            self.total_bedrooms_index = self.numerical_columns.index('total_bedrooms')
+            self.population_index = self.numerical_columns.index('population')
+            self.households_index = self.numerical_columns.index('households')
+            self.generated_feature_count = 3 if add_bedrooms_per_room else 2
+            self.numerical_feature_count = len(self.numerical_columns) + self.generated_feature_count
+            self.category_offsets = np.cumsum(
+                [self.numerical_feature_count] + [len(category) for category in self.categories]
+            )
+            self.feature_count = int(self.category_offsets[-1])
+            if len(self.numerical_means) != self.numerical_feature_count:
+                raise Exception('Numerical scaler statistics do not match the numerical features.')
+            if len(self.categorical_scales) != self.feature_count - self.numerical_feature_count:
+                raise Exception('Categorical scaler statistics do not match the one-hot features.')
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    @classmethod
+    def from_column_transformer(cls, column_transformer: object, domain_value: dict = None) -> 'CompiledPreprocessor':
+        ''' Compiles the fitted ColumnTransformer built by DataTransformation.column_transformer\n
+            ------------------------------------------------
+            Takes - fitted ColumnTransformer, optional domain_value from schema.yaml\n
+            Returns - CompiledPreprocessor
+        '''
+        try:
+            transformers = {
+                name: (transformer, columns)
+                for name, transformer, columns in column_transformer.transformers_
+            }
+            numerical_pipeline, numerical_columns = transformers['numerical_pipeline']
+            categorical_pipeline, categorical_columns = transformers['categorical_pipeline']
+            numerical_imputer = numerical_pipeline.named_steps['imputer']
+            feature_generator = numerical_pipeline.named_steps['feature_generator']
+            numerical_scaler = numerical_pipeline.named_steps['scaler']
+            categorical_imputer = categorical_pipeline.named_steps['imputer']
+            one_hot_encoder = categorical_pipeline.named_steps['ohe']
+            categorical_scaler = categorical_pipeline.named_steps['scaler']
+            if numerical_imputer.strategy != 'median' or categorical_imputer.strategy != 'most_frequent':
+                raise Exception('Only median and most_frequent imputers can be compiled.')
+            if one_hot_encoder.handle_unknown != 'error' or one_hot_encoder.drop is not None:
+                raise Exception('Only OneHotEncoder with handle_unknown="error" and no drop can be compiled.')
+            feature_count = len(numerical_columns) + (3 if feature_generator.add_bedrooms_per_room else 2)
+            numerical_means = numerical_scaler.mean_ if numerical_scaler.with_mean else np.zeros(feature_count)
+            numerical_scales = numerical_scaler.scale_ if numerical_scaler.with_std else np.ones(feature_count)
+            categories = [category.tolist() for category in one_hot_encoder.categories_]
+            one_hot_count = sum(len(category) for category in categories)
+            categorical_scales = categorical_scaler.scale_ if categorical_scaler.with_std else np.ones(one_hot_count)
+            if domain_value is not None:
+                for column, category in zip(categorical_columns, categories):
+                    if column in domain_value and sorted(domain_value[column]) != category:
+                        logger.warning(
+                            'Fitted categories of %s differ from the schema domain value, '
+                            'using the fitted categories %s', column, category
+                        )
+
+            return cls(
+                numerical_columns=numerical_columns,
+                categorical_columns=categorical_columns,
+                numerical_fill_values=numerical_imputer.statistics_,
+                numerical_means=numerical_means,
+                numerical_scales=numerical_scales,
+                categorical_fill_values=categorical_imputer.statistics_.tolist(),
+                categories=categories,
+                categorical_scales=categorical_scales,
+                add_bedrooms_per_room=feature_generator.add_bedrooms_per_room
+            )
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    @staticmethod
+    def get_column(X, column: str) -> np.ndarray:
+        if isinstance(X, (pd.DataFrame, dict)):
+            return np.asarray(X[column])
+        return np.asarray(getattr(X, column))
+
+    def transform(self, X) -> np.ndarray:
+        ''' Applies imputation, feature generation, scaling and one-hot encoding
+            in one pass over the batch\n
+            ------------------------------------------------
+            Takes - DataFrame, dict of columns or HousePriceBatch\n
+            Returns - float64 array with the same layout as the ColumnTransformer output
+        '''
+        try:
+            row_count = len(self.get_column(X, self.numerical_columns[0]))
+            transformed = np.empty((row_count, self.feature_count), dtype=np.float64)
+            numerical = transformed[:, :len(self.numerical_columns)]
+            for index, column in enumerate(self.numerical_columns):
+                numerical[:, index] = self.get_column(X, column)
+            missing = np.isnan(numerical)
+            if missing.any():
+                np.copyto(numerical, np.broadcast_to(self.numerical_fill_values, numerical.shape), where=missing)
+            generated_index = len(self.numerical_columns)
+            households = numerical[:, self.households_index]
+            np.divide(numerical[:, self.total_rooms_index], households, out=transformed[:, generated_index])
+            np.divide(numerical[:, self.population_index], households, out=transformed[:, generated_index + 1])
+            if self.add_bedrooms_per_room:
+                np.divide(
+                    numerical[:, self.total_bedrooms_index],
+                    numerical[:, self.total_rooms_index],
+                    out=transformed[:, generated_index + 2]
+                )
+            scaled = transformed[:, :self.numerical_feature_count]
+            scaled -= self.numerical_means
+            scaled /= self.numerical_scales
+            transformed[:, self.numerical_feature_count:] = 0.0
+            rows = np.arange(row_count)
+            for index, column in enumerate(self.categorical_columns):
+                values = self.get_column(X, column).astype(object)
+                missing = pd.isna(values)
+                if missing.any():
+                    values = values.copy()
+                    values[missing] = self.categorical_fill_values[index]
+                categories = self.categories[index]
+                codes = np.searchsorted(categories, values)
+                unknown = codes >= len(categories)
+                unknown[~unknown] = categories[codes[~unknown]] != values[~unknown]
+                if unknown.any():
+                    raise Exception(
+                        f'Found unknown categories {sorted(set(values[unknown]))} in column {column}.'
+                    )
+                offset = self.category_offsets[index]
+                scale_offset = offset - self.numerical_feature_count
+                transformed[rows, offset + codes] = self.categorical_inverse_scales[scale_offset + codes]
+
+            return transformed
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def to_dict(self) -> dict:
+        return {
+            'numerical_columns': self.numerical_columns,
+            'categorical_columns': self.categorical_columns,
+            'numerical_fill_values': self.numerical_fill_values.tolist(),
+            'numerical_means': self.numerical_means.tolist(),
+            'numerical_scales': self.numerical_scales.tolist(),
+            'categorical_fill_values': self.categorical_fill_values,
+            'categories': [category.tolist() for category in self.categories],
+            'categorical_scales': self.categorical_scales.tolist(),
+            'add_bedrooms_per_room': self.add_bedrooms_per_room
+        }
+
+    def save(self, file_path: str) -> None:
+        try:
+            with open(file_path, 'w') as file:
+                json.dump(self.to_dict(), file, indent=2)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: str) -> 'CompiledPreprocessor':
+        try:
+            with open(file_path, 'r') as file:
+                return cls(**json.load(file))
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tarfile
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+from house_price.util import util
+logger = logging.getLogger(__name__)
+
+CACHE_INDEX_FILE_NAME = 'index.json'
+
+EXTRACT_COMPLETE_FILE_NAME = '.complete'
+
+DOWNLOAD_BLOCK_SIZE = 1 << 20
+
+DOWNLOAD_TIMEOUT_SECONDS = 60
+
+def compute_file_sha256(file_path: str, sha256=None) -> str:
+    sha256 = sha256 or hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(DOWNLOAD_BLOCK_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class DownloadCache:
+    ''' Content addressed cache of downloaded datasets and their extracts.\n
+        ------------------------------------------------
+        Archives are stored once under objects/<sha256> and extracted once under
+        extracts/<sha256>. index.json maps every source to the sha256 it had and
+        the validators it was fetched with (ETag, Last-Modified, size), so an
+        unchanged source is neither downloaded nor extracted again. A configured
+        sha256 skips the network entirely once the archive is cached.
+        Interrupted http downloads are resumed with a Range request, local paths
+        and file:// urls are hashed in place (once per size and mtime).
+    '''
+
+    def __init__(self, cache_dir: str) -> None:
+        try:
+            self.cache_dir = cache_dir
+            self.index_file_path = os.path.join(cache_dir, CACHE_INDEX_FILE_NAME)
+            self.objects_dir = os.path.join(cache_dir, 'objects')
+            self.extracts_dir = os.path.join(cache_dir, 'extracts')
+            self.partial_dir = os.path.join(cache_dir, 'partial')
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def read_index(self) -> dict:
+        if not os.path.exists(self.index_file_path):
+            return {}
+        with open(self.index_file_path, 'r') as file:
+            return json.load(file)
+
+    def update_index(self, source: str, entry: dict) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index = self.read_index()
+        index[source] = entry
+        util.write_json_file_atomically(self.index_file_path, index)
+
+    @staticmethod
+    def get_local_path(source: str) -> str:
+        ''' Path of a local path or file:// source, None for a remote url.
+        '''
+        parsed_url = urllib.parse.urlparse(source)
+        if parsed_url.scheme == 'file':
+            return urllib.request.url2pathname(parsed_url.path)
+        if parsed_url.scheme == '' or os.path.exists(source):
+            return source
+        return None
+
+    @staticmethod
+    def get_source_file_name(source: str) -> str:
+        ''' File name at the end of a url or path, None when it has none.
+        '''
+        local_path = DownloadCache.get_local_path(source)
+        if local_path is None:
+            local_path = urllib.request.url2pathname(urllib.parse.urlparse(source).path)
+        return os.path.basename(local_path) or None
+
+    def fetch(self, source: str, expected_sha256: str = None) -> tuple:
+        ''' Makes the archive of source available locally\n
+            ------------------------------------------------
+            Takes - url, file:// url or local path, sha256 the archive must have\n
+            Returns - (archive file path, its sha256)
+        '''
+        try:
+            local_path = self.get_local_path(source)
+            if local_path is not None:
+                file_path, sha256 = local_path, self.__hash_local_file(local_path)
+            elif expected_sha256 is not None and os.path.exists(os.path.join(self.objects_dir, expected_sha256)):
+                logger.info('Archive %s of %s found in the download cache.', expected_sha256, source)
+                file_path, sha256 = os.path.join(self.objects_dir, expected_sha256), expected_sha256
+            else:
+                file_path, sha256 = self.__download(source)
+            if expected_sha256 is not None and sha256 != expected_sha256:
+                raise Exception(f'{source} has sha256 {sha256}, expected {expected_sha256}.')
+
+            return file_path, sha256
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def __hash_local_file(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        source = os.path.abspath(file_path)
+        entry = self.read_index().get(source)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+        sha256 = compute_file_sha256(file_path)
+        self.update_index(source, {'sha256': sha256, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+        return sha256
+
+    def __download(self, url: str) -> tuple:
+        entry = self.read_index().get(url)
+        try:
+            with urllib.request.urlopen(
+                urllib.request.Request(url, method='HEAD'), timeout=DOWNLOAD_TIMEOUT_SECONDS
+            ) as response:
+                validators = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'size': int(response.headers['Content-Length']) if response.headers.get('Content-Length') else None
+                }
+        except urllib.error.HTTPError:
+            # HEAD not allowed, download without validators.
+            validators = {'etag': None, 'last_modified': None, 'size': None}
+        except urllib.error.URLError:
+            if entry is None or not os.path.exists(os.path.join(self.objects_dir, entry['sha256'])):
+                raise
+            logger.warning('%s is unreachable, using the cached archive %s.', url, entry['sha256'])
+            return os.path.join(self.objects_dir, entry['sha256']), entry['sha256']
+        has_validators = validators['etag'] is not None or validators['last_modified'] is not None
+        if entry is not None and has_validators and all(entry.get(name) == value for name, value in validators.items()):
+            file_path = os.path.join(self.objects_dir, entry['sha256'])
+            if os.path.exists(file_path):
+                logger.info('%s is unchanged, using the cached archive %s.', url, entry['sha256'])
+                return file_path, entry['sha256']
+        os.makedirs(self.partial_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        partial_file_path = os.path.join(self.partial_dir, hashlib.sha256(url.encode()).hexdigest())
+        partial_entry_key = f'partial:{url}'
+        partial_entry = self.read_index().get(partial_entry_key)
+        offset = 0
+        if os.path.exists(partial_file_path) and has_validators and partial_entry == validators:
+            offset = os.path.getsize(partial_file_path)
+        request = urllib.request.Request(url)
+        if offset > 0:
+            request.add_header('Range', f'bytes={offset}-')
+            # The server sends the whole file instead when it changed since.
+            request.add_header('If-Range', validators['etag'] or validators['last_modified'])
+        self.update_index(partial_entry_key, validators)
+        sha256 = hashlib.sha256()
+        with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT_SECONDS) as response:
+            if offset > 0 and response.status == 206:
+                logger.info('Resuming the download of %s at %s bytes.', url, offset)
+                compute_file_sha256(partial_file_path, sha256)
+                mode = 'ab'
+            else:
+                logger.info('Started downloading %s', url)
+                mode = 'wb'
+            with open(partial_file_path, mode) as file:
+                for block in iter(lambda: response.read(DOWNLOAD_BLOCK_SIZE), b''):
+                    file.write(block)
+                    sha256.update(block)
+                file.flush()
+                os.fsync(file.fileno())
+        size = os.path.getsize(partial_file_path)
+        if validators['size'] is not None and size != validators['size']:
+            raise Exception(f'Downloaded {size} bytes of {url}, expected {validators["size"]}.')
+        sha256 = sha256.hexdigest()
+        file_path = os.path.join(self.objects_dir, sha256)
+        os.replace(partial_file_path, file_path)
+        self.update_index(url, {**validators, 'sha256': sha256})
+        logger.info('Downloaded %s into %s', url, file_path)
+
+        return file_path, sha256
+
+    def extract(self, archive_file_path: str, sha256: str, file_name: str = None) -> str:
+        ''' Extracts a tar archive once per sha256, other files are linked into
+            the extract directory as they are.\n
+            Takes - archive path, its sha256, name to link a non tar file under
+            (the source file name, so its extension is kept), the archive file
+            name by default\n
+            Returns - extract directory
+        '''
+        try:
+            extract_dir = os.path.join(self.extracts_dir, sha256)
+            is_tar_file = tarfile.is_tarfile(archive_file_path)
+            file_name = file_name or os.path.basename(archive_file_path)
+            if os.path.exists(os.path.join(extract_dir, EXTRACT_COMPLETE_FILE_NAME)) and (
+                is_tar_file or os.path.exists(os.path.join(extract_dir, file_name))
+            ):
+                logger.info('Archive %s is already extracted at %s', sha256, extract_dir)
+                return extract_dir
+            temp_extract_dir = f'{extract_dir}.{os.getpid()}.tmp'
+            shutil.rmtree(temp_extract_dir, ignore_errors=True)
+            os.makedirs(temp_extract_dir)
+            if is_tar_file:
+                logger.info('Extracting %s at %s', archive_file_path, extract_dir)
+                root_dir = os.path.realpath(temp_extract_dir) + os.sep
+                with tarfile.open(archive_file_path) as file:
+                    for member in file.getmembers():
+                        member_path = os.path.join(temp_extract_dir, member.name)
+                        checked_paths = [member_path]
+                        if member.issym():
+                            # Symlink targets are relative to the link, hardlink targets to the archive root.
+                            checked_paths.append(os.path.join(os.path.dirname(member_path), member.linkname))
+                        elif member.islnk():
+                            checked_paths.append(os.path.join(temp_extract_dir, member.linkname))
+                        for checked_path in checked_paths:
+                            if not os.path.realpath(checked_path).startswith(root_dir):
+                                raise Exception(f'{member.name} of {archive_file_path} points outside the archive.')
+                    file.extractall(temp_extract_dir)
+            else:
+                try:
+                    os.link(archive_file_path, os.path.join(temp_extract_dir, file_name))
+                except OSError:
+                    shutil.copyfile(archive_file_path, os.path.join(temp_extract_dir, file_name))
+            with open(os.path.join(temp_extract_dir, EXTRACT_COMPLETE_FILE_NAME), 'w') as file:
+                file.write(sha256)
+            shutil.rmtree(extract_dir, ignore_errors=True)
+            os.rename(temp_extract_dir, extract_dir)
+
+            return extract_dir
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
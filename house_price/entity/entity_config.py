@@ -4,13 +4,19 @@ DataIngestionConfig = namedtuple(
     'DataIngestionConfig',
     [
         'dataset_download_url',
-        'downloaded_zip_file_path',
-        'raw_data_path',
+        'dataset_sha256',
+        'download_cache_dir',
+        'split_mode',
+        'test_size',
+        'chunk_size',
+        'split_key_columns',
+        'csv_engine',
         'ingested_dir',
         'train_data_dir',
         'train_data_file_name',
         'test_data_dir',
-        'test_data_file_name'
+        'test_data_file_name',
+        'schema_file_path'
     ]
 )
 
@@ -33,8 +39,13 @@ DataTransformationConfig = namedtuple(
         'transformed_train_file_name',
         'transformed_test_file_name',
         'transformed_test_dir',
+        'transformed_train_target_file_name',
+        'transformed_test_target_file_name',
+        'transformed_dtype',
+        'sparse_density_threshold',
         'processed_object_dir',
-        'processed_object_file_name'
+        'processed_object_file_name',
+        'compiled_object_file_name'
     ]
 )
 
@@ -45,7 +56,26 @@ ModelTrainingConfig = namedtuple(
         'trained_model_file_name',
         'base_accuracy',
         'model_config_dir',
-        'model_config_file_name'
+        'model_config_file_name',
+        'serving_model_dir',
+        'compile_model',
+        'float32_thresholds',
+        'search_report_file_name',
+        'trial_store_file_path',
+        'raw_model_file_name'
+    ]
+)
+
+IncrementalTrainingConfig = namedtuple(
+    'IncrementalTrainingConfig',
+    [
+        'enabled',
+        'added_estimators',
+        'max_accuracy_drift',
+        'max_accuracy_drop',
+        'model_export_dir',
+        'trained_model_file_name',
+        'raw_model_file_name'
     ]
 )
 
@@ -57,6 +87,31 @@ ModelEvaluationConfig = namedtuple(
     ]
 )
 
+PredictionConfig = namedtuple(
+    'PredictionConfig',
+    [
+        'max_batch_size',
+        'max_wait_ms',
+        'preload_model',
+        'prediction_cache_enabled',
+        'prediction_cache_max_entries',
+        'prediction_cache_max_bytes',
+        'prediction_cache_float_decimals'
+    ]
+)
+
+BulkScoringConfig = namedtuple(
+    'BulkScoringConfig',
+    [
+        'chunk_size',
+        'worker_count',
+        'max_pending_chunks',
+        'prediction_column_name',
+        'error_column_name',
+        'schema_file_path'
+    ]
+)
+
 PushModelConfig = namedtuple(
     'PushModelConfig',
     [
@@ -0,0 +1,45 @@
+import sys
+
+import numpy as np
+
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+logger = logging.getLogger(__name__)
+
+class HousePriceEstimatorModel:
+
+    def __init__(self, preprocessing_object: object, trained_model_object: object) -> None:
+        ''' HousePriceEstimatorModel Initialization
+            preprocessing_object: fitted ColumnTransformer or its CompiledPreprocessor
+            trained_model_object: model selected by the ModelFactory or its compiled evaluator
+        '''
+        try:
+            self.preprocessing_object = preprocessing_object
+            self.trained_model_object = trained_model_object
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def transform(self, X) -> np.ndarray:
+        try:
+            return self.preprocessing_object.transform(X)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def predict(self, X) -> np.ndarray:
+        ''' Runs the whole batch through the preprocessing object and
+            the trained model in one vectorized call each.
+        '''
+        try:
+            transformed_features = self.transform(X)
+            return self.trained_model_object.predict(transformed_features)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def __repr__(self) -> str:
+        return f'{type(self.trained_model_object).__name__}()'
+
+    def __str__(self) -> str:
+        return f'{type(self.trained_model_object).__name__}()'
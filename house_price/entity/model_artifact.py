@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+from house_price.entity.compiled_model import CompiledForestModel, CompiledLinearModel
+from house_price.entity.compiled_preprocessor import CompiledPreprocessor
+from house_price.entity.estimator_model import HousePriceEstimatorModel
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+logger = logging.getLogger(__name__)
+
+ESTIMATOR_MANIFEST_FILE_NAME = 'estimator.json'
+
+ESTIMATOR_ARTIFACT_FORMAT_VERSION = 1
+
+COMPILED_MODEL_CLASSES = {
+    compiled_model_class.__name__: compiled_model_class
+    for compiled_model_class in (CompiledLinearModel, CompiledForestModel)
+}
+
+def is_estimator_artifact(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, ESTIMATOR_MANIFEST_FILE_NAME))
+
+def _save_object(obj: object, artifact_dir: str, name: str) -> dict:
+    if isinstance(obj, CompiledPreprocessor):
+        return {'type': CompiledPreprocessor.__name__, 'params': obj.to_dict()}
+    if type(obj).__name__ in COMPILED_MODEL_CLASSES:
+        arrays = {}
+        for array_name in obj.ARRAY_NAMES:
+            file_name = f'{name}.{array_name}.npy'
+            np.save(os.path.join(artifact_dir, file_name), getattr(obj, array_name))
+            arrays[array_name] = file_name
+        return {'type': type(obj).__name__, 'params': obj.get_params(), 'arrays': arrays}
+    # Anything that is not compiled is stored with joblib, whose numpy arrays can still be memory mapped.
+    import joblib
+    file_name = f'{name}.joblib'
+    joblib.dump(obj, os.path.join(artifact_dir, file_name))
+    return {'type': 'joblib', 'file_name': file_name}
+
+def _load_object(object_info: dict, artifact_dir: str, mmap_mode: str) -> object:
+    if object_info['type'] == CompiledPreprocessor.__name__:
+        return CompiledPreprocessor(**object_info['params'])
+    if object_info['type'] in COMPILED_MODEL_CLASSES:
+        arrays = {
+            array_name: np.load(os.path.join(artifact_dir, file_name), mmap_mode=mmap_mode)
+            for array_name, file_name in object_info['arrays'].items()
+        }
+        return COMPILED_MODEL_CLASSES[object_info['type']](**object_info['params'], **arrays)
+    if object_info['type'] == 'joblib':
+        import joblib
+        return joblib.load(os.path.join(artifact_dir, object_info['file_name']), mmap_mode=mmap_mode)
+    raise Exception(f'Unknown object type {object_info["type"]} in the estimator artifact.')
+
+def save_estimator_artifact(estimator_model: HousePriceEstimatorModel, artifact_dir: str) -> str:
+    ''' Saves the estimator as a directory whose large arrays are plain .npy files\n
+        ------------------------------------------------
+        Takes - HousePriceEstimatorModel, directory to write to\n
+        Returns - artifact directory path
+    '''
+    try:
+        os.makedirs(artifact_dir, exist_ok=True)
+        manifest = {
+            'format_version': ESTIMATOR_ARTIFACT_FORMAT_VERSION,
+            'preprocessing_object': _save_object(
+                estimator_model.preprocessing_object, artifact_dir, 'preprocessing_object'
+            ),
+            'trained_model_object': _save_object(
+                estimator_model.trained_model_object, artifact_dir, 'trained_model_object'
+            )
+        }
+        # The manifest is written last, a reader that finds it finds every array file too.
+        manifest_file_path = os.path.join(artifact_dir, ESTIMATOR_MANIFEST_FILE_NAME)
+        with open(f'{manifest_file_path}.tmp', 'w') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(f'{manifest_file_path}.tmp', manifest_file_path)
+        logger.info('Estimator artifact saved at %s', artifact_dir)
+
+        return artifact_dir
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
+
+def load_estimator_artifact(artifact_dir: str, mmap_mode: str = 'r') -> HousePriceEstimatorModel:
+    ''' Loads an estimator saved by save_estimator_artifact\n
+        ------------------------------------------------
+        With mmap_mode='r' the arrays are mapped read only, so every process
+        serving the same artifact shares the same physical pages.
+    '''
+    try:
+        with open(os.path.join(artifact_dir, ESTIMATOR_MANIFEST_FILE_NAME), 'r') as file:
+            manifest = json.load(file)
+        if manifest['format_version'] != ESTIMATOR_ARTIFACT_FORMAT_VERSION:
+            raise Exception(f'Unsupported estimator artifact version {manifest["format_version"]}.')
+
+        return HousePriceEstimatorModel(
+            preprocessing_object=_load_object(manifest['preprocessing_object'], artifact_dir, mmap_mode),
+            trained_model_object=_load_object(manifest['trained_model_object'], artifact_dir, mmap_mode)
+        )
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
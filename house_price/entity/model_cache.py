@@ -0,0 +1,172 @@
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from house_price.entity.model_artifact import is_estimator_artifact, load_estimator_artifact
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+logger = logging.getLogger(__name__)
+
+CachedModel = namedtuple(
+    'CachedModel',
+    [
+        'model',
+        'model_path',
+        'version'
+    ]
+)
+
+def load_model_from_path(model_path: str, mmap_mode: str = 'r') -> object:
+    ''' Loads an estimator artifact directory (arrays memory mapped) or a pickled model file.
+    '''
+    try:
+        logger.info('Loading model from %s', model_path)
+        if is_estimator_artifact(model_path):
+            model = load_estimator_artifact(artifact_dir=model_path, mmap_mode=mmap_mode)
+        else:
+            # Only legacy pickled models need dill (and the sklearn classes they reference).
+            import dill
+            with open(model_path, 'rb') as file:
+                model = dill.load(file)
+        logger.info('Model loaded from %s', model_path)
+
+        return model
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
+
+
+class ModelCache:
+    ''' Keeps the latest model resident in memory for the lifetime of the worker.\n
+        ------------------------------------------------
+        The model directory is only stat-ed (at most once per check_interval seconds)
+        to detect a new version. A new version is loaded on a background thread and
+        swapped in with a single reference assignment, so requests keep using the
+        previous model until the new one is fully loaded.
+    '''
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(
+        self,
+        model_dir: str,
+        model_path_resolver,
+        version_resolver=None,
+        check_interval: float = 1.0,
+        mmap_mode: str = 'r'
+    ) -> None:
+        try:
+            self.model_dir = model_dir
+            self.model_path_resolver = model_path_resolver
+            self.version_resolver = version_resolver
+            self.check_interval = check_interval
+            self.mmap_mode = mmap_mode
+            self._cached_model = None
+            self._last_check = 0.0
+            self._load_lock = threading.Lock()
+            self._reload_thread = None
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    @classmethod
+    def get_instance(
+        cls,
+        model_dir: str,
+        model_path_resolver,
+        version_resolver=None,
+        check_interval: float = 1.0
+    ) -> 'ModelCache':
+        ''' Returns the process wide cache for model_dir, so every predictor
+            in a worker shares one resident model.
+        '''
+        key = os.path.abspath(model_dir)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(
+                    model_dir=model_dir,
+                    model_path_resolver=model_path_resolver,
+                    version_resolver=version_resolver,
+                    check_interval=check_interval
+                )
+            return cls._instances[key]
+
+    def get_version(self) -> tuple:
+        ''' Cheap version token, by default a single stat of the model directory.
+            Adding a new version folder updates the directory mtime.
+        '''
+        try:
+            if self.version_resolver is not None:
+                return self.version_resolver()
+            stat = os.stat(self.model_dir)
+            return (stat.st_mtime_ns, stat.st_ino)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def load_model(self, version: tuple) -> CachedModel:
+        try:
+            model_path = self.model_path_resolver()
+
+            return CachedModel(
+                model=load_model_from_path(model_path=model_path, mmap_mode=self.mmap_mode),
+                model_path=model_path,
+                version=version
+            )
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def __reload(self, version: tuple) -> None:
+        try:
+            cached_model = self.load_model(version=version)
+            if cached_model.model_path != self._cached_model.model_path:
+                logger.info('Swapped model to %s', cached_model.model_path)
+            self._cached_model = cached_model
+        except Exception:
+            # Keep serving the current model, the next version check retries the reload.
+            logger.error('Model reload failed, serving the previous model.')
+
+    def __schedule_reload(self, version: tuple) -> None:
+        with self._load_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return
+            self._reload_thread = threading.Thread(
+                target=self.__reload,
+                args=(version,),
+                name='model-cache-reload',
+                daemon=True
+            )
+            self._reload_thread.start()
+
+    def get_cached_model(self) -> CachedModel:
+        try:
+            cached_model = self._cached_model
+            if cached_model is None:
+                with self._load_lock:
+                    if self._cached_model is None:
+                        self._cached_model = self.load_model(version=self.get_version())
+                        self._last_check = time.monotonic()
+                    return self._cached_model
+            now = time.monotonic()
+            if now - self._last_check >= self.check_interval:
+                self._last_check = now
+                version = self.get_version()
+                if version != cached_model.version:
+                    self.__schedule_reload(version=version)
+
+            return cached_model
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def get_loaded_model(self) -> CachedModel:
+        ''' Returns the resident model without loading or version checks, None before the first load.
+        '''
+        return self._cached_model
+
+    def get_model(self) -> object:
+        return self.get_cached_model().model
@@ -1,16 +1,23 @@
 from abc import ABCMeta
 from collections import namedtuple
+import copy
 import importlib
 import sys
-import traceback
+import time
 from typing import List
 
 import numpy as np
-from sklearn.metrics import r2_score, mean_squared_error
+import sklearn
+from joblib import Parallel, cpu_count, delayed, parallel_backend
+from sklearn.base import clone
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, HalvingRandomSearchCV, ParameterGrid, ParameterSampler, RandomizedSearchCV, train_test_split
+from threadpoolctl import threadpool_limits
 
+from house_price.entity.trial_store import TrialStore, fingerprint_arrays
 from house_price.exception import HousePricePredictionException
 from house_price.util import util
-from house_price.logger import logging
+from house_price.logger import log_exception, logging
 logger = logging.getLogger(__name__)
 
 InitializedModelDetails = namedtuple(
@@ -19,7 +26,8 @@ InitializedModelDetails = namedtuple(
         'model',
         'model_name',
         'model_serial_number',
-        'grid_search_parameters'
+        'grid_search_parameters',
+        'search_config'
     ]
 )
 
@@ -31,7 +39,14 @@ GridSearchedBestModel = namedtuple(
         'model_serial_number',
         'best_searched_model',
         'best_model_parameters',
-        'best_model_score'
+        'best_model_score',
+        'search_seconds',
+        'fit_count',
+        'n_jobs',
+        'search_strategy',
+        'search_rows',
+        'trial_lookup_count',
+        'trial_hit_count'
     ]
 )
 
@@ -60,14 +75,77 @@ MetricInfoArtifacts = namedtuple(
     ]
 )
 
+CandidateEvaluation = namedtuple(
+    'CandidateEvaluation',
+    [
+        'model',
+        'model_serial_number',
+        'train_accuracy',
+        'test_accuracy',
+        'train_rsme',
+        'test_rsme',
+        'predict_seconds',
+        'metric_seconds',
+        'is_cached'
+    ]
+)
+
+SEARCH_STRATEGIES = ('exhaustive', 'randomized', 'halving')
+
+# Search settings that do not change the scores, left out of the trial keys.
+TRIAL_IGNORED_SEARCH_PARAMS = ('estimator', 'n_jobs', 'verbose', 'refit', 'pre_dispatch', 'return_train_score')
+
+# The probe fit of a wall-clock budget is timed on a share of the rows and scaled up.
+PROBE_ROWS_FRACTION = 0.1
+PROBE_MIN_ROWS = 1000
+
+# Settings that only choose the candidates, a trial is one candidate.
+CANDIDATE_SEARCH_PARAMS = ('param_grid', 'param_distributions', 'n_iter', 'random_state')
+
+def stratified_subsample(X: np.ndarray, y: np.ndarray, fraction: float, random_state: int = None, bin_count: int = 10) -> tuple:
+    ''' Takes fraction of the rows, stratified on quantile bins of the target
+        so the subsample keeps the price distribution.
+    '''
+    bins = np.digitize(y, np.quantile(y, np.linspace(0, 1, bin_count + 1)[1:-1]))
+    indices, _ = train_test_split(np.arange(len(y)), train_size=fraction, stratify=bins, random_state=random_state)
+    indices.sort()
+    return X[indices], y[indices]
+
+def total_sum_of_squares(y: np.ndarray) -> float:
+    centered = np.asarray(y, dtype=np.float64) - np.mean(y)
+    return float(np.dot(centered, centered))
+
+def regression_metrics(y_true: np.ndarray, y_prediction: np.ndarray, y_total_sum_of_squares: float = None) -> tuple:
+    ''' r2 and rmse from a single pass over the residuals, the same values as
+        r2_score and mean_squared_error. The total sum of squares of y_true can be
+        passed in when many predictions are scored against one target.
+    '''
+    residuals = np.subtract(y_true, y_prediction, dtype=np.float64)
+    residual_sum_of_squares = float(np.dot(residuals, residuals))
+    if y_total_sum_of_squares is None:
+        y_total_sum_of_squares = total_sum_of_squares(y_true)
+    if y_total_sum_of_squares == 0:
+        r2 = 1.0 if residual_sum_of_squares == 0 else 0.0
+    else:
+        r2 = 1 - residual_sum_of_squares / y_total_sum_of_squares
+    return r2, float(np.sqrt(residual_sum_of_squares / len(residuals)))
+
 class ModelFactory:
-    def __init__(self, model_config_file_path: str) -> None:
+    def __init__(self, model_config_file_path: str, trial_store_file_path: str = None) -> None:
         try:
             self.model_config = util.read_yaml_file(
                 file_path=model_config_file_path
             )
+            trial_store_config = self.model_config.get('trial_store', {})
+            self.trial_store = None
+            if trial_store_file_path is not None and trial_store_config.get('enabled', False):
+                self.trial_store = TrialStore(
+                    file_path=trial_store_file_path,
+                    max_bytes=trial_store_config.get('max_bytes', 2 ** 30),
+                    store_estimators=trial_store_config.get('store_estimators', True)
+                )
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def get_class_reference(self, module_name: str, class_name: str) -> ABCMeta:
@@ -78,7 +156,7 @@ class ModelFactory:
             class_reference = getattr(module, class_name)
             return class_reference
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def update_property_of_class(self, instance_reference: object, property_data: dict):
@@ -89,53 +167,172 @@ class ModelFactory:
                 setattr(instance_reference, key, value)
             return instance_reference
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def evaluate_model(
+        self, model: object, X_train: np.ndarray, y_train: np.ndarray, X_test: np.ndarray, y_test: np.ndarray,
+        train_total_sum_of_squares: float, test_total_sum_of_squares: float
+    ) -> dict:
+        ''' Predicts both sets once and scores each prediction in one pass.
+        '''
+        start = time.perf_counter()
+        y_train_prediction = model.predict(X_train)
+        y_test_prediction = model.predict(X_test)
+        predict_seconds = time.perf_counter() - start
+        train_accuracy, train_rsme = regression_metrics(y_train, y_train_prediction, train_total_sum_of_squares)
+        test_accuracy, test_rsme = regression_metrics(y_test, y_test_prediction, test_total_sum_of_squares)
+        return {
+            'train_accuracy': train_accuracy,
+            'test_accuracy': test_accuracy,
+            'train_rsme': train_rsme,
+            'test_rsme': test_rsme,
+            'predict_seconds': predict_seconds,
+            'metric_seconds': time.perf_counter() - start - predict_seconds
+        }
+
+    def evaluate_models(
+        self, models: list, X_train: np.ndarray, y_train: np.ndarray,
+        X_test: np.ndarray, y_test: np.ndarray, reuse_scores: bool = False
+    ) -> List[CandidateEvaluation]:
+        ''' Scores the candidates concurrently on threads within the core budget\n
+            ------------------------------------------------
+            Takes - fitted models, training and testing data, reuse_scores to take the
+            metrics of earlier runs from the evaluations table of the trial store. Only
+            valid for models fitted on X_train by perform_grid_search, whose parameters
+            then identify the fit.\n
+            Returns - CandidateEvaluation of every model, in the order of models
+        '''
+        try:
+            train_total_sum_of_squares = total_sum_of_squares(y_train)
+            test_total_sum_of_squares = total_sum_of_squares(y_test)
+            keys = [None] * len(models)
+            metrics = [None] * len(models)
+            if reuse_scores and self.trial_store is not None:
+                data_fingerprint = fingerprint_arrays(X_train, y_train, X_test, y_test)
+                for index, model in enumerate(models):
+                    if model.get_params().get('random_state', 0) is None:
+                        # A differently seeded refit would score differently.
+                        continue
+                    keys[index] = TrialStore.make_key(
+                        data_fingerprint=data_fingerprint,
+                        estimator_class=self.get_estimator_class(model),
+                        estimator_params=model.get_params(),
+                        params={},
+                        context={'sklearn': sklearn.__version__}
+                    )
+                    evaluation = self.trial_store.get_evaluation(keys[index])
+                    if evaluation is not None:
+                        metrics[index] = {**evaluation, 'predict_seconds': 0.0, 'metric_seconds': 0.0}
+            missing_indices = [index for index, model_metrics in enumerate(metrics) if model_metrics is None]
+            # Tree and BLAS predictions release the GIL, so threads avoid copying the models.
+            n_jobs = max(1, min(len(missing_indices), self.get_core_budget()))
+            evaluated_metrics = Parallel(n_jobs=n_jobs, prefer='threads')(
+                delayed(self.evaluate_model)(
+                    models[index], X_train, y_train, X_test, y_test,
+                    train_total_sum_of_squares, test_total_sum_of_squares
+                )
+                for index in missing_indices
+            )
+            for index, model_metrics in zip(missing_indices, evaluated_metrics):
+                metrics[index] = model_metrics
+                if keys[index] is not None:
+                    self.trial_store.put_evaluation(key=keys[index], metrics=model_metrics)
+            if reuse_scores and self.trial_store is not None:
+                self.trial_store.flush()
+            return [
+                CandidateEvaluation(
+                    model=model,
+                    model_serial_number=index,
+                    is_cached=index not in missing_indices,
+                    **metrics[index]
+                )
+                for index, model in enumerate(models)
+            ]
+        except Exception as e:
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
     def get_best_model(
         self, models: list, X_train: np.ndarray, y_train: np.ndarray,
-        X_test: np.ndarray, y_test: np.ndarray, base_accuracy: float = 0.6
+        X_test: np.ndarray, y_test: np.ndarray, base_accuracy: float = 0.6,
+        candidate_evaluations: List[CandidateEvaluation] = None
     ) -> MetricInfoArtifacts:
         try:
-            index = 0
+            if candidate_evaluations is None:
+                candidate_evaluations = self.evaluate_models(models, X_train, y_train, X_test, y_test)
             metric_info_artifacts = None
-            for model in models:
-                logger.info(f'Model number - {index + 1}')
-                logger.info(f'Model name - {str(model)}')
-                y_train_prediction = model.predict(X_train)
-                y_test_prediction = model.predict(X_test)
-                train_accuracy = r2_score(y_train, y_train_prediction)
-                test_accuracy = r2_score(y_test, y_test_prediction)
-                train_rsme = np.sqrt(mean_squared_error(y_train, y_train_prediction))
-                test_rsme = np.sqrt(mean_squared_error(y_test, y_test_prediction))
+            for candidate_evaluation in candidate_evaluations:
+                model = candidate_evaluation.model
+                train_accuracy = candidate_evaluation.train_accuracy
+                test_accuracy = candidate_evaluation.test_accuracy
                 model_accuracy = (2 * (train_accuracy * test_accuracy)) / (train_accuracy + test_accuracy)
                 accuracy_difference = abs(test_accuracy - train_accuracy)
-                logger.info(f'Model train accuracy - {round(train_accuracy, 4)}')
-                logger.info(f'Model test accuracy - {round(test_accuracy, 4)}')
-                logger.info(f'Model train RSME - {round(train_rsme, 4)}')
-                logger.info(f'Model test RSME - {round(test_rsme, 4)}')
-                logger.info(f'Model accuracy - {round(model_accuracy, 4)}')
-                logger.info(f'Accuracy difference - {round(accuracy_difference, 4)}')
+                logger.info('Model number - %s', candidate_evaluation.model_serial_number + 1)
+                logger.info('Model name - %s', model)
+                logger.info('Model train accuracy - %.4f', train_accuracy)
+                logger.info('Model test accuracy - %.4f', test_accuracy)
+                logger.info('Model train RSME - %.4f', candidate_evaluation.train_rsme)
+                logger.info('Model test RSME - %.4f', candidate_evaluation.test_rsme)
+                logger.info('Model accuracy - %.4f', model_accuracy)
+                logger.info('Accuracy difference - %.4f', accuracy_difference)
                 if model_accuracy > base_accuracy and accuracy_difference < 0.15:
                     metric_info_artifacts = MetricInfoArtifacts(
                         model_accuracy=model_accuracy,
                         model_name=str(model),
                         model_object=model,
-                        model_serial_number=index,
+                        model_serial_number=candidate_evaluation.model_serial_number,
                         test_accuracy=test_accuracy,
                         train_accuracy=train_accuracy,
-                        test_rsme=test_rsme,
-                        train_rsme=train_rsme
+                        test_rsme=candidate_evaluation.test_rsme,
+                        train_rsme=candidate_evaluation.train_rsme
                     )
                     base_accuracy = model_accuracy
-                index += 1
             if metric_info_artifacts is None:
                 logger.info('No model found with better accuracy.')
             return metric_info_artifacts
         except Exception as e:
-                logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+                log_exception(logger, e)
                 raise HousePricePredictionException(e, sys) from e
 
+    @staticmethod
+    def get_evaluation_report(candidate_evaluations: List[CandidateEvaluation]) -> list:
+        return [
+            {
+                'model_serial_number': candidate_evaluation.model_serial_number,
+                'model_name': str(candidate_evaluation.model),
+                'predict_seconds': candidate_evaluation.predict_seconds,
+                'metric_seconds': candidate_evaluation.metric_seconds,
+                'is_cached': candidate_evaluation.is_cached
+            }
+            for candidate_evaluation in candidate_evaluations
+        ]
+
+    def update_model(self, model: object, X: np.ndarray, y: np.ndarray, added_estimators: int) -> object:
+        ''' Updates a copy of a fitted model with new rows instead of refitting it\n
+            ------------------------------------------------
+            Ensembles with warm_start (forests, boosting) get added_estimators more
+            estimators fitted on the new rows, estimators with partial_fit take one
+            more pass over them.\n
+            Returns - updated copy, None when the model supports neither
+        '''
+        try:
+            if 'warm_start' in model.get_params() and 'n_estimators' in model.get_params():
+                updated_model = copy.deepcopy(model)
+                updated_model.set_params(warm_start=True, n_estimators=model.n_estimators + added_estimators)
+                updated_model.fit(X, y)
+                updated_model.set_params(warm_start=False)
+                return updated_model
+            if hasattr(model, 'partial_fit'):
+                updated_model = copy.deepcopy(model)
+                updated_model.partial_fit(X, y)
+                return updated_model
+            logger.info('%s supports neither warm_start nor partial_fit.', type(model).__name__)
+            return None
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
     def initialize_all_models(self) -> List[InitializedModelDetails]:
         try:
             models = []
@@ -163,73 +360,411 @@ class ModelFactory:
                         model=model,
                         model_name=f'{module_config["class"]}',
                         model_serial_number=module,
-                        grid_search_parameters=grid_search_parameters
+                        grid_search_parameters=grid_search_parameters,
+                        search_config=module_config.get('search')
                     )
                 )
 
             return models
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
-    def grid_search(self, initialized_model: InitializedModelDetails, X: np.ndarray, y: np.ndarray) -> GridSearchedBestModel:
+    def get_core_budget(self) -> int:
+        return self.model_config.get('parallelism', {}).get('core_budget') or cpu_count()
+
+    def get_parallelism(self, model_count: int) -> tuple:
+        ''' Splits the core budget of model.yaml between concurrent model searches\n
+            ------------------------------------------------
+            Takes - number of models to search\n
+            Returns - (models searched at once, n_jobs of each search)
+        '''
+        parallelism = self.model_config.get('parallelism', {})
+        core_budget = self.get_core_budget()
+        model_jobs = max(1, min(parallelism.get('n_jobs', 1), model_count, core_budget))
+        return model_jobs, max(1, core_budget // model_jobs)
+
+    def set_random_state(self, model: object) -> object:
+        ''' Seeds estimators that take a random_state and have none, so the search
+            gives the same result however the fits are scheduled.
+        '''
+        random_state = self.model_config.get('parallelism', {}).get('random_state')
+        if random_state is not None and model.get_params().get('random_state', 0) is None:
+            model.set_params(random_state=random_state)
+        return model
+
+    def grid_search(self, initialized_model: InitializedModelDetails, X: np.ndarray, y: np.ndarray, n_jobs: int = 1) -> GridSearchedBestModel:
+        ''' Searches one model with n_jobs worker processes.
+            BLAS and OpenMP pools are limited to one thread per process, so a search
+            never uses more than n_jobs cores.
+        '''
         try:
-            if initialized_model.grid_search_parameters == None:
-                logger.info('No parameters set for grid search.')
-                logger.info(f'Skipping grid search for {initialized_model.model_name}')
-                model = initialized_model.model
-                model.fit(X, y)
-                grid_searched_best_model = GridSearchedBestModel(
-                    initialized_model=initialized_model.model,
-                    model_serial_number=initialized_model.model_serial_number,
-                    model_name=initialized_model.model_name,
-                    best_searched_model=model,
-                    best_model_parameters=None,
-                    best_model_score=None
+            with threadpool_limits(limits=1), parallel_backend('loky', inner_max_num_threads=1):
+                grid_searched_best_model = self.__grid_search(initialized_model, X, y, n_jobs)
+            if self.trial_store is not None:
+                # A search worker holds its own copy of the store, its hits are written before it returns.
+                self.trial_store.flush()
+            return grid_searched_best_model
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def __grid_search(self, initialized_model: InitializedModelDetails, X: np.ndarray, y: np.ndarray, n_jobs: int) -> GridSearchedBestModel:
+        start = time.perf_counter()
+        self.set_random_state(initialized_model.model)
+        lookup_count, hit_count = self.get_trial_counts()
+        if initialized_model.grid_search_parameters == None:
+            logger.info('No parameters set for grid search.')
+            logger.info('Skipping grid search for %s', initialized_model.model_name)
+            model, fit_count = self.fit_best_model(initialized_model, {}, X, y)
+            grid_searched_best_model = GridSearchedBestModel(
+                initialized_model=initialized_model.model,
+                model_serial_number=initialized_model.model_serial_number,
+                model_name=initialized_model.model_name,
+                best_searched_model=model,
+                best_model_parameters=None,
+                best_model_score=None,
+                search_seconds=time.perf_counter() - start,
+                fit_count=fit_count,
+                n_jobs=1,
+                search_strategy=None,
+                search_rows=X.shape[0],
+                trial_lookup_count=self.get_trial_counts()[0] - lookup_count,
+                trial_hit_count=self.get_trial_counts()[1] - hit_count
+            )
+            return grid_searched_best_model
+        search_config = initialized_model.search_config or {}
+        X_search, y_search = X, y
+        subsample = search_config.get('subsample', 1.0)
+        if subsample < 1.0:
+            X_search, y_search = stratified_subsample(
+                X, y, fraction=subsample, random_state=self.model_config.get('parallelism', {}).get('random_state')
+            )
+        logger.info('Started grid search for %s on %s rows', initialized_model.model_name, X_search.shape[0])
+        grid_search, search_strategy = self.get_search(initialized_model, search_config, X_search, y_search, n_jobs)
+        if grid_search is None:
+            logger.info('The budget of %s allows no search, fitting its default parameters.', initialized_model.model_name)
+            best_params, best_score, fit_count = {}, None, 0
+        else:
+            # The best candidate is refit on all the rows below, the search itself never refits.
+            grid_search.refit = False
+            if self.trial_store is None:
+                grid_search.fit(X_search, y_search)
+                best_params, best_score = grid_search.best_params_, grid_search.best_score_
+                fit_count = len(grid_search.cv_results_['params']) * grid_search.n_splits_
+            elif search_strategy == 'halving':
+                best_params, best_score, fit_count = self.__cached_halving_search(initialized_model, grid_search, X_search, y_search)
+            else:
+                best_params, best_score, fit_count = self.__cached_candidate_search(initialized_model, grid_search, X_search, y_search)
+        best_searched_model, refit_count = self.fit_best_model(initialized_model, best_params, X, y)
+        grid_searched_best_model = GridSearchedBestModel(
+            initialized_model=initialized_model.model,
+            model_serial_number=initialized_model.model_serial_number,
+            model_name=initialized_model.model_name,
+            best_searched_model=best_searched_model,
+            best_model_parameters=best_params,
+            best_model_score=best_score,
+            search_seconds=time.perf_counter() - start,
+            # Every candidate on every fold, plus the refit of the best one.
+            fit_count=fit_count + refit_count,
+            n_jobs=n_jobs,
+            search_strategy=search_strategy,
+            search_rows=X_search.shape[0],
+            trial_lookup_count=self.get_trial_counts()[0] - lookup_count,
+            trial_hit_count=self.get_trial_counts()[1] - hit_count
+        )
+
+        logger.info('Finished grid search for %s', initialized_model.model_name)
+        logger.info('Best parameters - %s', best_params)
+        return grid_searched_best_model
+
+    @staticmethod
+    def get_estimator_class(model: object) -> str:
+        return f'{type(model).__module__}.{type(model).__qualname__}'
+
+    def get_trial_counts(self) -> tuple:
+        if self.trial_store is None:
+            return 0, 0
+        return self.trial_store.lookup_count, self.trial_store.hit_count
+
+    def get_trial_key(self, initialized_model: InitializedModelDetails, data_fingerprint: str, params: dict, search: object = None, exclude: tuple = ()) -> str:
+        ''' Trial store key of the model with params on the data, under the settings of search
+            except the ones in exclude.
+        '''
+        model = initialized_model.model
+        context = {'sklearn': sklearn.__version__}
+        if search is not None:
+            context['search'] = {
+                name: value for name, value in search.get_params(deep=False).items()
+                if name not in TRIAL_IGNORED_SEARCH_PARAMS + exclude
+            }
+        return TrialStore.make_key(
+            data_fingerprint=data_fingerprint,
+            estimator_class=self.get_estimator_class(model),
+            estimator_params=model.get_params(),
+            params=params,
+            context=context
+        )
+
+    def __cached_candidate_search(self, initialized_model: InitializedModelDetails, search: object, X: np.ndarray, y: np.ndarray) -> tuple:
+        ''' Looks every candidate of the exhaustive or randomized search up in the
+            trial store and cross validates only the missing ones.\n
+            Returns - (best parameters, best score, number of fits)
+        '''
+        if isinstance(search, RandomizedSearchCV):
+            # The same candidates RandomizedSearchCV samples itself.
+            candidates = list(ParameterSampler(search.param_distributions, search.n_iter, random_state=search.random_state))
+        else:
+            candidates = list(ParameterGrid(search.param_grid))
+        data_fingerprint = fingerprint_arrays(X, y)
+        scores = np.full(len(candidates), np.nan)
+        missing_candidates = []
+        for index, params in enumerate(candidates):
+            key = self.get_trial_key(initialized_model, data_fingerprint, params, search, exclude=CANDIDATE_SEARCH_PARAMS)
+            trial = self.trial_store.get(key)
+            if trial is None:
+                missing_candidates.append((index, key))
+            elif trial['mean_test_score'] is not None:
+                scores[index] = trial['mean_test_score']
+        logger.info(
+            '%s of %s candidates of %s found in the trial store',
+            len(candidates) - len(missing_candidates), len(candidates), initialized_model.model_name
+        )
+        fit_count = 0
+        if len(missing_candidates) > 0:
+            missing_search = GridSearchCV(
+                estimator=initialized_model.model,
+                param_grid=[{name: [value] for name, value in candidates[index].items()} for index, _ in missing_candidates]
+            )
+            missing_search.set_params(**{
+                name: value for name, value in search.get_params(deep=False).items()
+                if name in missing_search.get_params(deep=False) and name not in ('estimator', 'param_grid')
+            })
+            missing_search.fit(X, y)
+            cv_results = missing_search.cv_results_
+            for position, (index, key) in enumerate(missing_candidates):
+                scores[index] = cv_results['mean_test_score'][position]
+                self.trial_store.put(
+                    key=key,
+                    estimator_class=self.get_estimator_class(initialized_model.model),
+                    params=candidates[index],
+                    mean_test_score=None if np.isnan(scores[index]) else float(scores[index]),
+                    std_test_score=float(cv_results['std_test_score'][position]),
+                    fit_seconds=float(cv_results['mean_fit_time'][position])
                 )
-                return grid_searched_best_model
-            logger.info(f'Started grid search for {initialized_model.model_name}')
-            grid_search_object = self.get_class_reference(
+            fit_count = len(missing_candidates) * missing_search.n_splits_
+        if np.all(np.isnan(scores)):
+            raise Exception(f'Every candidate of {initialized_model.model_name} failed to fit.')
+        # The first of equal scores wins, as in the search classes.
+        best_index = int(np.nanargmax(scores))
+        return candidates[best_index], float(scores[best_index]), fit_count
+
+    def __cached_halving_search(self, initialized_model: InitializedModelDetails, search: object, X: np.ndarray, y: np.ndarray) -> tuple:
+        ''' The rounds of successive halving depend on each other, so the whole
+            search is a single trial of the store.\n
+            Returns - (best parameters, best score, number of fits)
+        '''
+        key = self.get_trial_key(initialized_model, fingerprint_arrays(X, y), {}, search)
+        trial = self.trial_store.get(key)
+        if trial is not None:
+            logger.info('Halving search of %s found in the trial store', initialized_model.model_name)
+            return trial['params'], trial['mean_test_score'], 0
+        search.fit(X, y)
+        self.trial_store.put(
+            key=key,
+            estimator_class=self.get_estimator_class(initialized_model.model),
+            params=search.best_params_,
+            mean_test_score=float(search.best_score_),
+            std_test_score=float(search.cv_results_['std_test_score'][search.best_index_])
+        )
+        return search.best_params_, float(search.best_score_), len(search.cv_results_['params']) * search.n_splits_
+
+    def fit_best_model(self, initialized_model: InitializedModelDetails, params: dict, X: np.ndarray, y: np.ndarray) -> tuple:
+        ''' Fits the model with params on all the rows, or takes the fitted model
+            from the trial store when it holds one.\n
+            Returns - (fitted model, number of fits)
+        '''
+        model = clone(initialized_model.model).set_params(**params)
+        if self.trial_store is None:
+            return model.fit(X, y), 1
+        key = self.get_trial_key(initialized_model, fingerprint_arrays(X, y), {'refit': params})
+        trial = self.trial_store.get(key)
+        if trial is not None and trial['estimator'] is not None:
+            logger.info('Fitted %s found in the trial store', initialized_model.model_name)
+            return trial['estimator'], 0
+        start = time.perf_counter()
+        model.fit(X, y)
+        self.trial_store.put(
+            key=key,
+            estimator_class=self.get_estimator_class(model),
+            params=params,
+            fit_seconds=time.perf_counter() - start,
+            estimator=model
+        )
+        return model, 1
+
+    def get_search(
+        self, initialized_model: InitializedModelDetails, search_config: dict,
+        X: np.ndarray, y: np.ndarray, n_jobs: int
+    ) -> tuple:
+        ''' Builds the search object of the model's strategy within its budget\n
+            ------------------------------------------------
+            Takes - model, its search section of model.yaml, search rows, n_jobs\n
+            Returns - (unfitted search object, strategy actually used), (None, None)
+            when the budget does not allow cross validating a single candidate
+        '''
+        strategy = search_config.get('strategy', 'exhaustive')
+        if strategy not in SEARCH_STRATEGIES:
+            raise Exception(f'Unknown search strategy {strategy}, expected one of {SEARCH_STRATEGIES}.')
+        search_params = dict(self.model_config['grid_search']['params'])
+        cv = search_params.get('cv', 5)
+        random_state = self.model_config.get('parallelism', {}).get('random_state')
+        param_grid = dict(initialized_model.grid_search_parameters)
+        resource = search_config.get('resource', 'n_samples')
+        max_resources = search_config.get('max_resources', 'auto')
+        if strategy == 'halving' and resource != 'n_samples':
+            # The resource is raised by the halving itself, it can not also be searched.
+            resource_values = param_grid.pop(resource, None)
+            if max_resources == 'auto':
+                if resource_values is None:
+                    raise Exception(f'Halving over {resource} needs max_resources or {resource} values in the grid.')
+                max_resources = max(resource_values)
+        candidate_count = len(ParameterGrid(param_grid))
+        max_fits = self.get_max_fits(initialized_model, search_config, X, y, n_jobs)
+        if max_fits is not None and max_fits < cv:
+            return None, None
+        if strategy == 'exhaustive' and max_fits is not None and candidate_count * cv > max_fits:
+            logger.info('%s candidates exceed the budget of %s fits, sampling them instead.', candidate_count, max_fits)
+            strategy = 'randomized'
+        if strategy == 'exhaustive':
+            search_class = self.get_class_reference(
                 module_name=self.model_config['grid_search']['module'],
                 class_name=self.model_config['grid_search']['class']
             )
-            grid_search = grid_search_object(
+            search = search_class(estimator=initialized_model.model, param_grid=param_grid)
+        elif strategy == 'randomized':
+            n_iter = search_config.get('n_iter', candidate_count)
+            if max_fits is not None:
+                n_iter = min(n_iter, max_fits // cv)
+            search = RandomizedSearchCV(
                 estimator=initialized_model.model,
-                param_grid=initialized_model.grid_search_parameters 
-            )
-            grid_search = self.update_property_of_class(
-                instance_reference=grid_search,
-                property_data=self.model_config['grid_search']['params']
-            )
-            grid_search.fit(X, y)
-            grid_searched_best_model = GridSearchedBestModel(
-                initialized_model=initialized_model.model,
-                model_serial_number=initialized_model.model_serial_number,
-                model_name=initialized_model.model_name,
-                best_searched_model=grid_search.best_estimator_,
-                best_model_parameters=grid_search.best_params_,
-                best_model_score=grid_search.best_score_
+                param_distributions=param_grid,
+                n_iter=min(n_iter, candidate_count),
+                random_state=random_state
             )
+        else:
+            factor = search_config.get('factor', 3)
+            halving_params = {
+                'resource': resource,
+                'max_resources': max_resources,
+                'min_resources': search_config.get('min_resources', 'exhaust'),
+                'factor': factor,
+                'random_state': random_state
+            }
+            # Successive halving fits about candidates * cv * factor / (factor - 1) models.
+            halving_fits = candidate_count * cv * factor / (factor - 1)
+            if max_fits is not None and halving_fits > max_fits:
+                search = HalvingRandomSearchCV(
+                    estimator=initialized_model.model,
+                    param_distributions=param_grid,
+                    n_candidates=max(1, int(max_fits * (factor - 1) / (cv * factor))),
+                    **halving_params
+                )
+            else:
+                search = HalvingGridSearchCV(
+                    estimator=initialized_model.model,
+                    param_grid=param_grid,
+                    **halving_params
+                )
+        search = self.update_property_of_class(instance_reference=search, property_data=search_params)
+        search.n_jobs = n_jobs
+        return search, strategy
 
-            logger.info(f'Finished grid search for {initialized_model.model_name}')
-            logger.info(f'Best parameters - {grid_search.best_params_}')
-            return grid_searched_best_model
+    def get_max_fits(
+        self, initialized_model: InitializedModelDetails, search_config: dict,
+        X: np.ndarray, y: np.ndarray, n_jobs: int
+    ) -> int:
+        ''' Fit budget of the search, max_fits and max_seconds of the search section.
+            A wall-clock budget is turned into fits with one probe fit on a share of
+            the rows, timed and scaled up to the fold size, whose time is taken out
+            of the budget.
+        '''
+        max_fits = search_config.get('max_fits')
+        max_seconds = search_config.get('max_seconds')
+        if max_seconds is None:
+            return max_fits
+        cv = self.model_config['grid_search']['params'].get('cv', 5)
+        fold_rows = X.shape[0] * (cv - 1) // cv
+        probe_rows = min(fold_rows, max(PROBE_MIN_ROWS, int(fold_rows * PROBE_ROWS_FRACTION)))
+        start = time.perf_counter()
+        clone(initialized_model.model).fit(X[:probe_rows], y[:probe_rows])
+        probe_seconds = time.perf_counter() - start
+        seconds_per_fit = max(probe_seconds * fold_rows / probe_rows, 1e-3)
+        remaining_seconds = max(0.0, max_seconds - probe_seconds)
+        time_fits = int(remaining_seconds * n_jobs / seconds_per_fit)
+        logger.info(
+            'Probe fit of %s rows took %.3f s, about %.3f s per fit, the %.3f s left of %s s allow about %s fits',
+            probe_rows, probe_seconds, seconds_per_fit, remaining_seconds, max_seconds, time_fits
+        )
+        return time_fits if max_fits is None else min(max_fits, time_fits)
+
+    def perform_grid_search(self, initialized_models: List[InitializedModelDetails], X: np.ndarray, y: np.ndarray) -> List[GridSearchedBestModel]:
+        ''' Searches the models concurrently within the core budget of model.yaml,
+            the results keep the order of initialized_models.
+        '''
+        try:
+            model_jobs, n_jobs = self.get_parallelism(model_count=len(initialized_models))
+            logger.info('Searching %s models at a time with n_jobs %s each', model_jobs, n_jobs)
+            if model_jobs == 1:
+                return [
+                    self.grid_search(initialized_model=initialized_model, X=X, y=y, n_jobs=n_jobs)
+                    for initialized_model in initialized_models
+                ]
+            return Parallel(n_jobs=model_jobs, backend='loky')(
+                delayed(self.grid_search)(initialized_model=initialized_model, X=X, y=y, n_jobs=n_jobs)
+                for initialized_model in initialized_models
+            )
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
 
-    def perform_grid_search(self, initialized_models: List[InitializedModelDetails], X: np.ndarray, y: np.ndarray) -> List[GridSearchedBestModel]:
+    @staticmethod
+    def get_search_report(grid_searched_best_models: List[GridSearchedBestModel]) -> list:
+        return [
+            {
+                'model_serial_number': grid_searched_best_model.model_serial_number,
+                'model_name': grid_searched_best_model.model_name,
+                'search_seconds': grid_searched_best_model.search_seconds,
+                'fit_count': grid_searched_best_model.fit_count,
+                'seconds_per_fit': (
+                    grid_searched_best_model.search_seconds / grid_searched_best_model.fit_count
+                    if grid_searched_best_model.fit_count else None
+                ),
+                'n_jobs': grid_searched_best_model.n_jobs,
+                'search_strategy': grid_searched_best_model.search_strategy,
+                'search_rows': grid_searched_best_model.search_rows,
+                'best_model_parameters': grid_searched_best_model.best_model_parameters,
+                'best_model_score': grid_searched_best_model.best_model_score,
+                'trial_lookup_count': grid_searched_best_model.trial_lookup_count,
+                'trial_hit_count': grid_searched_best_model.trial_hit_count
+            }
+            for grid_searched_best_model in grid_searched_best_models
+        ]
+
+    def get_trial_store_report(self, grid_searched_best_models: List[GridSearchedBestModel]) -> dict:
+        ''' Size of the trial store and its hit rate over the searches, None without a store.
+        '''
         try:
-            grid_searched_best_models = []
-            for initialized_model in initialized_models:
-                grid_searched_best_model = self.grid_search(
-                    initialized_model=initialized_model,
-                    X=X,
-                    y=y
-                )
-                grid_searched_best_models.append(grid_searched_best_model)
-            
-            return grid_searched_best_models
+            if self.trial_store is None:
+                return None
+            lookup_count = sum(model.trial_lookup_count for model in grid_searched_best_models)
+            hit_count = sum(model.trial_hit_count for model in grid_searched_best_models)
+            return {
+                **self.trial_store.get_stats(),
+                'lookup_count': lookup_count,
+                'hit_count': hit_count,
+                'hit_rate': hit_count / lookup_count if lookup_count else 0.0
+            }
         except Exception as e:
-            logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+            log_exception(logger, e)
             raise HousePricePredictionException(e, sys) from e
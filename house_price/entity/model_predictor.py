@@ -1,13 +1,47 @@
 import os
 import sys
 
+import numpy as np
 import pandas as pd
-import dill
 
-from house_price.exception import HousePricePredictionException
+from house_price.entity.model_artifact import is_estimator_artifact
+from house_price.entity.model_cache import ModelCache
+from house_price.entity.model_registry import ModelRegistry
+from house_price.entity.prediction_cache import PredictionCache
+from house_price.exception import HousePricePredictionException, HousingInputError
+from house_price.util.metrics import time_phase
+
+HOUSING_INPUT_COLUMNS = [
+    'longitude',
+    'latitude',
+    'housing_median_age',
+    'total_rooms',
+    'total_bedrooms',
+    'population',
+    'households',
+    'median_income',
+    'ocean_proximity'
+]
+
+HOUSING_NUMERICAL_COLUMNS = HOUSING_INPUT_COLUMNS[:-1]
+
+HOUSING_CATEGORICAL_COLUMNS = HOUSING_INPUT_COLUMNS[-1:]
+
+# Divisors of the engineered ratio features, a zero would make them infinite.
+HOUSING_DENOMINATOR_COLUMNS = ['total_rooms', 'households']
+
+def has_bool_values(values) -> bool:
+    ''' True when values hold booleans, which numpy would silently turn into 0 and 1.
+    '''
+    values = np.asarray(values)
+    if values.dtype == bool:
+        return True
+    return values.dtype == object and any(isinstance(value, (bool, np.bool_)) for value in values.ravel())
 
 class HousePriceData:
 
+    __slots__ = tuple(HOUSING_INPUT_COLUMNS)
+
     def __init__(
         self,
         longitude: float,
@@ -57,31 +91,326 @@ class HousePriceData:
         except Exception as e:
             raise HousePricePredictionException(e, sys)
 
+    @staticmethod
+    def get_housing_batch_data_frame(housing_data) -> pd.DataFrame:
+        ''' Builds one DataFrame for a whole batch of houses\n
+            ------------------------------------------------
+            Takes - HousePriceBatch, DataFrame or list of dicts with the HousePriceData fields\n
+            Returns - DataFrame with the columns in HOUSING_INPUT_COLUMNS order
+        '''
+        try:
+            if not isinstance(housing_data, HousePriceBatch):
+                housing_data = HousePriceBatch.from_housing_data(housing_data)
+            return housing_data.get_housing_input_data_frame()
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+
+class HousePriceBatch:
+    ''' Columnar batch of houses, one NumPy array per HousePriceData field.\n
+        ------------------------------------------------
+        Numerical fields are stored as float64 arrays and ocean_proximity as an
+        object array, so a batch of any size holds nine arrays instead of one
+        Python object per house.
+    '''
+
+    __slots__ = tuple(HOUSING_INPUT_COLUMNS)
+
+    def __init__(self, **columns) -> None:
+        try:
+            missing_columns = [
+                column for column in HOUSING_INPUT_COLUMNS if column not in columns
+            ]
+            if missing_columns:
+                raise HousingInputError(missing_columns[0], f'Missing field {missing_columns[0]}.')
+            row_count = None
+            for column in HOUSING_INPUT_COLUMNS:
+                dtype = object if column in HOUSING_CATEGORICAL_COLUMNS else np.float64
+                if dtype is np.float64 and has_bool_values(columns[column]):
+                    raise HousingInputError(column, f'Field {column} must be a number or null.')
+                try:
+                    values = np.asarray(columns[column], dtype=dtype)
+                except (TypeError, ValueError):
+                    raise HousingInputError(column, f'Field {column} must be a number or null.')
+                if values.ndim != 1:
+                    raise Exception(f'Column {column} must be one dimensional.')
+                if row_count is None:
+                    row_count = len(values)
+                elif len(values) != row_count:
+                    raise Exception(f'Column {column} has {len(values)} rows, expected {row_count}.')
+                object.__setattr__(self, column, values)
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+    @classmethod
+    def from_records(cls, records: list) -> 'HousePriceBatch':
+        ''' Fills the column arrays straight from a list of dicts (e.g. a JSON payload)
+            without building an intermediate object per house.
+        '''
+        try:
+            row_count = len(records)
+            for record in records:
+                if not isinstance(record, dict):
+                    raise HousingInputError(None, 'Every house must be a JSON object.')
+                for column in HOUSING_INPUT_COLUMNS:
+                    if column not in record:
+                        raise HousingInputError(column, f'Missing field {column}.')
+            columns = {}
+            for column in HOUSING_NUMERICAL_COLUMNS:
+                if any(isinstance(record[column], bool) for record in records):
+                    raise HousingInputError(column, f'Field {column} must be a number or null.')
+                try:
+                    columns[column] = np.fromiter(
+                        (np.nan if record[column] is None else record[column] for record in records),
+                        dtype=np.float64,
+                        count=row_count
+                    )
+                except (TypeError, ValueError):
+                    raise HousingInputError(column, f'Field {column} must be a number or null.')
+            for column in HOUSING_CATEGORICAL_COLUMNS:
+                values = np.empty(row_count, dtype=object)
+                values[:] = [record[column] for record in records]
+                columns[column] = values
+            return cls(**columns)
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+    @classmethod
+    def from_data_frame(cls, housing_df: pd.DataFrame) -> 'HousePriceBatch':
+        try:
+            return cls(**{
+                column: housing_df[column].to_numpy()
+                for column in HOUSING_INPUT_COLUMNS if column in housing_df.columns
+            })
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+    @classmethod
+    def from_housing_data(cls, housing_data) -> 'HousePriceBatch':
+        ''' Builds a batch from a DataFrame, a dict of columns,
+            a list of dicts or a list of HousePriceData objects.
+        '''
+        try:
+            if isinstance(housing_data, pd.DataFrame):
+                return cls.from_data_frame(housing_data)
+            if isinstance(housing_data, dict):
+                return cls(**housing_data)
+            if len(housing_data) > 0 and isinstance(housing_data[0], HousePriceData):
+                return cls(**{
+                    column: [getattr(house, column) for house in housing_data]
+                    for column in HOUSING_INPUT_COLUMNS
+                })
+            return cls.from_records(housing_data)
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+    def __len__(self) -> int:
+        return len(self.longitude)
+
+    def take(self, indices) -> 'HousePriceBatch':
+        ''' Returns a new batch with the houses at the given positions.
+        '''
+        try:
+            return HousePriceBatch(**{
+                column: getattr(self, column)[indices] for column in HOUSING_INPUT_COLUMNS
+            })
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+    def get_row_errors(self, domain_value: dict = None) -> np.ndarray:
+        ''' Checks every house against the schema\n
+            ------------------------------------------------
+            Numbers must be finite, and total_rooms and households non zero, as
+            they divide the engineered features.
+            Takes - domain_value of schema.yaml, without it categories are only
+            checked to be strings\n
+            Returns - object array with None for a valid house and the
+            HousingInputError of its first bad field otherwise
+        '''
+        try:
+            row_errors = np.full(len(self), None, dtype=object)
+            is_valid = np.ones(len(self), dtype=bool)
+            for column in HOUSING_NUMERICAL_COLUMNS:
+                invalid = np.isinf(getattr(self, column)) & is_valid
+                if invalid.any():
+                    row_errors[invalid] = HousingInputError(column, f'Field {column} must be a finite number or null.')
+                    is_valid &= ~invalid
+            for column in HOUSING_DENOMINATOR_COLUMNS:
+                invalid = (getattr(self, column) == 0) & is_valid
+                if invalid.any():
+                    row_errors[invalid] = HousingInputError(column, f'Field {column} must not be zero.')
+                    is_valid &= ~invalid
+            for column in HOUSING_CATEGORICAL_COLUMNS:
+                values = getattr(self, column)
+                categories = set((domain_value or {}).get(column) or ())
+                # Missing categories are imputed by the preprocessor.
+                invalid = np.fromiter(
+                    (
+                        not is_missing and not (isinstance(value, str) and (not categories or value in categories))
+                        for value, is_missing in zip(values, pd.isna(values))
+                    ),
+                    dtype=bool,
+                    count=len(values)
+                ) & is_valid
+                if invalid.any():
+                    if categories:
+                        message = f'Field {column} must be one of {sorted(categories)} or null.'
+                    else:
+                        message = f'Field {column} must be a string or null.'
+                    row_errors[invalid] = HousingInputError(column, message)
+                    is_valid &= ~invalid
+            return row_errors
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+    def validate(self, domain_value: dict = None) -> None:
+        ''' Raises the HousingInputError of the first invalid house, see get_row_errors.
+        '''
+        try:
+            row_errors = self.get_row_errors(domain_value=domain_value)
+            invalid_indices = np.flatnonzero(np.not_equal(row_errors, None))
+            if len(invalid_indices) == 0:
+                return
+            row_error = row_errors[invalid_indices[0]]
+            if len(self) == 1:
+                raise row_error
+            raise HousingInputError(row_error.field, f'House {invalid_indices[0]} - {row_error}')
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+    def __setattr__(self, name, value) -> None:
+        raise AttributeError(f'{type(self).__name__} is read only.')
+
+    @property
+    def nbytes(self) -> int:
+        ''' Memory held by the batch, the column buffers plus
+            the distinct ocean_proximity strings they point to.
+        '''
+        try:
+            total_bytes = 0
+            for column in HOUSING_INPUT_COLUMNS:
+                values = getattr(self, column)
+                total_bytes += values.nbytes
+                if values.dtype == object:
+                    total_bytes += sum(
+                        sys.getsizeof(value) for value in {id(value): value for value in values}.values()
+                    )
+            return total_bytes
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+    def get_housing_input_data_frame(self) -> pd.DataFrame:
+        ''' Wraps the column arrays in a DataFrame without copying them.
+        '''
+        try:
+            return pd.DataFrame(
+                {column: getattr(self, column) for column in HOUSING_INPUT_COLUMNS},
+                copy=False
+            )
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
 
 class HousePricePredictor:
 
-    def __init__(self, model_dir: str):
+    def __init__(self, model_dir: str, check_interval: float = 1.0, prediction_cache: PredictionCache = None):
         try:
             self.model_dir = model_dir
+            self.prediction_cache = prediction_cache
+            self.model_registry = ModelRegistry(model_dir=model_dir)
+            self.model_cache = ModelCache.get_instance(
+                model_dir=model_dir,
+                model_path_resolver=self.get_latest_model_path,
+                version_resolver=self.get_model_version,
+                check_interval=check_interval
+            )
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+    def get_model_version(self) -> tuple:
+        ''' Version token of the served model, the registry current pointer
+            when there is one, otherwise the model directory itself.
+        '''
+        try:
+            if self.model_registry.has_current():
+                return self.model_registry.get_version_token()
+            stat = os.stat(self.model_dir)
+            return (stat.st_mtime_ns, stat.st_ino)
         except Exception as e:
             raise HousePricePredictionException(e, sys) from e
 
     def get_latest_model_path(self):
         try:
-            folder_name = list(map(int, os.listdir(self.model_dir)))
+            if self.model_registry.has_current():
+                return self.model_registry.get_current_model_path()
+            folder_name = [int(name) for name in os.listdir(self.model_dir) if name.isdigit()]
             latest_model_dir = os.path.join(self.model_dir, f"{max(folder_name)}")
-            file_name = os.listdir(latest_model_dir)[0]
-            latest_model_path = os.path.join(latest_model_dir, file_name)
+            file_names = sorted(os.listdir(latest_model_dir))
+            # Prefer the memory mappable estimator artifact over the pickled model.
+            for file_name in file_names:
+                if is_estimator_artifact(os.path.join(latest_model_dir, file_name)):
+                    return os.path.join(latest_model_dir, file_name)
+            latest_model_path = os.path.join(latest_model_dir, file_names[0])
             return latest_model_path
         except Exception as e:
             raise HousePricePredictionException(e, sys) from e
 
     def predict(self, X):
         try:
-            model_path = self.get_latest_model_path()
-            with open(model_path, 'rb') as file:
-                model = dill.load(file)
+            model = self.model_cache.get_model()
             median_house_value = model.predict(X)
             return median_house_value
         except Exception as e:
-            raise HousePricePredictionException(e, sys) from e
\ No newline at end of file
+            raise HousePricePredictionException(e, sys) from e
+
+    def predict_batch(self, housing_data, timings: dict = None) -> list:
+        ''' Predicts a whole batch with a single model.predict call,
+            the predictions are returned in the input order.
+            With a prediction cache only the houses missing from it are predicted.
+            When a timings dict is given the seconds spent in model lookup,
+            cache lookup, preprocessing and prediction are added to it.
+        '''
+        try:
+            if not isinstance(housing_data, HousePriceBatch):
+                housing_data = HousePriceBatch.from_housing_data(housing_data)
+            if len(housing_data) == 0:
+                return []
+            with time_phase(timings, 'model'):
+                cached_model = self.model_cache.get_cached_model()
+            if self.prediction_cache is None:
+                return self.__predict_with_timings(
+                    cached_model.model, housing_data.get_housing_input_data_frame(), timings
+                ).tolist()
+            with time_phase(timings, 'cache'):
+                keys = self.prediction_cache.make_keys(
+                    housing_batch=housing_data,
+                    columns=HOUSING_INPUT_COLUMNS,
+                    categorical_columns=HOUSING_CATEGORICAL_COLUMNS
+                )
+                median_house_values = self.prediction_cache.get_many(keys, cached_model.version)
+            missing_indices = [index for index, value in enumerate(median_house_values) if value is None]
+            if missing_indices:
+                missing_batch = housing_data.take(missing_indices)
+                predicted_values = self.__predict_with_timings(
+                    cached_model.model, missing_batch.get_housing_input_data_frame(), timings
+                ).tolist()
+                for index, value in zip(missing_indices, predicted_values):
+                    median_house_values[index] = value
+                with time_phase(timings, 'cache'):
+                    self.prediction_cache.put_many(
+                        [keys[index] for index in missing_indices],
+                        predicted_values,
+                        cached_model.version
+                    )
+            return median_house_values
+        except Exception as e:
+            raise HousePricePredictionException(e, sys) from e
+
+    @staticmethod
+    def __predict_with_timings(model, X, timings: dict):
+        if timings is None:
+            return model.predict(X)
+        with time_phase(timings, 'preprocess'):
+            transformed_features = model.transform(X)
+        with time_phase(timings, 'predict'):
+            return model.trained_model_object.predict(transformed_features)
@@ -0,0 +1,200 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+from house_price.util import util
+logger = logging.getLogger(__name__)
+
+REGISTRY_MANIFEST_FILE_NAME = 'registry.json'
+
+CURRENT_POINTER_FILE_NAME = 'current.json'
+
+REGISTRY_LOCK_FILE_NAME = '.registry.lock'
+
+def _fsync_tree(directory: str) -> None:
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            with open(os.path.join(root, file_name), 'rb') as file:
+                os.fsync(file.fileno())
+
+def compute_checksum(path: str) -> str:
+    ''' sha256 over the relative paths and contents of every file under path.
+    '''
+    try:
+        sha256 = hashlib.sha256()
+        for root, dir_names, file_names in os.walk(path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                file_path = os.path.join(root, file_name)
+                sha256.update(os.path.relpath(file_path, path).encode())
+                with open(file_path, 'rb') as file:
+                    for block in iter(lambda: file.read(1 << 20), b''):
+                        sha256.update(block)
+        return sha256.hexdigest()
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
+
+
+class ModelRegistry:
+    ''' Versioned model directory with a manifest and a "current" pointer.\n
+        ------------------------------------------------
+        registry.json indexes every version (path, checksum, metrics) and
+        current.json names the promoted one, so finding the served model is a
+        single small read. Versions are copied to a temporary directory and
+        renamed into place, and both json files are replaced atomically, so a
+        reader never sees a partially written model.
+    '''
+
+    def __init__(self, model_dir: str) -> None:
+        try:
+            self.model_dir = model_dir
+            self.manifest_file_path = os.path.join(model_dir, REGISTRY_MANIFEST_FILE_NAME)
+            self.current_pointer_file_path = os.path.join(model_dir, CURRENT_POINTER_FILE_NAME)
+            self.lock_file_path = os.path.join(model_dir, REGISTRY_LOCK_FILE_NAME)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    @contextmanager
+    def __writer_lock(self):
+        os.makedirs(self.model_dir, exist_ok=True)
+        with open(self.lock_file_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_manifest(self) -> dict:
+        try:
+            if not os.path.exists(self.manifest_file_path):
+                return {'versions': {}}
+            with open(self.manifest_file_path, 'r') as file:
+                return json.load(file)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def read_current(self) -> dict:
+        ''' Returns the current pointer, or None when nothing has been promoted.
+        '''
+        try:
+            if not os.path.exists(self.current_pointer_file_path):
+                return None
+            with open(self.current_pointer_file_path, 'r') as file:
+                return json.load(file)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def get_current_entry(self) -> dict:
+        ''' Returns the manifest entry (path, metrics, ...) of the promoted version, None when nothing has been promoted.
+        '''
+        try:
+            current = self.read_current()
+            if current is None:
+                return None
+            return self.read_manifest()['versions'][str(current['version'])]
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def has_current(self) -> bool:
+        return os.path.exists(self.current_pointer_file_path)
+
+    def get_current_model_path(self) -> str:
+        try:
+            current = self.read_current()
+            if current is None:
+                raise Exception(f'No model has been promoted in {self.model_dir}')
+            return os.path.join(self.model_dir, current['model_path'])
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def get_version_token(self) -> tuple:
+        ''' Cheap version token for caches, a single stat of the current pointer.
+            Every promotion replaces the file, which changes its inode and mtime.
+        '''
+        try:
+            stat = os.stat(self.current_pointer_file_path)
+            return (stat.st_mtime_ns, stat.st_ino)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def register(self, source_dir: str, model_path: str, metrics: dict = None) -> int:
+        ''' Copies source_dir into the registry as a new version\n
+            ------------------------------------------------
+            Takes - directory to copy, path of the served model relative to it, metrics to record\n
+            Returns - new version number
+        '''
+        try:
+            with self.__writer_lock():
+                manifest = self.read_manifest()
+                # Version folders written before the registry, or by a register that
+                # failed before its manifest update, are not in the manifest.
+                existing_versions = [int(name) for name in os.listdir(self.model_dir) if name.isdigit()]
+                version = max([*map(int, manifest['versions']), *existing_versions], default=0) + 1
+                version_dir = os.path.join(self.model_dir, str(version))
+                temp_version_dir = os.path.join(self.model_dir, f'.{version}.{os.getpid()}.tmp')
+                shutil.rmtree(temp_version_dir, ignore_errors=True)
+                shutil.copytree(source_dir, temp_version_dir)
+                _fsync_tree(temp_version_dir)
+                checksum = compute_checksum(temp_version_dir)
+                os.rename(temp_version_dir, version_dir)
+                manifest['versions'][str(version)] = {
+                    'version': version,
+                    'path': str(version),
+                    'model_path': os.path.join(str(version), model_path),
+                    'checksum': checksum,
+                    'metrics': metrics or {},
+                    'created_at': datetime.now().isoformat(timespec='seconds')
+                }
+                util.write_json_file_atomically(self.manifest_file_path, manifest)
+            logger.info('Registered model version %s from %s', version, source_dir)
+
+            return version
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def verify(self, version: int) -> bool:
+        try:
+            entry = self.read_manifest()['versions'][str(version)]
+            return compute_checksum(os.path.join(self.model_dir, entry['path'])) == entry['checksum']
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def promote(self, version: int) -> None:
+        ''' Points current at version after checking that its files match the checksum.
+        '''
+        try:
+            with self.__writer_lock():
+                entry = self.read_manifest()['versions'][str(version)]
+                if not self.verify(version):
+                    raise Exception(f'Model version {version} does not match its checksum.')
+                util.write_json_file_atomically(
+                    self.current_pointer_file_path,
+                    {
+                        'version': entry['version'],
+                        'model_path': entry['model_path'],
+                        'checksum': entry['checksum']
+                    }
+                )
+                manifest = self.read_manifest()
+                manifest['current_version'] = entry['version']
+                util.write_json_file_atomically(self.manifest_file_path, manifest)
+            logger.info('Promoted model version %s', version)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
@@ -0,0 +1,128 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+logger = logging.getLogger(__name__)
+
+# Approximate bookkeeping cost of one OrderedDict entry on top of the key and value objects.
+ENTRY_OVERHEAD_BYTES = 104
+
+class PredictionCache:
+    ''' Bounded LRU cache of predictions keyed on normalized house features.\n
+        ------------------------------------------------
+        Keys are tuples of the nine HousePriceData fields with the numerical
+        fields rounded to float_decimals. The cache is bounded both in entries
+        and in approximate bytes, and is cleared whenever the served model
+        version changes.
+    '''
+
+    def __init__(self, max_entries: int = 100000, max_bytes: int = 64 * 2 ** 20, float_decimals: int = 4) -> None:
+        ''' PredictionCache Initialization
+            max_entries: int most predictions kept
+            max_bytes: int approximate memory limit of the cached keys and values
+            float_decimals: int decimals the numerical fields are rounded to in the key
+        '''
+        try:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self.float_decimals = float_decimals
+            self._entries = OrderedDict()
+            self._lock = threading.Lock()
+            self.model_version = None
+            self.current_bytes = 0
+            self.hit_count = 0
+            self.miss_count = 0
+            self.eviction_count = 0
+            self.invalidation_count = 0
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def make_keys(self, housing_batch, columns: list, categorical_columns: list) -> list:
+        ''' Builds one normalized key per house with a vectorized rounding per column.
+            Missing values become None so that they compare equal.
+        '''
+        try:
+            key_columns = []
+            for column in columns:
+                values = getattr(housing_batch, column)
+                if column in categorical_columns:
+                    key_columns.append([None if value != value else value for value in values.tolist()])
+                else:
+                    rounded = np.round(values, self.float_decimals)
+                    key_columns.append([
+                        None if value != value else value for value in rounded.tolist()
+                    ])
+            return list(zip(*key_columns))
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    @staticmethod
+    def get_entry_bytes(key: tuple, value: float) -> int:
+        return (
+            sys.getsizeof(key) + sum(sys.getsizeof(item) for item in key)
+            + sys.getsizeof(value) + ENTRY_OVERHEAD_BYTES
+        )
+
+    def __check_version(self, model_version) -> None:
+        if model_version != self.model_version:
+            if self._entries:
+                self.invalidation_count += 1
+                logger.info('Model version changed, prediction cache cleared.')
+            self._entries.clear()
+            self.current_bytes = 0
+            self.model_version = model_version
+
+    def get_many(self, keys: list, model_version) -> list:
+        ''' Returns the cached prediction of every key, None for misses.
+        '''
+        with self._lock:
+            self.__check_version(model_version)
+            values = []
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.miss_count += 1
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hit_count += 1
+                    values.append(entry[0])
+            return values
+
+    def put_many(self, keys: list, values: list, model_version) -> None:
+        with self._lock:
+            self.__check_version(model_version)
+            for key, value in zip(keys, values):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    continue
+                entry_bytes = self.get_entry_bytes(key, value)
+                self._entries[key] = (value, entry_bytes)
+                self.current_bytes += entry_bytes
+            while self._entries and (
+                len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes
+            ):
+                _, (_, entry_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= entry_bytes
+                self.eviction_count += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookup_count = self.hit_count + self.miss_count
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hit_count': self.hit_count,
+                'miss_count': self.miss_count,
+                'hit_rate': self.hit_count / lookup_count if lookup_count else 0.0,
+                'eviction_count': self.eviction_count,
+                'invalidation_count': self.invalidation_count
+            }
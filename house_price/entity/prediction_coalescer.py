@@ -0,0 +1,192 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+from house_price.entity.model_predictor import HOUSING_INPUT_COLUMNS, HousePriceBatch
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+logger = logging.getLogger(__name__)
+
+class PendingPrediction:
+
+    __slots__ = ('housing_batch', 'event', 'result', 'error', 'queued_at', 'timings')
+
+    def __init__(self, housing_batch: HousePriceBatch) -> None:
+        self.housing_batch = housing_batch
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.queued_at = time.perf_counter()
+        self.timings = {}
+
+
+class PredictionCoalescer:
+    ''' Coalesces concurrent single house predictions into one batch.\n
+        ------------------------------------------------
+        Requests are queued and a background thread flushes them through
+        predict_batch once max_batch_size requests are waiting or max_wait_ms
+        has passed since the first one, then hands every request its own result.
+        Invalid houses are rejected before they are queued, a batch that still
+        fails is split in halves until the failing requests are isolated.
+    '''
+
+    def __init__(
+        self, predict_batch, max_batch_size: int = 64, max_wait_ms: float = 5.0, domain_value: dict = None
+    ) -> None:
+        ''' PredictionCoalescer Initialization
+            predict_batch: callable taking a HousePriceBatch and a timings dict, returning a list of predictions
+            max_batch_size: int largest batch flushed at once
+            max_wait_ms: float longest time a request waits for the batch to fill
+            domain_value: dict categories of schema.yaml the queued houses are checked against
+        '''
+        try:
+            if max_batch_size < 1:
+                raise Exception('max_batch_size must be at least 1.')
+            self.predict_batch = predict_batch
+            self.max_batch_size = max_batch_size
+            self.max_wait = max_wait_ms / 1000
+            self.domain_value = domain_value
+            self._queue = queue.Queue()
+            self._worker = None
+            self._worker_pid = None
+            self._worker_lock = threading.Lock()
+            self._stats_lock = threading.Lock()
+            self.batch_count = 0
+            self.prediction_count = 0
+            self.full_batch_count = 0
+            self.failed_batch_count = 0
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def __ensure_worker(self) -> None:
+        # The worker is started lazily, so each forked web worker runs its own thread.
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+            self._worker = threading.Thread(
+                target=self.__run,
+                name='prediction-coalescer',
+                daemon=True
+            )
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def __collect_batch(self) -> list:
+        pending_predictions = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(pending_predictions) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                pending_predictions.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return pending_predictions
+
+    def __predict_pending(self, pending_predictions: list) -> None:
+        housing_batch = HousePriceBatch(**{
+            column: np.concatenate([
+                getattr(pending_prediction.housing_batch, column)
+                for pending_prediction in pending_predictions
+            ])
+            for column in HOUSING_INPUT_COLUMNS
+        })
+        batch_timings = {}
+        results = self.predict_batch(housing_batch, timings=batch_timings)
+        # Every request of the batch waited for the whole batch, so each gets its timings.
+        for pending_prediction, result in zip(pending_predictions, results):
+            pending_prediction.result = result
+            pending_prediction.timings.update(batch_timings)
+
+    def __predict_halves(self, pending_predictions: list) -> None:
+        ''' Retries a failed batch as two halves, recursively, so k failing requests
+            cost about 2 k log2(batch size) predict_batch calls instead of one per request.
+        '''
+        middle = len(pending_predictions) // 2
+        for half in (pending_predictions[:middle], pending_predictions[middle:]):
+            try:
+                self.__predict_pending(half)
+            except Exception as e:
+                if len(half) == 1:
+                    half[0].error = e
+                else:
+                    self.__predict_halves(half)
+
+    def __flush(self, pending_predictions: list) -> None:
+        flushed_at = time.perf_counter()
+        for pending_prediction in pending_predictions:
+            pending_prediction.timings['queue'] = flushed_at - pending_prediction.queued_at
+        try:
+            self.__predict_pending(pending_predictions)
+        except Exception as e:
+            with self._stats_lock:
+                self.failed_batch_count += 1
+            # Logged once here, the requests that still fail get the error raised to them.
+            logger.error('Prediction batch of %s failed, retrying it in halves - %s', len(pending_predictions), e)
+            if len(pending_predictions) == 1:
+                pending_predictions[0].error = e
+            else:
+                self.__predict_halves(pending_predictions)
+        finally:
+            for pending_prediction in pending_predictions:
+                pending_prediction.event.set()
+
+    def __run(self) -> None:
+        while True:
+            pending_predictions = self.__collect_batch()
+            with self._stats_lock:
+                self.batch_count += 1
+                self.prediction_count += len(pending_predictions)
+                if len(pending_predictions) == self.max_batch_size:
+                    self.full_batch_count += 1
+            self.__flush(pending_predictions)
+
+    def predict(self, housing_batch: HousePriceBatch, timeout: float = None, timings: dict = None) -> float:
+        ''' Queues a one house HousePriceBatch and blocks until its batch has been predicted.
+            When a timings dict is given the queue wait and the phase timings of the batch are added to it.
+        '''
+        # A client error, rejected before it joins a batch and raised without a traceback in the log.
+        housing_batch.validate(domain_value=self.domain_value)
+        try:
+            if len(housing_batch) != 1:
+                raise Exception('PredictionCoalescer.predict takes exactly one house.')
+            self.__ensure_worker()
+            pending_prediction = PendingPrediction(housing_batch=housing_batch)
+            self._queue.put(pending_prediction)
+            if not pending_prediction.event.wait(timeout=timeout):
+                raise Exception('Timed out waiting for the prediction batch.')
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+        if timings is not None:
+            timings.update(pending_prediction.timings)
+        if pending_prediction.error is not None:
+            raise pending_prediction.error
+        return pending_prediction.result
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            batch_count = self.batch_count
+            prediction_count = self.prediction_count
+            full_batch_count = self.full_batch_count
+            failed_batch_count = self.failed_batch_count
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batch_count': batch_count,
+            'prediction_count': prediction_count,
+            'full_batch_count': full_batch_count,
+            'failed_batch_count': failed_batch_count,
+            'mean_batch_size': prediction_count / batch_count if batch_count else 0.0,
+            'batch_fill_rate': prediction_count / (batch_count * self.max_batch_size) if batch_count else 0.0
+        }
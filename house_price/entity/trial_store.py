@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from house_price.exception import HousePricePredictionException
+from house_price.logger import log_exception, logging
+logger = logging.getLogger(__name__)
+
+# Bookkeeping bytes of a trial row on top of its parameters and estimator.
+TRIAL_OVERHEAD_BYTES = 256
+
+# Hits are written back in one transaction once this many are pending.
+TOUCH_BATCH_SIZE = 64
+
+# Metrics of the evaluations table, in its column order.
+EVALUATION_METRICS = ('train_accuracy', 'test_accuracy', 'train_rsme', 'test_rsme')
+
+def fingerprint_arrays(*arrays) -> str:
+    ''' sha256 over the shape, dtype and bytes of every array, sparse matrices
+        are hashed through their CSR arrays.
+    '''
+    try:
+        sha256 = hashlib.sha256()
+        for array in arrays:
+            if hasattr(array, 'tocsr'):
+                array = array.tocsr()
+                sha256.update(f'csr{array.shape}'.encode())
+                parts = (array.data, array.indices, array.indptr)
+            else:
+                parts = (array,)
+            for part in parts:
+                part = np.ascontiguousarray(part)
+                sha256.update(f'{part.shape}{part.dtype.str}'.encode())
+                sha256.update(memoryview(part).cast('B'))
+        return sha256.hexdigest()
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
+
+
+class TrialStore:
+    ''' Persistent store of model search trials in SQLite.\n
+        ------------------------------------------------
+        A trial is keyed by the training data fingerprint, the estimator class and
+        parameters, the searched parameter set and the search settings, and holds
+        the cross validation score and optionally the fitted estimator. Rows are
+        evicted least recently used first once the store exceeds max_bytes.
+        Every process opens its own connection, so the store can be shared by the
+        parallel model searches. Lookups stay read only, the last used time and
+        hit count of the rows found are written back in batches, by put, evict
+        and flush. The train and test metrics of fitted models are
+        kept apart, in an evaluations table keyed by the hash of the model and the
+        data, and share the eviction of the trials.
+    '''
+
+    def __init__(self, file_path: str, max_bytes: int = 2 ** 30, store_estimators: bool = True) -> None:
+        try:
+            self.file_path = file_path
+            self.max_bytes = max_bytes
+            self.store_estimators = store_estimators
+            self._connection = None
+            self._connection_pid = None
+            self.lookup_count = 0
+            self.hit_count = 0
+            self._pending_touches = {}
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_connection_pid'] = None
+        state['_pending_touches'] = {}
+        return state
+
+    def get_connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._connection_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+            connection = sqlite3.connect(self.file_path, timeout=60)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS trials ('
+                'key TEXT PRIMARY KEY, estimator_class TEXT, params TEXT, '
+                'mean_test_score REAL, std_test_score REAL, fit_seconds REAL, '
+                'estimator BLOB, size_bytes INTEGER, created_at REAL, last_used_at REAL, '
+                'hit_count INTEGER DEFAULT 0)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS evaluations ('
+                'key TEXT PRIMARY KEY, train_accuracy REAL, test_accuracy REAL, '
+                'train_rsme REAL, test_rsme REAL, size_bytes INTEGER, created_at REAL, last_used_at REAL)'
+            )
+            connection.commit()
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def make_key(data_fingerprint: str, estimator_class: str, estimator_params: dict, params: dict, context: dict) -> str:
+        ''' Canonical sha256 key of a trial, context holds the search settings (cv, scoring, versions).
+        '''
+        return hashlib.sha256(json.dumps(
+            [data_fingerprint, estimator_class, estimator_params, params, context],
+            sort_keys=True,
+            default=repr
+        ).encode()).hexdigest()
+
+    def __touch(self, table: str, key: str) -> None:
+        hit_count = self._pending_touches.get((table, key), (None, 0))[1]
+        self._pending_touches[(table, key)] = (time.time(), hit_count + 1)
+        if len(self._pending_touches) >= TOUCH_BATCH_SIZE:
+            self.flush()
+
+    def __write_touches(self, connection: sqlite3.Connection) -> None:
+        for (table, key), (last_used_at, hit_count) in self._pending_touches.items():
+            if table == 'trials':
+                connection.execute(
+                    'UPDATE trials SET last_used_at = ?, hit_count = hit_count + ? WHERE key = ?',
+                    (last_used_at, hit_count, key)
+                )
+            else:
+                connection.execute('UPDATE evaluations SET last_used_at = ? WHERE key = ?', (last_used_at, key))
+        self._pending_touches = {}
+
+    def flush(self) -> None:
+        ''' Writes the pending last used times and hit counts in one transaction.
+        '''
+        try:
+            if len(self._pending_touches) == 0:
+                return
+            connection = self.get_connection()
+            self.__write_touches(connection)
+            connection.commit()
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def get(self, key: str) -> dict:
+        ''' Returns the trial of key (estimator unpickled when stored), None when missing.
+        '''
+        try:
+            self.lookup_count += 1
+            connection = self.get_connection()
+            row = connection.execute(
+                'SELECT params, mean_test_score, std_test_score, fit_seconds, estimator FROM trials WHERE key = ?',
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.hit_count += 1
+            self.__touch('trials', key)
+            params, mean_test_score, std_test_score, fit_seconds, estimator = row
+            return {
+                'params': json.loads(params),
+                'mean_test_score': mean_test_score,
+                'std_test_score': std_test_score,
+                'fit_seconds': fit_seconds,
+                'estimator': pickle.loads(estimator) if estimator is not None else None
+            }
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def put(
+        self, key: str, estimator_class: str, params: dict, mean_test_score: float = None,
+        std_test_score: float = None, fit_seconds: float = None, estimator: object = None
+    ) -> None:
+        try:
+            params_json = json.dumps(params, sort_keys=True, default=repr)
+            estimator_blob = None
+            if estimator is not None and self.store_estimators:
+                estimator_blob = pickle.dumps(estimator, protocol=pickle.HIGHEST_PROTOCOL)
+            size_bytes = len(params_json) + len(estimator_blob or b'') + TRIAL_OVERHEAD_BYTES
+            now = time.time()
+            connection = self.get_connection()
+            self.__write_touches(connection)
+            connection.execute(
+                'INSERT OR REPLACE INTO trials (key, estimator_class, params, mean_test_score, std_test_score, '
+                'fit_seconds, estimator, size_bytes, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, estimator_class, params_json, mean_test_score, std_test_score,
+                 fit_seconds, estimator_blob, size_bytes, now, now)
+            )
+            connection.commit()
+            self.evict()
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def get_evaluation(self, key: str) -> dict:
+        ''' Returns the train and test metrics recorded under key, None when missing.
+        '''
+        try:
+            self.lookup_count += 1
+            row = self.get_connection().execute(
+                'SELECT train_accuracy, test_accuracy, train_rsme, test_rsme FROM evaluations WHERE key = ?',
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.hit_count += 1
+            self.__touch('evaluations', key)
+            return dict(zip(EVALUATION_METRICS, row))
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def put_evaluation(self, key: str, metrics: dict) -> None:
+        ''' Records the train and test metrics of EVALUATION_METRICS under key.
+        '''
+        try:
+            now = time.time()
+            connection = self.get_connection()
+            self.__write_touches(connection)
+            connection.execute(
+                'INSERT OR REPLACE INTO evaluations (key, train_accuracy, test_accuracy, train_rsme, test_rsme, '
+                'size_bytes, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, *[float(metrics[name]) for name in EVALUATION_METRICS], TRIAL_OVERHEAD_BYTES, now, now)
+            )
+            connection.commit()
+            self.evict()
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def evict(self) -> int:
+        ''' Deletes the least recently used trials and evaluations until the store fits
+            max_bytes, returns the count deleted.
+        '''
+        try:
+            # The least recently used order has to see the pending hits.
+            self.flush()
+            connection = self.get_connection()
+            total_bytes = connection.execute(
+                'SELECT (SELECT COALESCE(SUM(size_bytes), 0) FROM trials) + (SELECT COALESCE(SUM(size_bytes), 0) FROM evaluations)'
+            ).fetchone()[0]
+            if total_bytes <= self.max_bytes:
+                return 0
+            evicted_count = 0
+            for table, key, size_bytes, _ in connection.execute(
+                "SELECT 'trials', key, size_bytes, last_used_at FROM trials "
+                "UNION ALL SELECT 'evaluations', key, size_bytes, last_used_at FROM evaluations "
+                'ORDER BY last_used_at'
+            ).fetchall():
+                if total_bytes <= self.max_bytes:
+                    break
+                connection.execute(f'DELETE FROM {table} WHERE key = ?', (key,))
+                total_bytes -= size_bytes
+                evicted_count += 1
+            connection.commit()
+            logger.info('Evicted %s trials from %s', evicted_count, self.file_path)
+            return evicted_count
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def get_stats(self) -> dict:
+        try:
+            self.flush()
+            connection = self.get_connection()
+            entry_count, trial_bytes = connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM trials'
+            ).fetchone()
+            evaluation_count, evaluation_bytes = connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM evaluations'
+            ).fetchone()
+            return {
+                'file_path': self.file_path,
+                'entries': entry_count,
+                'evaluation_entries': evaluation_count,
+                'bytes': trial_bytes + evaluation_bytes,
+                'max_bytes': self.max_bytes
+            }
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
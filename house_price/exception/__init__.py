@@ -24,3 +24,24 @@ class HousePricePredictionException(Exception):
     
     def __repr__(self) -> str:
         return HousePricePredictionException.__name__.__str__()
+
+
+class HousingInputError(ValueError):
+    ''' Invalid house data sent by a client. The message names the bad field
+        only, so it can be returned to the client as it is.
+    '''
+
+    def __init__(self, field: str, message: str) -> None:
+        self.field = field
+        super().__init__(message)
+
+
+def find_housing_input_error(exception: BaseException) -> HousingInputError:
+    ''' The HousingInputError behind exception, however many times it was wrapped
+        in HousePricePredictionException, None when the error is not the client's.
+    '''
+    while exception is not None:
+        if isinstance(exception, HousingInputError):
+            return exception
+        exception = getattr(exception, 'exception', None) or exception.__cause__
+    return None
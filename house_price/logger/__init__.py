@@ -1,6 +1,11 @@
+import atexit
+import itertools
+import json
 import logging
-from datetime import datetime
+import logging.handlers
 import os
+import queue
+from datetime import datetime
 
 from house_price import constant
 
@@ -13,9 +18,139 @@ FILE_NAME = f'logs_{TIMESTAMP}.log'
 
 FILE_PATH = os.path.join(LOG_DIR_PATH, FILE_NAME)
 
-logging.basicConfig(
-    filename=FILE_PATH,
-    filemode='w',
-    format='[%(asctime)s] - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
\ No newline at end of file
+LOG_FORMAT = '[%(asctime)s] - %(name)s - %(levelname)s - %(message)s'
+
+# sync writes every record to the file in the logging thread, queue hands records
+# to a background writer thread so request and training threads never wait on disk.
+LOG_MODE = os.environ.get('HOUSE_PRICE_LOG_MODE', 'sync')
+
+# text or json (one object per line).
+LOG_RECORD_FORMAT = os.environ.get('HOUSE_PRICE_LOG_FORMAT', 'text')
+
+# Comma separated logger=rate pairs, e.g. "house_price.src.app=0.01" keeps one in a
+# hundred INFO and DEBUG records of that logger (and its children).
+LOG_SAMPLING = os.environ.get('HOUSE_PRICE_LOG_SAMPLING', '')
+
+# Attributes every LogRecord has, anything else was passed through extra=.
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    ''' Formats a record as one JSON object, fields passed with extra= are kept.
+    '''
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                log_entry[key] = value
+        if record.exc_info:
+            log_entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(log_entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    ''' Keeps one in every 1 / rate records below WARNING for the sampled loggers.
+        The longest matching logger name prefix decides the rate.
+    '''
+
+    def __init__(self, sample_rates: dict) -> None:
+        super().__init__()
+        self.sample_rates = sample_rates
+        self._counters = {}
+
+    def get_sample_rate(self, logger_name: str) -> float:
+        while logger_name:
+            if logger_name in self.sample_rates:
+                return self.sample_rates[logger_name]
+            logger_name = logger_name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        sample_rate = self.get_sample_rate(record.name)
+        if sample_rate >= 1.0:
+            return True
+        if sample_rate <= 0.0:
+            return False
+        counter = self._counters.get(record.name)
+        if counter is None:
+            counter = self._counters.setdefault(record.name, itertools.count())
+        return next(counter) % round(1 / sample_rate) == 0
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    ''' QueueHandler that leaves the %-formatting and the traceback rendering
+        to the writer thread instead of doing them in the logging thread.
+    '''
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_sample_rates(log_sampling: str) -> dict:
+    sample_rates = {}
+    for item in filter(None, (item.strip() for item in log_sampling.split(','))):
+        logger_name, _, sample_rate = item.partition('=')
+        sample_rates[logger_name.strip()] = float(sample_rate)
+    return sample_rates
+
+def log_exception(logger: logging.Logger, exception: Exception) -> None:
+    ''' Logs the traceback of an error once. The wrappers that catch and re-raise it
+        as HousePricePredictionException find it already logged and add one DEBUG line.
+    '''
+    cause = exception
+    while cause is not None:
+        if getattr(cause, '_traceback_logged', False):
+            logger.debug('Re-raising %s - %s', type(exception).__name__, exception)
+            return
+        cause = cause.__cause__
+    logger.error('Uncaught exception - %s', exception, exc_info=exception)
+    try:
+        exception._traceback_logged = True
+    except AttributeError:
+        pass
+
+def _create_file_handler() -> logging.Handler:
+    file_handler = logging.FileHandler(FILE_PATH, mode='a')
+    if LOG_RECORD_FORMAT == 'json':
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return file_handler
+
+def _start_queue_listener(queue_handler: DeferredQueueHandler, file_handler: logging.Handler):
+    queue_handler.queue = queue.SimpleQueue()
+    queue_listener = logging.handlers.QueueListener(queue_handler.queue, file_handler)
+    queue_listener.start()
+    return queue_listener
+
+def setup_logging() -> None:
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    file_handler = _create_file_handler()
+    handler = file_handler
+    if LOG_MODE == 'queue':
+        handler = DeferredQueueHandler(None)
+        queue_listener = _start_queue_listener(handler, file_handler)
+
+        def restart_in_child() -> None:
+            # Threads do not survive fork (gunicorn --preload), every worker starts its own writer.
+            nonlocal queue_listener
+            queue_listener = _start_queue_listener(handler, file_handler)
+
+        os.register_at_fork(after_in_child=restart_in_child)
+        atexit.register(lambda: queue_listener.stop())
+    sample_rates = parse_sample_rates(LOG_SAMPLING)
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+    root_logger.addHandler(handler)
+
+setup_logging()
@@ -1,17 +1,18 @@
-from asyncio.log import logger
 from house_price.config.configuration import Configuration
-from house_price.entity.artifact_config import DataIngestionArtifacts, DataTransformationArtifacts, DataValidationArtifacts, ModelTrainingArtifacts
-from house_price.component.data_ingestion import DataIngestion
-from house_price.component.data_validation import DataValidation
-from house_price.component.data_transformation import DataTransformation
-from house_price.component.model_trainer import ModelTrainer
+from house_price.entity.artifact_config import DataIngestionArtifacts, DataTransformationArtifacts, DataValidationArtifacts, ModelTrainingArtifacts, ModelPusherArtifacts
 
 class Pipeline:
+    ''' Runs the training stages.\n
+        ------------------------------------------------
+        The components (sklearn, evidently, ...) are imported by the stage that
+        uses them, so importing house_price never loads the training stack.
+    '''
 
-    def __init__(self, configuration: Configuration = Configuration()) -> None:
-        self.configuration = configuration
+    def __init__(self, configuration: Configuration = None) -> None:
+        self.configuration = configuration if configuration is not None else Configuration()
 
     def start_data_ingestion(self) -> DataIngestionArtifacts:
+        from house_price.component.data_ingestion import DataIngestion
         data_ingestion = DataIngestion(
             data_ingestion_config=self.configuration.get_data_ingestion_config()
         )
@@ -20,6 +21,7 @@ class Pipeline:
         return data_ingestion_artifacts
 
     def start_data_validation(self) -> DataValidationArtifacts:
+        from house_price.component.data_validation import DataValidation
         data_validation = DataValidation(
             data_ingestion_config=self.configuration.get_data_ingestion_config(),
             data_validation_config=self.configuration.get_data_validation_config()
@@ -31,26 +33,60 @@ class Pipeline:
     def start_data_transformation(
         self,
         data_ingestion_artifacts,
-        data_validation_artifacts
+        data_validation_artifacts,
+        refit_preprocessor: bool = False
     ) -> DataTransformationArtifacts:
+        ''' refit_preprocessor: bool fits a new preprocessor even when incremental
+            training would reuse the one of the promoted model
+        '''
+        from house_price.component.data_transformation import DataTransformation
         data_transformation = DataTransformation(
             data_ingestion_artifacts=data_ingestion_artifacts,
             data_validation_artifacts=data_validation_artifacts,
-            data_transformation_config=self.configuration.get_data_transformation_config()
+            data_transformation_config=self.configuration.get_data_transformation_config(),
+            incremental_training_config=None if refit_preprocessor else self.configuration.get_incremental_training_config()
         )
         data_transformation_artifacts = data_transformation.initiate_data_transformation()
 
         return data_transformation_artifacts
 
-    def start_model_training(self, data_transformation_artifacts: DataTransformationArtifacts) -> ModelTrainingArtifacts:
+    def start_model_training(
+        self,
+        data_transformation_artifacts: DataTransformationArtifacts,
+        data_ingestion_artifacts: DataIngestionArtifacts = None,
+        data_validation_artifacts: DataValidationArtifacts = None
+    ) -> ModelTrainingArtifacts:
+        ''' With the ingestion and validation artifacts, an incremental update that
+            falls back to full retraining transforms the data again with a new preprocessor.
+        '''
+        from house_price.component.model_trainer import ModelTrainer
+        retransform_data = None
+        if data_ingestion_artifacts is not None and data_validation_artifacts is not None:
+            retransform_data = lambda: self.start_data_transformation(
+                data_ingestion_artifacts=data_ingestion_artifacts,
+                data_validation_artifacts=data_validation_artifacts,
+                refit_preprocessor=True
+            )
         model_trainer = ModelTrainer(
             self.configuration.get_model_training_config(),
-            data_transformation_artifacts=data_transformation_artifacts
+            data_transformation_artifacts=data_transformation_artifacts,
+            incremental_training_config=self.configuration.get_incremental_training_config(),
+            retransform_data=retransform_data
         )
         model_training_artifact = model_trainer.initiate_model_trainer()
 
         return model_training_artifact
 
+    def start_model_pusher(self, model_training_artifact: ModelTrainingArtifacts) -> ModelPusherArtifacts:
+        from house_price.component.model_pusher import ModelPusher
+        model_pusher = ModelPusher(
+            push_model_config=self.configuration.get_push_model_config(),
+            model_training_artifacts=model_training_artifact
+        )
+        model_pusher_artifacts = model_pusher.initiate_model_pusher()
+
+        return model_pusher_artifacts
+
     def start_pipeline(self):
         data_ingestion_artifacts = self.start_data_ingestion()
         data_validation_artifacts = self.start_data_validation()
@@ -59,8 +95,14 @@ class Pipeline:
             data_validation_artifacts=data_validation_artifacts
         )
         model_training_artifact = self.start_model_training(
-            data_transformation_artifacts=data_transformation_artifacts
+            data_transformation_artifacts=data_transformation_artifacts,
+            data_ingestion_artifacts=data_ingestion_artifacts,
+            data_validation_artifacts=data_validation_artifacts
         )
         if model_training_artifact == None:
             print('No model found with better accuracy, please reduce the base accuracy.')
+            return
+        self.start_model_pusher(
+            model_training_artifact=model_training_artifact
+        )
     
\ No newline at end of file
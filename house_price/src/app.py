@@ -1,14 +1,179 @@
+import io
 import os
+import time
 
-from flask import Flask, send_from_directory
+from flask import Flask, Response, g, send_from_directory, request, jsonify
+import pandas as pd
+
+from house_price.config.configuration import Configuration
+from house_price.entity.model_predictor import HousePriceBatch, HousePricePredictor
+from house_price.entity.prediction_cache import PredictionCache
+from house_price.entity.prediction_coalescer import PredictionCoalescer
+from house_price.exception import HousePricePredictionException, find_housing_input_error
+from house_price.util import util
+from house_price.util.metrics import MetricsRegistry, format_server_timing, time_phase
 
 import logging
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-@app.route('/favicon.ico') 
-def favicon(): 
+configuration = Configuration()
+
+prediction_config = configuration.get_prediction_config()
+
+# Houses are checked against the schema, by the coalescer for /predict and while
+# parsing for /predict/batch, so a client error is a 400.
+domain_value = util.read_schema(
+    schema_file_path=configuration.get_data_validation_config().schema_file_path
+).domain_value
+
+prediction_cache = None
+if prediction_config.prediction_cache_enabled:
+    prediction_cache = PredictionCache(
+        max_entries=prediction_config.prediction_cache_max_entries,
+        max_bytes=prediction_config.prediction_cache_max_bytes,
+        float_decimals=prediction_config.prediction_cache_float_decimals
+    )
+
+predictor = HousePricePredictor(
+    model_dir=configuration.get_push_model_config().model_export_dir,
+    prediction_cache=prediction_cache
+)
+
+if prediction_config.preload_model:
+    # With gunicorn --preload this runs once in the master, the forked workers
+    # inherit the memory mapped model arrays instead of loading their own copy.
+    try:
+        predictor.model_cache.get_model()
+    except HousePricePredictionException as e:
+        logger.warning('No model preloaded - %s', e)
+
+coalescer = PredictionCoalescer(
+    predict_batch=predictor.predict_batch,
+    max_batch_size=prediction_config.max_batch_size,
+    max_wait_ms=prediction_config.max_wait_ms,
+    domain_value=domain_value
+)
+
+def get_served_model_version():
+    ''' Version folder of the resident model, None before the first load.
+    '''
+    cached_model = predictor.model_cache.get_loaded_model()
+    if cached_model is None:
+        return None
+    version = os.path.relpath(cached_model.model_path, predictor.model_dir).split(os.sep)[0]
+    return int(version) if version.isdigit() else None
+
+def get_prediction_cache_stats(stat_name: str):
+    if prediction_cache is None:
+        return None
+    return prediction_cache.get_stats()[stat_name]
+
+metrics_registry = MetricsRegistry()
+
+request_counter = metrics_registry.counter(
+    'house_price_http_requests',
+    'HTTP requests by route, method and status code.',
+    ('route', 'method', 'status')
+)
+
+request_latency = metrics_registry.histogram(
+    'house_price_http_request_duration_seconds',
+    'Wall time of HTTP requests by route.',
+    ('route',)
+)
+
+phase_latency = metrics_registry.histogram(
+    'house_price_request_phase_duration_seconds',
+    'Time spent per request phase - queue, model (lookup/load), parse, cache, preprocess, predict, serialize.',
+    ('route', 'phase')
+)
+
+metrics_registry.gauge(
+    'house_price_model_version',
+    'Version folder of the served model.',
+    callback=get_served_model_version
+)
+
+metrics_registry.gauge(
+    'house_price_model_loaded',
+    'Whether a model is resident in this worker.',
+    callback=lambda: int(predictor.model_cache.get_loaded_model() is not None)
+)
+
+for cache_stat_name in ('entries', 'bytes', 'hit_count', 'miss_count', 'eviction_count', 'invalidation_count'):
+    metrics_registry.gauge(
+        f'house_price_prediction_cache_{cache_stat_name}',
+        f'Prediction cache {cache_stat_name.replace("_", " ")}.',
+        callback=lambda cache_stat_name=cache_stat_name: get_prediction_cache_stats(cache_stat_name)
+    )
+
+for coalescer_stat_name in ('batch_count', 'prediction_count', 'failed_batch_count', 'mean_batch_size'):
+    metrics_registry.gauge(
+        f'house_price_coalescer_{coalescer_stat_name}',
+        f'Prediction coalescer {coalescer_stat_name.replace("_", " ")}.',
+        callback=lambda coalescer_stat_name=coalescer_stat_name: coalescer.get_stats()[coalescer_stat_name]
+    )
+
+@app.before_request
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+    g.timings = {}
+
+@app.after_request
+def record_request_metrics(response):
+    started_at = g.get('request_started_at')
+    if started_at is None:
+        return response
+    total = time.perf_counter() - started_at
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    timings = g.timings
+    for phase, seconds in timings.items():
+        phase_latency.observe_labels((route, phase), seconds)
+    request_latency.observe_labels((route,), total)
+    request_counter.inc(route=route, method=request.method, status=response.status_code)
+    if timings:
+        timings['total'] = total
+        response.headers['Server-Timing'] = format_server_timing(timings)
+    return response
+
+def get_client_error_message(e: Exception) -> str:
+    ''' Message of a rejected request, naming the bad field only. The full
+        exception, with its server paths, is only logged.
+    '''
+    housing_input_error = find_housing_input_error(e)
+    if housing_input_error is not None:
+        return str(housing_input_error)
+    if isinstance(e, ValueError):
+        return str(e)
+    return 'Invalid request.'
+
+def get_batch_request_data():
+    ''' Reads the houses of a batch request\n
+        ------------------------------------------------
+        Accepts - JSON list of houses, JSON object with a "houses" list,
+        a CSV body (text/csv) or a CSV file uploaded as "file"\n
+        Returns - list of dicts or a DataFrame for HousePriceBatch
+    '''
+    try:
+        if 'file' in request.files:
+            return pd.read_csv(request.files['file'])
+        if request.mimetype == 'text/csv':
+            return pd.read_csv(io.BytesIO(request.get_data()))
+    except UnicodeDecodeError as e:
+        # The codec message quotes the body, it is only logged.
+        logger.error('Batch request body is not UTF-8 - %s', e)
+        raise ValueError('Body must be UTF-8 CSV.') from e
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('houses')
+    if not isinstance(payload, list):
+        raise ValueError('Expected a JSON list of houses, a "houses" list or a CSV body.')
+    return payload
+
+@app.route('/favicon.ico')
+def favicon():
     return send_from_directory(
         os.path.join(app.root_path, 'static'),
         'favicon.ico',
@@ -18,4 +183,59 @@ def favicon():
 @app.route('/')
 def home():
     logger.info('Home route called.')
-    return 'Machine learning project.'
\ No newline at end of file
+    return 'Machine learning project.'
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    try:
+        with time_phase(g.timings, 'parse'):
+            housing_record = request.get_json(silent=True)
+            if not isinstance(housing_record, dict):
+                raise ValueError('Expected a JSON object with the house fields.')
+            housing_batch = HousePriceBatch.from_records([housing_record])
+    except Exception as e:
+        logger.error('Invalid predict request - %s', e)
+        return jsonify({'error': get_client_error_message(e)}), 400
+    try:
+        # The coalescer checks the house against the schema before queueing it.
+        median_house_value = coalescer.predict(housing_batch, timings=g.timings)
+    except HousePricePredictionException as e:
+        if find_housing_input_error(e) is not None:
+            logger.error('Invalid predict request - %s', e)
+            return jsonify({'error': get_client_error_message(e)}), 400
+        logger.error('Prediction failed - %s', e)
+        return jsonify({'error': 'Prediction failed.'}), 500
+    with time_phase(g.timings, 'serialize'):
+        return jsonify({'median_house_value': median_house_value})
+
+@app.route('/predict/stats')
+def predict_stats():
+    stats = {'coalescer': coalescer.get_stats()}
+    if prediction_cache is not None:
+        stats['prediction_cache'] = prediction_cache.get_stats()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    logger.info('Batch predict route called.')
+    try:
+        with time_phase(g.timings, 'parse'):
+            housing_batch = HousePriceBatch.from_housing_data(get_batch_request_data())
+            housing_batch.validate(domain_value=domain_value)
+    except Exception as e:
+        logger.error('Invalid batch request - %s', e)
+        return jsonify({'error': get_client_error_message(e)}), 400
+    try:
+        median_house_values = predictor.predict_batch(housing_batch, timings=g.timings)
+    except HousePricePredictionException as e:
+        logger.error('Batch prediction failed - %s', e)
+        return jsonify({'error': 'Prediction failed.'}), 500
+    with time_phase(g.timings, 'serialize'):
+        return jsonify({
+            'count': len(median_house_values),
+            'median_house_value': median_house_values
+        })
@@ -0,0 +1,44 @@
+''' Bulk scoring of a CSV or Parquet file with the served model\n
+    ------------------------------------------------
+    Defaults come from bulk_scoring_config in config.yaml, a crashed run is
+    resumed from its checkpoint by running the same command again.\n
+    Usage - python -m house_price.src.bulk_score --input houses.csv --output prices.csv --keep-columns house_id
+'''
+import argparse
+
+from house_price.component.bulk_scorer import BulkScorer
+from house_price.config.configuration import Configuration
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--input', type=str, required=True, help='CSV or Parquet (.parquet, .pq) file of houses')
+    parser.add_argument('--output', type=str, required=True, help='CSV file of predictions')
+    parser.add_argument('--keep-columns', type=str, nargs='*', default=[], help='input columns copied to the output')
+    parser.add_argument('--chunk-size', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint and start over')
+    args = parser.parse_args()
+    configuration = Configuration()
+    bulk_scoring_config = configuration.get_bulk_scoring_config()
+    if args.chunk_size is not None:
+        bulk_scoring_config = bulk_scoring_config._replace(chunk_size=args.chunk_size)
+    if args.workers is not None:
+        bulk_scoring_config = bulk_scoring_config._replace(worker_count=args.workers)
+    bulk_scorer = BulkScorer(
+        bulk_scoring_config=bulk_scoring_config,
+        model_dir=configuration.get_push_model_config().model_export_dir
+    )
+    bulk_scoring_artifacts = bulk_scorer.initiate_bulk_scoring(
+        input_file_path=args.input,
+        output_file_path=args.output,
+        keep_columns=args.keep_columns,
+        restart=args.restart
+    )
+    print(
+        f'Scored {bulk_scoring_artifacts.row_count} rows into {bulk_scoring_artifacts.output_file_path} '
+        f'in {bulk_scoring_artifacts.elapsed_seconds:.1f} s ({bulk_scoring_artifacts.rows_per_second:.0f} rows/s), '
+        f'{bulk_scoring_artifacts.invalid_row_count} invalid rows left unscored'
+    )
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,14 @@
-import traceback
+import json
+import os
 import sys
+from collections import namedtuple
 
+import numpy as np
 import yaml
 import pandas as pd
 
 from house_price.exception import HousePricePredictionException
-import logging
+from house_price.logger import log_exception, logging
 logger = logging.getLogger(__name__)
 
 def read_yaml_file(file_path: str) -> dict:
@@ -18,22 +21,297 @@ def read_yaml_file(file_path: str) -> dict:
         with open(file_path, 'rb') as file:
             return yaml.safe_load(file)
     except Exception as e:
-        logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+        log_exception(logger, e)
         raise HousePricePredictionException(e, sys) from e
 
-def read_dataframe(file_path: str, schema_file_path: str) -> pd.DataFrame:
+DATA_FILE_FORMATS = ('.csv', '.parquet', '.feather')
+
+def get_data_file_format(file_path: str) -> str:
+    ''' Format of a data file from its extension, one of DATA_FILE_FORMATS.
+    '''
+    data_file_format = os.path.splitext(file_path)[1].lower()
+    if data_file_format not in DATA_FILE_FORMATS:
+        raise Exception(f'Unknown data file format of {file_path}, expected one of {DATA_FILE_FORMATS}.')
+    return data_file_format
+
+Schema = namedtuple(
+    'Schema',
+    [
+        'file_path',
+        'columns',
+        'dtypes',
+        'numerical_columns',
+        'categorical_columns',
+        'target_column_name',
+        'domain_value',
+        'value_range'
+    ]
+)
+
+# Parsed schemas by absolute file path, with the (mtime, size) they were parsed at.
+_schema_cache = {}
+
+def get_schema_dtypes(schema_info: dict) -> dict:
+    ''' dtypes of the schema columns, category columns with a domain_value get
+        exactly those categories, so every file and chunk shares the same codes.
+    '''
+    domain_value = schema_info.get('domain_value') or {}
+    return {
+        column: pd.CategoricalDtype(categories=domain_value[column])
+        if dtype == 'category' and column in domain_value else dtype
+        for column, dtype in schema_info['columns'].items()
+    }
+
+def read_schema(schema_file_path: str) -> Schema:
+    ''' Reads schema.yaml into a Schema\n
+        ------------------------------------------------
+        The file is parsed once per process and parsed again only when its
+        modification time or size changes, so the stages can ask for it freely.\n
+        Takes - schema file path\n
+        Returns - Schema, shared by the callers, not to be modified
+    '''
     try:
-        schema = data = read_yaml_file(file_path=schema_file_path)
-        columns = schema['columns']
-        df = pd.read_csv(
-            filepath_or_buffer=file_path
+        file_path = os.path.abspath(schema_file_path)
+        stat = os.stat(file_path)
+        file_version = (stat.st_mtime_ns, stat.st_size)
+        cached = _schema_cache.get(file_path)
+        if cached is not None and cached[0] == file_version:
+            return cached[1]
+        schema_info = read_yaml_file(file_path=file_path)
+        schema = Schema(
+            file_path=file_path,
+            columns=schema_info['columns'],
+            dtypes=get_schema_dtypes(schema_info),
+            numerical_columns=schema_info['numerical_columns'],
+            categorical_columns=schema_info['categorical_columns'],
+            target_column_name=schema_info['target_column_name'],
+            domain_value=schema_info.get('domain_value'),
+            value_range=schema_info.get('value_range')
         )
-        columns = data['columns']
-        for key in columns:
-            df[key] = df[key].astype(dtype=columns[key])
-        
+        _schema_cache[file_path] = (file_version, schema)
+
+        return schema
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
+
+def apply_schema_dtypes(df: pd.DataFrame, schema: Schema) -> pd.DataFrame:
+    ''' Casts the schema columns of df in place, columns already of the right
+        dtype are left as they are. Raises when a category column holds values
+        outside its domain_value, rather than silently turning them into NaN.
+    '''
+    try:
+        for column, dtype in schema.dtypes.items():
+            if column not in df.columns or df[column].dtype == dtype:
+                continue
+            values = df[column].astype(dtype=dtype)
+            if isinstance(dtype, pd.CategoricalDtype):
+                unknown_values = df[column][values.isna() & df[column].notna()]
+                if len(unknown_values) > 0:
+                    raise Exception(
+                        f'Values {sorted(unknown_values.astype(str).unique())[:5]} of {column} '
+                        'are not in its domain_value of the schema.'
+                    )
+            df[column] = values
+
         return df
     except Exception as e:
-        logger.exception(f'Uncaught exception - {traceback.format_exc()}')
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
+
+def get_csv_dtypes(schema: Schema, columns: list = None) -> dict:
+    ''' dtypes for pd.read_csv of the schema columns, or of the given columns.
+    '''
+    return {
+        column: 'category' if isinstance(dtype, pd.CategoricalDtype) else dtype
+        for column, dtype in schema.dtypes.items()
+        if columns is None or column in columns
+    }
+
+def read_dataframe(file_path: str, schema_file_path: str, columns: list = None, engine: str = None) -> pd.DataFrame:
+    ''' Reads a csv, parquet or feather data file with the dtypes of the schema\n
+        ------------------------------------------------
+        Takes - data file path, schema file path, columns to read (all by default),
+        pandas csv parser engine (c by default, pyarrow is multithreaded)\n
+        Returns - dataframe\n
+        Parquet and feather files only read the columns from disk. Csv columns are
+        selected and typed by the parser in a single pass, so missing values are
+        parsed straight into NaN and no intermediate object columns are built.
+        Category columns are parsed as plain categories and recoded to their
+        domain_value, which checks for values outside of it.
+    '''
+    try:
+        schema = read_schema(schema_file_path=schema_file_path)
+        data_file_format = get_data_file_format(file_path)
+        if data_file_format == '.parquet':
+            df = pd.read_parquet(file_path, columns=columns)
+        elif data_file_format == '.feather':
+            df = pd.read_feather(file_path, columns=columns)
+        else:
+            df = pd.read_csv(
+                filepath_or_buffer=file_path,
+                usecols=columns,
+                dtype=get_csv_dtypes(schema, columns=columns),
+                engine=engine
+            )
+
+        return apply_schema_dtypes(df, schema)
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
+
+def write_dataframe(df: pd.DataFrame, file_path: str, schema: Schema = None) -> str:
+    ''' Writes df as csv, parquet or feather from the extension of file_path,
+        cast to the dtypes of schema when given.
+    '''
+    try:
+        df = df.reset_index(drop=True)
+        if schema is not None:
+            df = apply_schema_dtypes(df, schema)
+        data_file_format = get_data_file_format(file_path)
+        if data_file_format == '.parquet':
+            df.to_parquet(file_path, index=False)
+        elif data_file_format == '.feather':
+            df.to_feather(file_path)
+        else:
+            df.to_csv(path_or_buf=file_path, index=False)
+
+        return file_path
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
+
+
+class DataFrameAppender:
+    ''' Appends dataframe chunks to a csv, parquet (a row group per chunk) or
+        feather file, so a large file is written with bounded memory.
+        Use as a context manager, the file is complete once closed.
+    '''
+
+    def __init__(self, file_path: str, schema: Schema = None) -> None:
+        try:
+            self.file_path = file_path
+            self.schema = schema
+            self.data_file_format = get_data_file_format(file_path)
+            self.row_count = 0
+            self._writer = None
+            self._arrow_schema = None
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def __enter__(self) -> 'DataFrameAppender':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def append(self, df: pd.DataFrame) -> None:
+        try:
+            df = df.reset_index(drop=True)
+            if self.schema is not None:
+                df = apply_schema_dtypes(df, self.schema)
+            if self.data_file_format == '.csv':
+                df.to_csv(
+                    path_or_buf=self.file_path,
+                    mode='a' if self._writer is not None else 'w',
+                    header=self._writer is None,
+                    index=False
+                )
+                self._writer = self.file_path
+            else:
+                import pyarrow as pa
+
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if self._writer is None:
+                    if self.data_file_format == '.parquet':
+                        import pyarrow.parquet as pq
+
+                        self._writer = pq.ParquetWriter(self.file_path, table.schema)
+                    else:
+                        # Feather v2 is the Arrow IPC file format, compressed like DataFrame.to_feather.
+                        self._writer = pa.ipc.new_file(
+                            self.file_path, table.schema, options=pa.ipc.IpcWriteOptions(compression='lz4')
+                        )
+                    self._arrow_schema = table.schema
+                elif not table.schema.equals(self._arrow_schema, check_metadata=False):
+                    table = table.cast(self._arrow_schema)
+                self._writer.write_table(table)
+            self.row_count += len(df)
+        except Exception as e:
+            log_exception(logger, e)
+            raise HousePricePredictionException(e, sys) from e
+
+    def close(self) -> None:
+        if self._writer is not None and self.data_file_format != '.csv':
+            self._writer.close()
+        self._writer = None
+
+def write_json_file_atomically(file_path: str, data: dict) -> None:
+    ''' Writes to a temporary file, fsyncs it and renames it over file_path,
+        readers see either the old or the new content, never a partial file.
+    '''
+    try:
+        temp_file_path = f'{file_path}.{os.getpid()}.tmp'
+        with open(temp_file_path, 'w') as file:
+            json.dump(data, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file_path, file_path)
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
+
+def save_features_and_target(
+    features, target, features_file_path: str, target_file_path: str,
+    dtype: str = 'float64', sparse_density_threshold: float = 0.0
+) -> str:
+    ''' Saves features and target as separate arrays, so they are loaded without
+        slicing a combined array\n
+        ------------------------------------------------
+        Takes - features (dense or scipy sparse), target, file paths, dtype of the
+        features, features with fewer non zero values than sparse_density_threshold
+        are kept as a CSR matrix in an .npz file instead of a dense .npy file\n
+        Returns - path of the features file written
+    '''
+    try:
+        import scipy.sparse
+
+        features_file_path = os.path.splitext(features_file_path)[0]
+        if scipy.sparse.issparse(features):
+            density = features.nnz / max(1, features.shape[0] * features.shape[1])
+        else:
+            density = np.count_nonzero(features) / max(1, features.size)
+        if density < sparse_density_threshold:
+            features_file_path = f'{features_file_path}.npz'
+            scipy.sparse.save_npz(features_file_path, scipy.sparse.csr_matrix(features, dtype=dtype))
+        else:
+            features_file_path = f'{features_file_path}.npy'
+            if scipy.sparse.issparse(features):
+                features = features.toarray()
+            np.save(features_file_path, np.asarray(features, dtype=dtype))
+        np.save(target_file_path, np.asarray(target, dtype=np.float64))
+        logger.info('Saved %s features with density %.3f to %s', features.shape, density, features_file_path)
+
+        return features_file_path
+    except Exception as e:
+        log_exception(logger, e)
+        raise HousePricePredictionException(e, sys) from e
+
+def load_features_and_target(features_file_path: str, target_file_path: str, mmap_mode: str = 'r') -> tuple:
+    ''' Loads the arrays written by save_features_and_target, dense arrays are
+        memory mapped with mmap_mode so the pages are shared instead of copied.
+    '''
+    try:
+        if features_file_path.endswith('.npz'):
+            import scipy.sparse
+
+            features = scipy.sparse.load_npz(features_file_path)
+        else:
+            features = np.load(features_file_path, mmap_mode=mmap_mode)
+        target = np.load(target_file_path, mmap_mode=mmap_mode)
+
+        return features, target
+    except Exception as e:
+        log_exception(logger, e)
         raise HousePricePredictionException(e, sys) from e
-    
\ No newline at end of file
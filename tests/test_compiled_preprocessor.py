@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pytest
+
+from house_price.benchmark.synthetic_data import generate_housing_data
+from house_price.component.data_transformation import DataTransformation
+from house_price.entity.artifact_config import DataValidationArtifacts
+from house_price.entity.compiled_preprocessor import CompiledPreprocessor
+from house_price.entity.entity_config import DataTransformationConfig
+from house_price.exception import HousePricePredictionException
+from house_price.util import util
+
+SCHEMA_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'schema.yaml')
+
+def get_column_transformer(add_bedroom_per_room: bool):
+    data_transformation_config = DataTransformationConfig._make(
+        [None] * len(DataTransformationConfig._fields)
+    )._replace(add_bedroom_per_room=add_bedroom_per_room)
+    data_validation_artifacts = DataValidationArtifacts(
+        schema_file_path=SCHEMA_FILE_PATH,
+        report_file_path=None,
+        report_page_file_path=None,
+        is_validated=True,
+        message=None
+    )
+    return DataTransformation(
+        data_ingestion_artifacts=None,
+        data_validation_artifacts=data_validation_artifacts,
+        data_transformation_config=data_transformation_config
+    ).column_transformer()
+
+def get_features(row_count: int = 500, seed: int = 2022):
+    ''' Synthetic houses with missing numbers in every numerical column and missing categories.
+    '''
+    schema = util.read_schema(schema_file_path=SCHEMA_FILE_PATH)
+    features = generate_housing_data(
+        row_count=row_count,
+        schema=util.read_yaml_file(file_path=SCHEMA_FILE_PATH),
+        seed=seed
+    ).drop(columns=[schema.target_column_name])
+    rng = np.random.default_rng(seed)
+    for column in schema.numerical_columns:
+        features.loc[rng.random(row_count) < 0.05, column] = np.nan
+    # Missing categories read from the ingested files are NaN.
+    features['ocean_proximity'] = features['ocean_proximity'].astype(object)
+    features.loc[rng.random(row_count) < 0.05, 'ocean_proximity'] = np.nan
+    return features
+
+def get_dense(features) -> np.ndarray:
+    return features.toarray() if hasattr(features, 'toarray') else np.asarray(features)
+
+@pytest.mark.parametrize('add_bedroom_per_room', [True, False])
+def test_compiled_preprocessor_matches_column_transformer(add_bedroom_per_room):
+    features = get_features()
+    assert features.isna().any().all()
+    column_transformer = get_column_transformer(add_bedroom_per_room).fit(features)
+    compiled_preprocessor = CompiledPreprocessor.from_column_transformer(
+        column_transformer=column_transformer,
+        domain_value=util.read_schema(schema_file_path=SCHEMA_FILE_PATH).domain_value
+    )
+    unseen_features = get_features(row_count=200, seed=7)
+    expected = get_dense(column_transformer.transform(unseen_features))
+    compiled = compiled_preprocessor.transform(unseen_features)
+    assert compiled.shape == expected.shape
+    assert np.allclose(compiled, expected, rtol=1e-12, atol=1e-12, equal_nan=True)
+
+def test_null_category_is_imputed_like_nan():
+    features = get_features()
+    column_transformer = get_column_transformer(True).fit(features)
+    compiled_preprocessor = CompiledPreprocessor.from_column_transformer(column_transformer=column_transformer)
+    # A JSON null reaches the served model as None.
+    none_features = features.copy()
+    none_features['ocean_proximity'] = none_features['ocean_proximity'].where(none_features['ocean_proximity'].notna(), None)
+    assert np.array_equal(compiled_preprocessor.transform(none_features), compiled_preprocessor.transform(features))
+
+def test_compiled_preprocessor_survives_save_and_load(tmp_path):
+    features = get_features()
+    column_transformer = get_column_transformer(True).fit(features)
+    file_path = str(tmp_path / 'preprocessing_object.json')
+    CompiledPreprocessor.from_column_transformer(column_transformer=column_transformer).save(file_path)
+    compiled = CompiledPreprocessor.load(file_path).transform(features)
+    assert np.allclose(compiled, get_dense(column_transformer.transform(features)), rtol=1e-12, atol=1e-12)
+
+def test_unknown_category_is_rejected_like_the_column_transformer():
+    features = get_features()
+    column_transformer = get_column_transformer(True).fit(features)
+    compiled_preprocessor = CompiledPreprocessor.from_column_transformer(column_transformer=column_transformer)
+    unknown_features = features.head(3).copy()
+    unknown_features.loc[unknown_features.index[1], 'ocean_proximity'] = 'ON THE MOON'
+    with pytest.raises(ValueError):
+        column_transformer.transform(unknown_features)
+    with pytest.raises(HousePricePredictionException, match='ON THE MOON'):
+        compiled_preprocessor.transform(unknown_features)
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pytest
+
+from house_price.entity.model_predictor import HousePriceBatch
+from house_price.exception import HousePricePredictionException, find_housing_input_error
+from house_price.util import util
+
+SCHEMA_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'schema.yaml')
+
+HOUSE = {
+    'longitude': -122.23,
+    'latitude': 37.88,
+    'housing_median_age': 41.0,
+    'total_rooms': 880.0,
+    'total_bedrooms': 129.0,
+    'population': 322.0,
+    'households': 126.0,
+    'median_income': 8.3252,
+    'ocean_proximity': 'NEAR BAY'
+}
+
+def get_input_error(records: list):
+    domain_value = util.read_schema(schema_file_path=SCHEMA_FILE_PATH).domain_value
+    with pytest.raises(HousePricePredictionException) as exception_info:
+        HousePriceBatch.from_records(records).validate(domain_value=domain_value)
+    return find_housing_input_error(exception_info.value)
+
+def test_valid_house_with_missing_values_passes():
+    domain_value = util.read_schema(schema_file_path=SCHEMA_FILE_PATH).domain_value
+    housing_batch = HousePriceBatch.from_records([HOUSE, {**HOUSE, 'total_bedrooms': None, 'ocean_proximity': None}])
+    housing_batch.validate(domain_value=domain_value)
+    assert np.isnan(housing_batch.total_bedrooms[1])
+
+@pytest.mark.parametrize('field, value', [
+    ('households', 0),
+    ('total_rooms', 0.0),
+    ('total_rooms', True),
+    ('population', float('inf')),
+    ('median_income', 'high'),
+    ('ocean_proximity', 'ON THE MOON'),
+    ('ocean_proximity', 5)
+])
+def test_invalid_field_is_named(field, value):
+    housing_input_error = get_input_error([{**HOUSE, field: value}])
+    assert housing_input_error is not None
+    assert housing_input_error.field == field
+    assert os.sep not in str(housing_input_error)
+
+def test_invalid_house_of_a_batch_is_numbered():
+    housing_input_error = get_input_error([HOUSE, {**HOUSE, 'households': 0}])
+    assert str(housing_input_error).startswith('House 1 - ')
+
+def test_row_errors_leave_valid_houses_alone():
+    housing_batch = HousePriceBatch.from_records([HOUSE, {**HOUSE, 'households': 0}, HOUSE])
+    row_errors = housing_batch.get_row_errors()
+    assert row_errors[0] is None and row_errors[2] is None
+    assert row_errors[1].field == 'households'
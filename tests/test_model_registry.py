@@ -0,0 +1,49 @@
+import json
+import os
+
+import pytest
+
+from house_price.entity.model_registry import ModelRegistry
+from house_price.exception import HousePricePredictionException
+
+def make_source_dir(path, content: str = 'model') -> str:
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, 'model.pkl'), 'w') as file:
+        file.write(content)
+    return str(path)
+
+def test_register_and_promote(tmp_path):
+    model_registry = ModelRegistry(model_dir=str(tmp_path / 'saved_models'))
+    assert model_registry.get_current_entry() is None
+    version = model_registry.register(make_source_dir(tmp_path / 'source'), 'model.pkl', metrics={'test_accuracy': 0.8})
+    model_registry.promote(version=version)
+    assert version == 1
+    assert model_registry.get_current_entry()['metrics'] == {'test_accuracy': 0.8}
+    assert model_registry.get_current_model_path() == os.path.join(model_registry.model_dir, '1', 'model.pkl')
+    with open(model_registry.current_pointer_file_path, 'r') as file:
+        assert json.load(file)['version'] == 1
+    # Nothing is left behind by the atomic writes.
+    assert not [file_name for file_name in os.listdir(model_registry.model_dir) if file_name.endswith('.tmp')]
+
+def test_promote_rejects_a_tampered_version(tmp_path):
+    model_registry = ModelRegistry(model_dir=str(tmp_path / 'saved_models'))
+    source_dir = make_source_dir(tmp_path / 'source')
+    model_registry.promote(version=model_registry.register(source_dir, 'model.pkl'))
+    version = model_registry.register(source_dir, 'model.pkl')
+    with open(os.path.join(model_registry.model_dir, str(version), 'model.pkl'), 'w') as file:
+        file.write('tampered')
+    assert not model_registry.verify(version)
+    with pytest.raises(HousePricePredictionException, match='does not match its checksum'):
+        model_registry.promote(version=version)
+    assert model_registry.get_current_entry()['version'] == 1
+
+def test_register_does_not_reuse_a_version_dir_on_disk(tmp_path):
+    model_dir = tmp_path / 'saved_models'
+    # A version folder written before the registry, missing from its manifest.
+    make_source_dir(model_dir / '3', content='legacy')
+    model_registry = ModelRegistry(model_dir=str(model_dir))
+    version = model_registry.register(make_source_dir(tmp_path / 'source'), 'model.pkl')
+    assert version == 4
+    with open(model_dir / '3' / 'model.pkl', 'r') as file:
+        assert file.read() == 'legacy'
+    assert model_registry.register(make_source_dir(tmp_path / 'source'), 'model.pkl') == 5
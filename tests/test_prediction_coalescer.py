@@ -0,0 +1,99 @@
+import os
+import threading
+
+import pytest
+
+from house_price.entity.model_predictor import HousePriceBatch
+from house_price.entity.prediction_coalescer import PredictionCoalescer
+from house_price.exception import HousePricePredictionException
+
+HOUSE = {
+    'longitude': -122.23,
+    'latitude': 37.88,
+    'housing_median_age': 41.0,
+    'total_rooms': 880.0,
+    'total_bedrooms': 129.0,
+    'population': 322.0,
+    'households': 126.0,
+    'median_income': 8.3252,
+    'ocean_proximity': 'NEAR BAY'
+}
+
+FAILING_INCOME = 13.0
+
+class FakeModel:
+    ''' Predicts the median income, fails every batch holding FAILING_INCOME. '''
+
+    def __init__(self) -> None:
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def predict_batch(self, housing_batch: HousePriceBatch, timings: dict = None) -> list:
+        with self.lock:
+            self.batch_sizes.append(len(housing_batch))
+        if (housing_batch.median_income == FAILING_INCOME).any():
+            raise ValueError('model failed')
+        return housing_batch.median_income.tolist()
+
+def predict_concurrently(coalescer: PredictionCoalescer, incomes: list) -> list:
+    ''' One thread per house, returns the prediction or the exception of each. '''
+    results = [None] * len(incomes)
+    barrier = threading.Barrier(len(incomes))
+
+    def predict(index: int) -> None:
+        housing_batch = HousePriceBatch.from_records([{**HOUSE, 'median_income': incomes[index]}])
+        barrier.wait()
+        try:
+            results[index] = coalescer.predict(housing_batch, timeout=10)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=predict, args=(index,)) for index in range(len(incomes))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_one_failing_house_does_not_fail_its_batch():
+    fake_model = FakeModel()
+    # A long wait, so every request joins the first batch.
+    coalescer = PredictionCoalescer(predict_batch=fake_model.predict_batch, max_batch_size=16, max_wait_ms=2000)
+    incomes = [100.0 + index for index in range(16)]
+    incomes[5] = FAILING_INCOME
+    results = predict_concurrently(coalescer, incomes)
+    assert isinstance(results[5], ValueError)
+    assert [result for index, result in enumerate(results) if index != 5] == [
+        income for index, income in enumerate(incomes) if index != 5
+    ]
+    assert fake_model.batch_sizes[0] == 16
+    # Bisection, not one retry per house.
+    assert len(fake_model.batch_sizes) < 16
+    assert coalescer.get_stats()['failed_batch_count'] == 1
+
+def test_invalid_house_is_rejected_before_queueing():
+    fake_model = FakeModel()
+    coalescer = PredictionCoalescer(predict_batch=fake_model.predict_batch, domain_value={'ocean_proximity': ['NEAR BAY']})
+    with pytest.raises(HousePricePredictionException, match='ocean_proximity'):
+        coalescer.predict(HousePriceBatch.from_records([{**HOUSE, 'ocean_proximity': 'INLAND'}]))
+    assert fake_model.batch_sizes == []
+    assert coalescer.predict(HousePriceBatch.from_records([HOUSE]), timeout=10) == HOUSE['median_income']
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_process_starts_its_own_worker():
+    fake_model = FakeModel()
+    coalescer = PredictionCoalescer(predict_batch=fake_model.predict_batch)
+    assert coalescer.predict(HousePriceBatch.from_records([HOUSE]), timeout=10) == HOUSE['median_income']
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # The worker thread of the parent does not exist in the child.
+        try:
+            result = coalescer.predict(HousePriceBatch.from_records([HOUSE]), timeout=10)
+            os.write(write_fd, str(result).encode())
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    assert float(os.read(read_fd, 64).decode()) == HOUSE['median_income']
+    os.close(read_fd)
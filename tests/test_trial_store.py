@@ -0,0 +1,63 @@
+import sqlite3
+
+import numpy as np
+
+from house_price.entity.trial_store import TOUCH_BATCH_SIZE, TRIAL_OVERHEAD_BYTES, TrialStore, fingerprint_arrays
+
+def get_last_used(store: TrialStore, key: str) -> tuple:
+    with sqlite3.connect(store.file_path) as connection:
+        return connection.execute('SELECT last_used_at, hit_count FROM trials WHERE key = ?', (key,)).fetchone()
+
+def test_trial_store_miss_then_hit(tmp_path):
+    store = TrialStore(file_path=str(tmp_path / 'trials.sqlite'))
+    key = TrialStore.make_key(fingerprint_arrays(np.arange(10.0)), 'Model', {'alpha': 1}, {'beta': 2}, {})
+    assert store.get(key) is None
+    store.put(key=key, estimator_class='Model', params={'beta': 2}, mean_test_score=0.5, estimator={'fitted': True})
+    trial = store.get(key)
+    assert trial['params'] == {'beta': 2}
+    assert trial['mean_test_score'] == 0.5
+    assert trial['estimator'] == {'fitted': True}
+    assert (store.lookup_count, store.hit_count) == (2, 1)
+
+def test_trial_store_keys_differ_with_the_data():
+    make_key = lambda array: TrialStore.make_key(fingerprint_arrays(array), 'Model', {}, {}, {})
+    assert make_key(np.arange(10.0)) == make_key(np.arange(10.0))
+    assert make_key(np.arange(10.0)) != make_key(np.arange(1.0, 11.0))
+
+def test_trial_store_writes_hits_in_batches(tmp_path):
+    store = TrialStore(file_path=str(tmp_path / 'trials.sqlite'))
+    store.put(key='a', estimator_class='Model', params={})
+    created_at, _ = get_last_used(store, 'a')
+    store.get('a')
+    store.get('a')
+    # A lookup does not write, the hits are pending until a flush.
+    assert get_last_used(store, 'a') == (created_at, 0)
+    store.flush()
+    last_used_at, hit_count = get_last_used(store, 'a')
+    assert last_used_at > created_at and hit_count == 2
+    for index in range(TOUCH_BATCH_SIZE):
+        store.put(key=str(index), estimator_class='Model', params={})
+    for index in range(TOUCH_BATCH_SIZE):
+        store.get(str(index))
+    assert get_last_used(store, str(TOUCH_BATCH_SIZE - 1))[1] == 1
+
+def test_trial_store_evicts_least_recently_used(tmp_path):
+    params_bytes = len('{}')
+    store = TrialStore(file_path=str(tmp_path / 'trials.sqlite'), max_bytes=3 * (params_bytes + TRIAL_OVERHEAD_BYTES))
+    for key in ('a', 'b', 'c'):
+        store.put(key=key, estimator_class='Model', params={})
+    # The pending hit on a makes b the least recently used one.
+    store.get('a')
+    store.put(key='d', estimator_class='Model', params={})
+    assert store.get('b') is None
+    assert all(store.get(key) is not None for key in ('a', 'c', 'd'))
+    stats = store.get_stats()
+    assert stats['entries'] == 3 and stats['bytes'] <= stats['max_bytes']
+
+def test_trial_store_evaluations_are_kept_apart_from_trials(tmp_path):
+    store = TrialStore(file_path=str(tmp_path / 'trials.sqlite'))
+    metrics = {'train_accuracy': 0.9, 'test_accuracy': 0.8, 'train_rsme': 1.0, 'test_rsme': 2.0}
+    store.put_evaluation(key='a', metrics={**metrics, 'predict_seconds': 0.1})
+    assert store.get('a') is None
+    assert store.get_evaluation('a') == metrics
+    assert store.get_stats()['evaluation_entries'] == 1